@@ -67,6 +67,12 @@ q_rad_arr = np.ndarray(len(y_coordinates))
 halpha_gas_arr = np.ndarray(len(y_coordinates))
 sec_length_arr = np.ndarray(len(y_coordinates))
 
+# convergence and cost per section: sub-iterations, SLSQP iterations and constraint evaluations summed over the sub-iterations, runtime
+sub_iterations_arr = np.zeros(len(y_coordinates), dtype=int)
+slsqp_iterations_arr = np.zeros(len(y_coordinates), dtype=int)
+evaluations_arr = np.zeros(len(y_coordinates), dtype=int)
+section_time_arr = np.ndarray(len(y_coordinates))
+
 # material 
 E_in718 = [199947961502.171,198569010043.535,195811107126.264,193053204208.992,190295301291.721,186847922645.132,184090019727.861,180642641081.271,177884738164,174437359517.411,170989980870.822,166853126494.915,163405747848.326,158579417743.101,153753087637.876,146858330344.698,139274097322.202,129621437111.752,119968776901.302,109626640961.535,98595029292.4497]
 T1_in718 = [294.3,310.9,366.5,422,477.6,533.2,588.7,644.3,699.8,755.4,810.9,866.5,922,977.6,1033.2,1088.7,1144.3,1199.8,1255.4,1310.9,1366.5]
@@ -102,12 +108,15 @@ for i in range(len(y_coordinates)):
 	# iteration parameters 
 	iteration = 0
 	difference = 1
+	section_start = time.time()
 
 	while difference > tol:
 		initial_params = pressuredrop.parameters(ri=y_coordinates[i],t=t,wt1=wt1,wt2=wt2,rf1=rf1,rf2=rf2,N=np.round(number_of_channels/2,0))
 		initial_heat = pressuredrop.sim(wall_temperature, t_aw[i], heat.coolant.T, halpha, radiation, coolant_pressure, heat.P_local, y_coordinates[i], thermal_conductivity_tbc, wall_thickness_tbc)
 		try:
-			new_params = pressuredrop.physics(initial_params,in718,initial_heat,heat.coolant)
+			new_params = pressuredrop.physics(initial_params,in718,initial_heat,heat.coolant,instrument=True)
+			slsqp_iterations_arr[i] += max(new_params.stats['iterations'], 0)
+			evaluations_arr[i] += new_params.stats['stress_constraint'] + new_params.stats['pressure_drop_constraint']
 		except:
 			print('skipped iteration: ', iteration, ' due to infeasible solution')
 			pass
@@ -172,9 +181,14 @@ for i in range(len(y_coordinates)):
 	halpha_gas_arr[i] = halpha
 	sec_length_arr[i] = section_length
 	tbc_t_arr[i] = tbc_wall_temp
+	sub_iterations_arr[i] = iteration
+	section_time_arr[i] = time.time() - section_start
 
 t2 = time.time()
 print('optimisation runtime: ', t2-t1, '[s]')
+slowest = np.argmax(section_time_arr)
+print('sub-iterations: ', np.sum(sub_iterations_arr), ', SLSQP iterations: ', np.sum(slsqp_iterations_arr), ', constraint evaluations: ', np.sum(evaluations_arr))
+print('slowest section: ', slowest, ' ', round(section_time_arr[slowest],2), '[s], ', sub_iterations_arr[slowest], ' sub-iterations')
 
 with open('optimised_geometry.csv', 'w', newline='') as file:
 	writer = csv.writer(file)
@@ -7,11 +7,17 @@ AUTHOR: Jonthan Neeser
 DATE: 13.10.2020
 '''
 
+import os
+import sys
 import numpy as np
 import thermo
 from scipy.optimize import fsolve
 from rocketcea.cea_obj import CEA_Obj
 
+# shared heat transfer correlations of engine_tools, appended so the modules of this folder take precedence
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'engine_tools'))
+import correlations
+
 
 class Isentropic():
 	def __init__(self, static_pressure, static_temperature, gamma):
@@ -134,20 +140,8 @@ class Heattransfer():
 		self.cea = cea
 
 	def heat_trans_coeff_gas(self, mach, wall_temperature, y_coordinate):
-		gamma = self.cea.gamma
-		t = self.cea.T_static
-		p = self.chamber_pressure
-		mu = self.cea.mu
-		cp = self.cea.Cp
-		Pr = self.cea.Pr
-		local_area = np.pi*y_coordinate**2
-		throat_area = np.pi*self.throat_diameter**2/4
-
-		cstar = p * np.pi * self.throat_diameter**2 / 4 / self.massflow
-		s = (0.5*wall_temperature/t * (1+(gamma-1)/2 * mach*mach) + 0.5)**(-0.68) * (1+(gamma-1)/2 * mach*mach)**(-0.12)
-		halpha = 0.026/((self.throat_diameter)**0.2) * (mu**0.2)*cp/(Pr**0.6) * (p/cstar)**0.8 * (throat_area/local_area)**0.9 * s
-
-		return halpha
+		terms = correlations.standard_bartz(self.cea, self.chamber_pressure, self.massflow, self.throat_diameter, y_coordinate, mach, None)
+		return correlations.gas_coefficient(terms, wall_temperature)
 
 	def pressure_drop(self, surface_roughness, hydrolic_diameter, section_lenght, y_coordinate):
 		coolant_area = hydrolic_diameter / 2 * y_coordinate * 2 * np.pi
@@ -161,12 +155,7 @@ class Heattransfer():
 	def radiation(self, y_coordinate, mach):
 		self.T_local = self.cea.T_static/(1 + (self.cea.gamma-1)/2 * mach**2)
 		self.P_local = self.chamber_pressure/((1 + (self.cea.gamma-1)/2 * mach**2)**(self.cea.gamma/(self.cea.gamma-1)))
-		p_co2 = self.cea.mole_fractions[1]['*CO2'][0] * self.P_local
-		p_h2o = self.cea.mole_fractions[1]['H2O'][0] * self.P_local
-		q_r_co2 = 4 * (p_co2/1e5*y_coordinate)**0.3 * (self.T_local/100)**3.5
-		q_r_h2o = 5.74 * (p_h2o/1e5*y_coordinate)**0.3 * (self.T_local/100)**3.5
-
-		return q_r_co2 + q_r_h2o
+		return correlations.radiation(self.cea.mole_fractions, self.P_local, y_coordinate, self.T_local)
 
 	def heat_trans_coeff_coolant(self, hydrolic_diameter, wall_temperature):
 		coolant_area = hydrolic_diameter**2/4 * np.pi * self.number_of_channels 
@@ -177,7 +166,7 @@ class Heattransfer():
 		
 		#Nu = 0.023*Re**0.8*Pr**0.4
 		wall_fluid = thermo.Mixture(self.coolant_species, ws=self.coolant_massfraction, P=self.coolant.P, T=wall_temperature)
-		Nu = 0.0208*Re**0.8*Pr**0.4*(1+0.01457*wall_fluid.mu/self.coolant.mu)  #Hess & Kunz relationship
+		Nu = correlations.hess_kunz(Re, Pr, wall_fluid.mu, self.coolant.mu)
 		halpha = Nu*k/hydrolic_diameter
 
 		return halpha, Re, Nu
@@ -84,7 +84,11 @@ class sim:
 
 
 class physics:
-    def __init__(self,x,metal,sim,fluid):
+    def __init__(self,x,metal,sim,fluid,instrument=False):
+        """
+        :param instrument: set to True to record self.stats, evaluation counts, SLSQP iterations, wall time and the
+                           last constraint margins (negative if violated) of this section
+        """
         self.par = x
         self.sim = sim
         self.met = metal
@@ -170,6 +174,22 @@ class physics:
                 self.record_geom.append(input)
             return self.A_crosssection
 
+        if instrument:
+            start = time.time()
+            counts = {'mass_optimize': 0, 'stress_constraint': 0, 'pressure_drop_constraint': 0}
+            margins = {}
+            def counted(function):
+                def wrapper(input):
+                    counts[function.__name__] += 1
+                    value = function(input)
+                    margins[function.__name__] = value
+                    return value
+                return wrapper
+            # the closures look the names up at call time, nested calls are counted as well
+            mass_optimize = counted(mass_optimize)
+            stress_constraint = counted(stress_constraint)
+            pressure_drop_constraint = counted(pressure_drop_constraint)
+
         """
         nlc1 = scipy.optimize.NonlinearConstraint(stress_constraint,self.sim.SF,np.inf)
         nlc2 = scipy.optimize.NonlinearConstraint(pressure_drop_constraint,0,self.sim.pd_con)
@@ -182,14 +202,22 @@ class physics:
         
         if pressure_drop_constraint(x0) > 0 and stress_constraint(x0) > 0:
             self.record_cross.append(mass_optimize(x0))
+        result = None
         try:
-            scipy.optimize.minimize(mass_optimize,x0=x0,bounds=bounds,constraints=cons,method="SLSQP")
+            result = scipy.optimize.minimize(mass_optimize,x0=x0,bounds=bounds,constraints=cons,method="SLSQP")
         except:
             input = self.record_geom[self.record_cross.index(min(self.record_cross))]
             geom_update(input)
             flow_update()
             pass
 
+        if instrument:
+            self.stats = dict(counts)
+            self.stats['iterations'] = result.nit if result is not None else -1
+            self.stats['success'] = result.success if result is not None else False
+            self.stats['time'] = time.time() - start
+            self.stats['residual'] = min(margins.get('stress_constraint', np.nan), margins.get('pressure_drop_constraint', np.nan))
+
 def geomi(x):
     cgp2 = np.array([0,x.ri+x.wt1])
     cgp1 = np.dot(ge.rot(-np.pi/x.N),np.array([0,x.ro-x.wt1]))
@@ -60,3 +60,87 @@ def get_discharge_coeff(mass_flow, area, pressure, rho):
     
     return cd_arr
 
+
+
+def cross_spectral_analysis(x, y, sampling_freq, nperseg=1024, noverlap=900, n_average=8, chunk_segments=512):
+    """sliding window cross-spectral analysis of two channels, e.g. the two chamber pressure transducers.
+    Coherent content common to both sensors (acoustic modes) shows a coherence close to 1 and a stable phase,
+    uncorrelated sensor noise a coherence close to 0.
+
+    Hann windowed segments of nperseg samples are transformed with zero padding to 2*nperseg, so the inverse
+    transform of the averaged cross spectrum is the linear (not circular) cross-correlation. Each output window
+    averages n_average consecutive segments. Segments are processed in chunks of chunk_segments (at least
+    n_average-1) to bound memory for long captures; the result does not depend on the chunk size.
+
+    :param x: first channel
+    :param y: second channel, same sampling as x
+    :param sampling_freq: sampling frequency [Hz]
+    :return: window center times [s], frequencies [Hz], coherence [-], phase of y relative to x [rad],
+             lags [s] and normalised cross-correlation, each of the last four with one row per window
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) != len(y):
+        raise ValueError('Channels must have the same number of samples')
+    if not 0 <= noverlap < nperseg:
+        raise ValueError('noverlap must be at least 0 and smaller than nperseg, got noverlap=', noverlap, ' nperseg=', nperseg)
+    if chunk_segments < max(n_average - 1, 1):
+        raise ValueError('chunk_segments must be at least n_average-1, got chunk_segments=', chunk_segments, ' n_average=', n_average)
+
+    step = nperseg - noverlap
+    n_segments = (len(x) - nperseg)//step + 1
+    n_windows = n_segments - n_average + 1
+    if n_windows < 1:
+        raise ValueError('Capture too short for nperseg=', nperseg, ' and n_average=', n_average)
+
+    nfft = 2*nperseg
+    window = signal.get_window('hann', nperseg)
+    freqs = fft.rfftfreq(nfft, 1/sampling_freq)
+    lags = np.arange(-nperseg + 1, nperseg)/sampling_freq
+    weights = np.full(len(freqs), 2.0)                  # one-sided spectrum weights for Parseval's theorem
+    weights[0] = weights[-1] = 1
+
+    times = ((np.arange(n_windows)*step) + (nperseg + (n_average - 1)*step)/2)/sampling_freq
+    # NaN until filled, a window that is not computed can not pass for data
+    coherence = np.full((n_windows, len(freqs)), np.nan)
+    phase = np.full((n_windows, len(freqs)), np.nan)
+    correlation = np.full((n_windows, len(lags)), np.nan)
+
+    x_segments = np.lib.stride_tricks.sliding_window_view(x, nperseg)[::step][:n_segments]
+    y_segments = np.lib.stride_tricks.sliding_window_view(y, nperseg)[::step][:n_segments]
+
+    # spectra of the last n_average-1 segments of the previous chunk, needed for windows spanning two chunks
+    carry = None
+    out = 0
+    for start in range(0, n_segments, chunk_segments):
+        xs = x_segments[start:start+chunk_segments]
+        ys = y_segments[start:start+chunk_segments]
+        X = fft.rfft((xs - xs.mean(axis=1, keepdims=True))*window, n=nfft, axis=1)
+        Y = fft.rfft((ys - ys.mean(axis=1, keepdims=True))*window, n=nfft, axis=1)
+        spectra = np.stack([np.abs(X)**2, np.abs(Y)**2, np.conj(X)*Y])
+
+        if carry is not None:
+            spectra = np.concatenate([carry, spectra], axis=1)
+        # previous carry plus the new spectra, of which the last n_average-1 segments are kept
+        carry = spectra[:, max(len(spectra[0]) - (n_average - 1), 0):] if n_average > 1 else None
+        if len(spectra[0]) < n_average:
+            continue
+
+        # moving sum over n_average segments
+        cumulative = np.cumsum(spectra, axis=1)
+        sums = cumulative[:, n_average-1:].copy()
+        sums[:, 1:] -= cumulative[:, :-n_average]
+        Sxx, Syy, Sxy = sums[0].real, sums[1].real, sums[2]
+
+        n = len(Sxy)
+        coherence[out:out+n] = np.abs(Sxy)**2/(Sxx*Syy + np.finfo(float).tiny)
+        phase[out:out+n] = np.angle(Sxy)
+
+        # cross-correlation coefficient: inverse transform of the averaged cross spectrum normalised by the energies
+        cc = fft.irfft(Sxy, n=nfft, axis=1)
+        cc = np.concatenate([cc[:, -(nperseg - 1):], cc[:, :nperseg]], axis=1)
+        norm = np.sqrt(np.sum(Sxx*weights, axis=1)*np.sum(Syy*weights, axis=1))/nfft
+        correlation[out:out+n] = cc/(norm[:, None] + np.finfo(float).tiny)
+        out += n
+
+    return times, freqs, coherence, phase, lags, correlation
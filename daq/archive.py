@@ -0,0 +1,170 @@
+import json
+import struct
+import zlib
+
+import numpy as np
+
+from analysis import get_time
+
+
+MAGIC = b'DAQARCH1'
+FOOTER = struct.Struct('<Q')                    # byte offset of the json index, last 8 bytes of the file
+TIME_DTYPE = '<f8'                              # time offsets within a chunk, archives without time_dtype in the index used '<f4'
+
+
+def write_archive(filename, time, channels, metadata=None, chunk_size=65536, level=6):
+    """stores calibrated channels of one test as zlib compressed float32 column chunks with a json index
+
+    File layout: magic, compressed chunks, json index, index offset. The index holds the per-test metadata and,
+    for every chunk, its time range and the byte ranges of all channel columns, so a time range of one channel
+    is read by decompressing only the chunks overlapping it. Time is stored per chunk as a float64 start time in
+    the index plus float64 offsets from it. float32 offsets would lose resolution with the chunk span (about 4 us
+    near 65 s), float64 keeps the sample times exact to well below a nanosecond.
+
+    :param time: monotonic time array [s]
+    :param channels: dictionary of channel name and calibrated data, same length as time
+    :param metadata: dictionary of json serialisable test metadata (test name, date, sensor calibrations, ...)
+    :param chunk_size: number of samples per chunk
+    :param level: zlib compression level
+    """
+    time = np.asarray(time, dtype=np.float64)
+    for name, data in channels.items():
+        if len(data) != len(time):
+            raise ValueError('Channel ', name, ' does not have the same length as the time array')
+
+    index = {
+        'metadata': metadata if metadata is not None else {},
+        'channels': list(channels.keys()),
+        'n_samples': len(time),
+        'chunk_size': chunk_size,
+        'time_dtype': TIME_DTYPE,
+        'chunks': [],
+    }
+
+    with open(filename, 'wb') as file:
+        file.write(MAGIC)
+        for start in range(0, len(time), chunk_size):
+            stop = min(start + chunk_size, len(time))
+            t0 = time[start]
+            chunk = {'start': start, 'stop': stop, 't_min': t0, 't_max': time[stop-1], 'columns': {}}
+
+            columns = [('__time__', time[start:stop] - t0, TIME_DTYPE)] + [(name, channels[name][start:stop], '<f4') for name in channels]
+            for name, data, dtype in columns:
+                compressed = zlib.compress(np.asarray(data, dtype=dtype).tobytes(), level)
+                chunk['columns'][name] = [file.tell(), len(compressed)]
+                file.write(compressed)
+
+            index['chunks'].append(chunk)
+
+        offset = file.tell()
+        file.write(json.dumps(index).encode())
+        file.write(FOOTER.pack(offset))
+
+
+class Archive():
+    def __init__(self, filename):
+        """read access to an archive written by write_archive"""
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            self.file.close()
+            raise ValueError(filename, ' is not a DAQ archive')
+
+        self.file.seek(-FOOTER.size, 2)
+        end = self.file.tell()
+        offset, = FOOTER.unpack(self.file.read(FOOTER.size))
+        self.file.seek(offset)
+        index = json.loads(self.file.read(end - offset))
+
+        self.metadata = index['metadata']
+        self.channels = index['channels']
+        self.n_samples = index['n_samples']
+        self.chunks = index['chunks']
+        self.time_dtype = index.get('time_dtype', '<f4')
+        self.t_min = np.array([chunk['t_min'] for chunk in self.chunks])
+        self.t_max = np.array([chunk['t_max'] for chunk in self.chunks])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def time_range(self):
+        if len(self.chunks) == 0:
+            return None, None
+        return self.t_min[0], self.t_max[-1]
+
+    def _column(self, chunk, name, dtype='<f4'):
+        offset, length = chunk['columns'][name]
+        self.file.seek(offset)
+        return np.frombuffer(zlib.decompress(self.file.read(length)), dtype=dtype)
+
+    def read(self, channel, t_start=None, t_end=None):
+        """returns time and values of one channel between t_start and t_end (whole test if None)
+
+        :param channel: channel name
+        :param t_start: start time [s]
+        :param t_end: end time [s]
+        """
+        if channel not in self.channels:
+            raise ValueError('Unknown channel ', channel, ', available: ', self.channels)
+        t_start = -np.inf if t_start is None else t_start
+        t_end = np.inf if t_end is None else t_end
+
+        # chunks overlapping [t_start, t_end]
+        first = np.searchsorted(self.t_max, t_start, side='left')
+        last = np.searchsorted(self.t_min, t_end, side='right')
+
+        times = []
+        values = []
+        for chunk in self.chunks[first:last]:
+            t = chunk['t_min'] + self._column(chunk, '__time__', self.time_dtype).astype(np.float64)
+            mask = (t >= t_start) & (t <= t_end)
+            times.append(t[mask])
+            values.append(self._column(chunk, channel)[mask])
+
+        if len(times) == 0:
+            return np.array([]), np.array([], dtype=np.float32)
+        return np.concatenate(times), np.concatenate(values)
+
+
+def csv_to_archive(csv_file, archive_file, time_column, ticks, start, channels, metadata=None, chunk_size=65536, skip_header=1):
+    """calibrates a raw test stand csv capture and stores it as archive, calibration as in run.py
+
+    :param time_column: column of the time stamp in ticks
+    :param ticks: ticks per second
+    :param start: start time as used by analysis.get_time
+    :param channels: dictionary of channel name and (column, slope, offset)
+    """
+    raw = np.genfromtxt(csv_file, delimiter=',', skip_header=skip_header)
+    time = get_time(time_column, raw, ticks, start)
+    calibrated = {name: raw[:, col]*slope + offset for name, (col, slope, offset) in channels.items()}
+
+    metadata = dict(metadata) if metadata is not None else {}
+    metadata.setdefault('source', csv_file)
+    metadata.setdefault('calibration', {name: {'column': col, 'slope': slope, 'offset': offset} for name, (col, slope, offset) in channels.items()})
+
+    write_archive(archive_file, time, calibrated, metadata, chunk_size)
+
+
+if __name__ == '__main__':
+
+    ps_channels = {
+        'ps_lox_tank': (0, 6250, -24),
+        'ps_lox_manifold': (1, 15100, -59),
+        'ps_ethanol_tank': (2, 6250, -24),
+        'ps_ethanol_manifold': (3, 6250, -24),
+        'ps_chamber_1': (4, 3750, -14),
+        'ps_chamber_2': (5, 3750, -14),
+    }
+    csv_to_archive('Hot2PS.csv', 'Hot2PS.daq', 6, 1e6, -3065, ps_channels, {'test': 'Hot fire 2', 'unit': 'bar'})
+
+    with Archive('Hot2PS.daq') as archive:
+        print(archive.metadata['test'], ': ', archive.channels)
+        print('time range: ', archive.time_range(), '[s]')
+        time, chamber = archive.read('ps_chamber_1', 0, 1)
+        print('peak chamber pressure in first second: ', max(chamber), '[bar]')
@@ -0,0 +1,327 @@
+import asyncio
+import time
+
+import numpy as np
+from scipy import signal
+
+
+class RingBuffer():
+    def __init__(self, size, dtype=np.float64):
+        """fixed size circular buffer holding the most recent samples of one channel
+
+        :param size: number of samples kept in memory
+        """
+        self.size = int(size)
+        self.buffer = np.zeros(self.size, dtype=dtype)
+        self.index = 0                          # position of the next write
+        self.count = 0                          # total number of samples ever written
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.buffer.dtype)
+        n = len(values)
+        if n >= self.size:
+            # block longer than the buffer, only the newest samples survive
+            self.buffer[:] = values[-self.size:]
+            self.index = 0
+        else:
+            end = self.index + n
+            if end <= self.size:
+                self.buffer[self.index:end] = values
+            else:
+                split = self.size - self.index
+                self.buffer[self.index:] = values[:split]
+                self.buffer[:n - split] = values[split:]
+            self.index = end % self.size
+        self.count += n
+
+    def latest(self, n=None):
+        """returns the newest n samples in chronological order (all stored samples if n is None)"""
+        stored = min(self.count, self.size)
+        n = stored if n is None else min(n, stored)
+        idx = (self.index - n + np.arange(n)) % self.size
+        return self.buffer[idx]
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+
+class Redline():
+    def __init__(self, low=-np.inf, high=np.inf, persistence=1):
+        """limit check on a calibrated (and filtered) channel
+
+        :param low: lower limit in channel units
+        :param high: upper limit in channel units
+        :param persistence: number of consecutive out of limit samples before the redline trips, rejects single sample spikes
+        """
+        self.low = low
+        self.high = high
+        self.persistence = persistence
+        self.consecutive = 0                    # carried over between blocks
+        self.tripped = False
+
+    def check(self, values):
+        """returns the indices of the samples at which the redline trips within this block"""
+        violation = (values < self.low) | (values > self.high)
+        if self.persistence <= 1:
+            trips = np.flatnonzero(violation)
+        else:
+            # length of the running violation streak at every sample, continued from the previous block
+            idx = np.arange(len(values))
+            last_ok = np.maximum.accumulate(np.where(~violation, idx, -1))
+            streak = idx - last_ok
+            streak[last_ok == -1] += self.consecutive
+            trips = np.flatnonzero(streak >= self.persistence)
+            self.consecutive = streak[-1] if len(values) > 0 else self.consecutive
+
+        if len(trips) > 0:
+            self.tripped = True
+        return trips
+
+
+class Channel():
+    def __init__(self, name, column, slope, offset, buffer_size, filter_order=None, filter_cutoff=None, redline=None):
+        """live sensor channel: linear calibration, streaming lowpass filter and redline check
+
+        :param name: channel name
+        :param column: column of the channel in the incoming frames
+        :param slope: calibration slope, same convention as analysis.get_ps_data
+        :param offset: calibration offset
+        :param buffer_size: number of samples kept in the ring buffers
+        :param filter_order: order of the butterworth filter, no filtering if None
+        :param filter_cutoff: normalised cutoff frequency of the butterworth filter
+        :param redline: Redline object checked against the filtered channel
+        """
+        self.name = name
+        self.column = column
+        self.slope = slope
+        self.offset = offset
+        self.redline = redline
+        self.raw = RingBuffer(buffer_size)
+        self.filtered = RingBuffer(buffer_size)
+
+        if filter_order is not None:
+            self.b, self.a = signal.butter(filter_order, filter_cutoff)
+            self.zi_unit = signal.lfilter_zi(self.b, self.a)
+        else:
+            self.b = None
+        self.zi = None
+
+    def calibrate(self, values):
+        return values*self.slope + self.offset
+
+    def filter(self, values):
+        """lowpass butterworth filter applied three times as in analysis.filtering, with the filter states
+        carried over between blocks so the output is continuous. The gaussian outlier blur of the offline
+        filter is non-causal and is not applied here."""
+        if self.b is None:
+            return values
+        if self.zi is None:
+            self.zi = [self.zi_unit*values[0] for _ in range(3)]
+        z = values
+        for stage in range(3):
+            z, self.zi[stage] = signal.lfilter(self.b, self.a, z, zi=self.zi[stage])
+        return z
+
+    def process(self, values):
+        calibrated = self.calibrate(values)
+        filtered = self.filter(calibrated)
+        self.raw.extend(calibrated)
+        self.filtered.extend(filtered)
+
+        trips = None
+        if self.redline is not None:
+            trips = self.redline.check(filtered)
+        return filtered, trips
+
+
+class Counters():
+    def __init__(self):
+        """latency and throughput statistics of the ingest service"""
+        self.start = time.perf_counter()
+        self.datagrams = 0
+        self.blocks = 0
+        self.frames = 0
+        self.bytes = 0
+        self.dropped = 0                        # datagrams dropped due to a full queue
+        self.malformed = 0                      # datagrams with a length that is not a whole number of frames
+        self.latency_last = 0
+        self.latency_max = 0
+        self.latency_sum = 0
+
+    def record_block(self, frames, latency):
+        self.blocks += 1
+        self.frames += frames
+        self.latency_last = latency
+        self.latency_max = max(self.latency_max, latency)
+        self.latency_sum += latency
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        return {
+            'elapsed [s]': elapsed,
+            'datagrams': self.datagrams,
+            'blocks': self.blocks,
+            'frames': self.frames,
+            'dropped datagrams': self.dropped,
+            'malformed datagrams': self.malformed,
+            'throughput [frames/s]': self.frames/elapsed if elapsed > 0 else 0,
+            'throughput [MB/s]': self.bytes/elapsed/1e6 if elapsed > 0 else 0,
+            'latency last [ms]': self.latency_last*1e3,
+            'latency max [ms]': self.latency_max*1e3,
+            'latency mean [ms]': self.latency_sum/self.blocks*1e3 if self.blocks > 0 else 0,
+        }
+
+
+class IngestProtocol(asyncio.DatagramProtocol):
+    def __init__(self, service):
+        self.service = service
+
+    def datagram_received(self, data, addr):
+        self.service.receive(data)
+
+
+class IngestService():
+    def __init__(self, channels, n_columns, time_column, ticks, buffer_size=100000, queue_size=1000, dtype='<f8', on_redline=None):
+        """asyncio service ingesting sensor frames from a UDP socket while the test is running.
+        Every datagram holds one or more frames of n_columns values. Datagrams queued while a block was
+        processed are coalesced into one block, which bounds the latency under load.
+
+        :param channels: list of Channel objects
+        :param n_columns: number of values in one frame
+        :param time_column: column holding the time stamp in ticks
+        :param ticks: ticks per second of the time stamp
+        :param buffer_size: number of samples kept per channel
+        :param queue_size: maximum number of queued datagrams, the oldest are dropped beyond this
+        :param dtype: numpy dtype of the values in the datagram
+        :param on_redline: callback(channel, times, values) called when a redline trips
+        """
+        self.channels = channels
+        self.n_columns = n_columns
+        self.time_column = time_column
+        self.ticks = ticks
+        self.dtype = np.dtype(dtype)
+        self.frame_size = self.n_columns*self.dtype.itemsize
+        self.queue_size = queue_size
+        self.on_redline = on_redline
+        self.time = RingBuffer(buffer_size)
+        self.t0 = None
+        self.counters = Counters()
+        self.queue = None
+        self.transport = None
+        self.running = False
+
+    def receive(self, data):
+        self.counters.datagrams += 1
+        self.counters.bytes += len(data)
+        if len(data) % self.frame_size != 0:
+            self.counters.malformed += 1
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.counters.dropped += 1
+        self.queue.put_nowait((time.perf_counter(), data))
+
+    def process_block(self, frames, received):
+        if self.t0 is None:
+            self.t0 = frames[0, self.time_column]
+        times = (frames[:, self.time_column] - self.t0)/self.ticks
+        self.time.extend(times)
+
+        for channel in self.channels:
+            filtered, trips = channel.process(frames[:, channel.column])
+            if trips is not None and len(trips) > 0:
+                if self.on_redline is not None:
+                    self.on_redline(channel, times[trips], filtered[trips])
+                else:
+                    print('REDLINE ', channel.name, ' at t = ', times[trips[0]], ' s: ', filtered[trips[0]])
+
+        self.counters.record_block(len(frames), time.perf_counter() - received)
+
+    async def run(self, host='127.0.0.1', port=5005):
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.transport, _ = await loop.create_datagram_endpoint(lambda: IngestProtocol(self), local_addr=(host, port))
+        self.running = True
+        try:
+            while self.running:
+                received, data = await self.queue.get()
+                payload = [data]
+                # coalesce everything that arrived in the meantime into one block
+                while not self.queue.empty():
+                    _, data = self.queue.get_nowait()
+                    payload.append(data)
+                frames = np.frombuffer(b''.join(payload), dtype=self.dtype).reshape(-1, self.n_columns)
+                if len(frames) > 0:
+                    self.process_block(frames, received)
+        finally:
+            self.transport.close()
+
+    def stop(self):
+        self.running = False
+        if self.queue is not None:
+            # wake up the run loop with an empty datagram
+            if self.queue.full():
+                self.queue.get_nowait()
+            self.queue.put_nowait((time.perf_counter(), b''))
+
+    def channel(self, name):
+        for channel in self.channels:
+            if channel.name == name:
+                return channel
+        raise ValueError('Unknown channel ', name)
+
+
+async def replay_csv(filename, n_columns, sampling_freq, host='127.0.0.1', port=5005, frames_per_datagram=50, skip_header=1, speed=1, dtype='<f8'):
+    """replays a recorded capture over UDP at (a multiple of) the original sampling rate, stands in for the test stand
+
+    :param filename: csv capture as written by the test stand
+    :param sampling_freq: sampling frequency of the capture [Hz]
+    :param frames_per_datagram: number of frames packed into one datagram
+    :param speed: replay speed relative to real time
+    """
+    data = np.genfromtxt(filename, delimiter=',', skip_header=skip_header)[:, :n_columns].astype(dtype)
+
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+    period = frames_per_datagram/sampling_freq/speed
+    start = time.perf_counter()
+    try:
+        for i, idx in enumerate(range(0, len(data), frames_per_datagram)):
+            transport.sendto(data[idx:idx+frames_per_datagram].tobytes())
+            delay = start + (i+1)*period - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    finally:
+        transport.close()
+
+
+if __name__ == '__main__':
+
+    # pressure sensor channels and calibrations as in run.py
+    ps_filter_order = 5
+    ps_filter_cutoff = 0.08
+    buffer_size = 60*1000                      # one minute at 1 kHz
+
+    channels = [
+        Channel('LOx tank', 0, 6250, -24, buffer_size, ps_filter_order, ps_filter_cutoff, Redline(high=60, persistence=5)),
+        Channel('LOx manifold', 1, 15100, -59, buffer_size, ps_filter_order, ps_filter_cutoff),
+        Channel('ethanol tank', 2, 6250, -24, buffer_size, ps_filter_order, ps_filter_cutoff, Redline(high=60, persistence=5)),
+        Channel('ethanol manifold', 3, 6250, -24, buffer_size, ps_filter_order, ps_filter_cutoff),
+        Channel('chamber 1', 4, 3750, -14, buffer_size, ps_filter_order, ps_filter_cutoff, Redline(high=45, persistence=5)),
+        Channel('chamber 2', 5, 3750, -14, buffer_size, ps_filter_order, ps_filter_cutoff, Redline(high=45, persistence=5)),
+    ]
+
+    service = IngestService(channels, n_columns=7, time_column=6, ticks=1e6, buffer_size=buffer_size)
+
+    async def main():
+        ingest = asyncio.create_task(service.run())
+        await asyncio.sleep(0.1)
+        await replay_csv('Hot2PS.csv', 7, 1000, speed=5)
+        await asyncio.sleep(0.5)
+        service.stop()
+        await ingest
+
+    asyncio.run(main())
+    for key, value in service.counters.summary().items():
+        print(key, ': ', value)
+    print('peak chamber pressure: ', max(service.channel('chamber 1').filtered.latest()), '[bar]')
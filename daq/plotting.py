@@ -57,4 +57,30 @@ def massflow_plot(data, times, coefficients, labels):
     plt.ylabel('mass flow [kg/s]')
     plt.title('injector mass flow')
     plt.grid()
-    plt.show()
\ No newline at end of file
+    plt.show()
+
+def coherence_plot(times, freqs, coherence, phase, title):
+    fig, axes = plt.subplots(nrows=2, sharex=True)
+    c = axes[0].pcolormesh(times, freqs, coherence.T, vmin=0, vmax=1, shading='auto')
+    axes[0].set_ylabel('frequency [Hz]')
+    axes[0].set_title(title + ' coherence [-]')
+    fig.colorbar(c, ax=axes[0])
+
+    # phase only shown where the channels are coherent
+    masked_phase = np.ma.masked_where(coherence < 0.5, np.degrees(phase))
+    c = axes[1].pcolormesh(times, freqs, masked_phase.T, vmin=-180, vmax=180, cmap='twilight', shading='auto')
+    axes[1].set_xlabel('time [s]')
+    axes[1].set_ylabel('frequency [Hz]')
+    axes[1].set_title(title + ' phase [deg]')
+    fig.colorbar(c, ax=axes[1])
+    plt.show()
+
+
+def correlation_plot(times, lags, correlation, title):
+    fig, ax = plt.subplots(nrows=1)
+    c = ax.pcolormesh(times, lags*1e3, correlation.T, vmin=-1, vmax=1, cmap='RdBu_r', shading='auto')
+    ax.set_xlabel('time [s]')
+    ax.set_ylabel('lag [ms]')
+    fig.colorbar(c)
+    plt.title(title)
+    plt.show()
@@ -1,7 +1,7 @@
 import numpy as np
 
-from analysis import filtering, get_ps_data, get_lc_data, get_mass_flow, get_discharge_coeff, get_time, get_dyn_pressure
-from plotting import plot_spectrum, pressure_plot, loadcell_plot, massflow_plot
+from analysis import filtering, get_ps_data, get_lc_data, get_mass_flow, get_discharge_coeff, get_time, get_dyn_pressure, cross_spectral_analysis
+from plotting import plot_spectrum, pressure_plot, loadcell_plot, massflow_plot, coherence_plot, correlation_plot
 
 
 # Data import 
@@ -64,4 +64,9 @@ pressure_plot([ps_chamber_1_filt, ps_chamber_2_filt], [ps_time, ps_time], ['cham
 loadcell_plot([lc_ethanol_tank_filt, lc_lox_tank_filt], [lc_time, lc_time], ['ethanol tank', 'LOx tank'], 'kg')
 
 plot_spectrum(ps_time, ps_chamber_1, 1000, 'Spectrum Chamber PS 1')
-plot_spectrum(ps_time, ps_chamber_2, 1000, 'Spectrum Chamber PS 2')
\ No newline at end of file
+plot_spectrum(ps_time, ps_chamber_2, 1000, 'Spectrum Chamber PS 2')
+
+# Chamber transducer cross-spectral analysis, separates acoustic modes from sensor noise
+times, freqs, coherence, phase, lags, correlation = cross_spectral_analysis(ps_chamber_1, ps_chamber_2, 1000)
+coherence_plot(ps_time[0] + times, freqs, coherence, phase, 'Chamber PS 1 / PS 2')
+correlation_plot(ps_time[0] + times, lags, correlation, 'Cross-correlation Chamber PS 1 / PS 2')
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import analysis
+
+
+def test_cross_spectral_analysis_chunk_invariant():
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal(20000)
+    y = x + rng.standard_normal(20000)
+
+    for n_average in (2, 8):
+        reference = analysis.cross_spectral_analysis(x, y, 1e4, nperseg=256, noverlap=128, n_average=n_average, chunk_segments=10**6)
+        for chunk_segments in sorted({1, n_average - 1, n_average, 13, 100}):
+            if chunk_segments < n_average - 1:
+                continue
+            result = analysis.cross_spectral_analysis(x, y, 1e4, nperseg=256, noverlap=128, n_average=n_average, chunk_segments=chunk_segments)
+            times, freqs, coherence, phase, lags, correlation = result
+            assert not np.isnan(coherence).any() and not np.isnan(correlation).any()
+            assert coherence.min() >= 0 and coherence.max() <= 1 + 1e-12
+            np.testing.assert_allclose(times, reference[0])
+            np.testing.assert_allclose(coherence, reference[2], atol=1e-10)
+            np.testing.assert_allclose(np.exp(1j*phase), np.exp(1j*reference[3]), atol=1e-8)
+            np.testing.assert_allclose(correlation, reference[5], atol=1e-10)
+
+
+def test_cross_spectral_analysis_invalid_arguments():
+    x = np.random.default_rng(1).standard_normal(5000)
+    with pytest.raises(ValueError):
+        analysis.cross_spectral_analysis(x, x, 1e4, nperseg=256, noverlap=256)
+    with pytest.raises(ValueError):
+        analysis.cross_spectral_analysis(x, x, 1e4, nperseg=256, noverlap=128, n_average=8, chunk_segments=3)
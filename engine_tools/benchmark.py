@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import types
+import platform
+import subprocess
+import importlib.util
+import numpy as np
+import scipy
+import thermo
+
+import engine_tools as et
+import injectors
+
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# contour resolutions of the scaling curves
+STATIONS = (50, 500, 5000)
+
+# throat gas properties of 80 % ethanol / LOX at 50 bar and O/F 1.49 (eps 5), recorded from rocketcea so the benchmark
+# runs without the FORTRAN CEA. Only the major species of the throat column are kept for the radiation model
+CEA_THROAT = {
+	'chamber_pressure': 50e5,
+	'Cp': 2203.39,
+	'mu': 1.05239e-4,
+	'k': 0.330718,
+	'Pr': 0.700677,
+	'MW': 24.237,
+	'gamma': 1.12255,
+	'isp': 275.143,
+	'cstar': 1639.80,
+	'T_static': 3235.20,
+	'mole_fractions': ({'*CO2': 44.0095, 'H2O': 18.01528}, {'*CO2': [0.200733, 0.200733, 0.213651, 0.267944], 'H2O': [0.535015, 0.535015, 0.549822, 0.604692]}),
+}
+
+
+def offline_cea():
+	"""CEAProperties of CEA_THROAT, replaces the CEA object of Heattransfer"""
+	return et.CEAProperties(types.SimpleNamespace(**CEA_THROAT))
+
+
+def synthetic_contour(n_stations, chamber_radius=0.066, throat_radius=0.025, exit_radius=0.07, cylinder_length=0.15, throat_position=0.26, length=0.43):
+	"""chamber contour with n_stations equally spaced in x: cylinder, cosine shaped convergent to the throat and cosine
+	shaped divergent to the exit. Proportions of optimised_geometry.csv, the throat radius is always one station
+
+	:return: array of x and y coordinates in injector to nozzle order [m]
+	"""
+	x = np.linspace(0, length, n_stations)
+	convergent = np.clip((x - cylinder_length)/(throat_position - cylinder_length), 0, 1)
+	divergent = np.clip((x - throat_position)/(length - throat_position), 0, 1)
+	y = np.where(x <= throat_position,
+				throat_radius + (chamber_radius - throat_radius)*(1 + np.cos(np.pi*convergent))/2,
+				throat_radius + (exit_radius - throat_radius)*(1 - np.cos(np.pi*divergent))/2)
+	y[np.argmin(np.abs(x - throat_position))] = throat_radius
+	return np.column_stack([x, y])
+
+
+def load_module(path, name, requires=None):
+	"""imports a script of another folder of the repo under name. The folders are not packages and share module names
+	(geom_class), requires maps the import names a script uses to the files they are loaded from while it is imported
+
+	:param path: path of the script relative to the repo root
+	"""
+	requires = requires or {}
+	saved = {import_name: sys.modules.get(import_name) for import_name in requires}
+	try:
+		for import_name, dependency in requires.items():
+			sys.modules[import_name] = load_module(dependency, name + '_' + import_name)
+		spec = importlib.util.spec_from_file_location(name, os.path.join(REPO, path))
+		module = importlib.util.module_from_spec(spec)
+		spec.loader.exec_module(module)
+	finally:
+		for import_name, previous in saved.items():
+			if previous is None:
+				sys.modules.pop(import_name, None)
+			else:
+				sys.modules[import_name] = previous
+	return module
+
+
+def timed(function, repeat=3, budget=10):
+	"""wall times of repeated calls of function, at least one call and further calls until repeat or the time budget [s] is reached"""
+	times = []
+	while len(times) < repeat and sum(times) < budget:
+		start = time.perf_counter()
+		function()
+		times.append(time.perf_counter() - start)
+	return times
+
+
+# Benchmark cases. Every case takes a size and returns the function to time, setup is not timed.
+
+def isentropic_mach(n_stations):
+	contour = synthetic_contour(n_stations)
+	throat_area = np.pi*min(contour[:,1])**2
+	throat = np.argmin(contour[:,1])
+	isentropic = et.Isentropic(CEA_THROAT['chamber_pressure'], CEA_THROAT['T_static'], CEA_THROAT['gamma'])
+
+	def run():
+		for i, y in enumerate(contour[:,1]):
+			isentropic.mach(np.pi*y**2, throat_area, i > throat)
+	return run
+
+
+def heatflux(n_stations):
+	contour = synthetic_contour(n_stations)
+	hydraulic_diameter = np.full(n_stations, 1.05e-3)
+	wall_thickness = np.full(n_stations, 0.7e-3)
+
+	def run():
+		heat = et.Heattransfer(['C2H5OH', 'H2O'], [0.8, 0.2], 5.8/2.49, 5.8, None, None, 1.49, 50e5, 288, 75e5, contour, 84, 24, 'cinjarew', 1.2, 0, cea=offline_cea())
+		heat.heatflux(hydraulic_diameter.copy(), contour, wall_thickness)
+	return run
+
+
+def cooling_geometry(n_stations):
+	geom_class = load_module('engine_tools/film_cooling/geom_class.py', 'film_geom_class')
+	contour = synthetic_contour(n_stations)
+	channels = geom_class.parameters(ri=contour[0,1], t=2e-3, wt1=0.6e-3, wt2=0.6e-3, rf1=0.1e-3, rf2=0.1e-3, N=42)
+
+	def run():
+		channels.cooling_geometry(contour[:,1][::-1])
+	return run
+
+
+def physics(n_sections):
+	"""SLSQP channel optimisation of n_sections stations spread over the contour. Every section is an independent
+	optimisation of 3-6 s, so the cost is n_sections times the cost per section and does not depend on the contour
+	resolution: the station sizes would only repeat the same measurement for up to 7 hours"""
+	pressuredrop = load_module('cooling_optimisation/pressuredrop.py', 'pressuredrop', requires={'geom_class': 'cooling_optimisation/geom_class.py'})
+	radii = synthetic_contour(n_sections)[:,1]
+	in718 = pressuredrop.metal(E=([208e9,205e9,202e9,194e9,186e9,179e9,172e9,162e9,127e9,78e9],[294,366,477,589,700,742,811,1033,1144,1227]),k=24,v=0.33,alpha=12e-6,sig_yield=([1150e6,1150e6,950e6,650e6,0],[273,323,973,1123,1533]))
+	fluid = thermo.Chemical('C2H5OH', T=350, P=50e5)
+
+	def run():
+		for y in radii:
+			section = pressuredrop.sim(700, 3000, 350, 5000, 0, 70e5, 50e5, y, 1, 0)
+			pressuredrop.physics(pressuredrop.parameters(ri=y, t=1.2e-3, wt1=0.6e-3, wt2=0.4e-3, rf1=0.1e-3, rf2=0.1e-3, N=42), in718, section, fluid)
+	return run
+
+
+def injector_sizing_loop(n_elements):
+	"""one LiquidInjector.injector fixed point iteration per element"""
+	injector = injectors.LiquidInjector(['o2'], [1], 90, 60e5, 2e-3, 0.1, 10e5, np.pi/2)
+	massflows = np.linspace(0.02, 0.2, n_elements)
+
+	def run():
+		for massflow in massflows:
+			injector.massflow = massflow
+			injector.injector()
+	return run
+
+
+def injector_sizing_array(n_elements):
+	injector = injectors.LiquidInjector(['o2'], [1], 90, 60e5, 2e-3, 0.1, 10e5, np.pi/2)
+	massflows = np.linspace(0.02, 0.2, n_elements)
+
+	def run():
+		injector.injector_array(massflow=massflows)
+	return run
+
+
+def annulus_sizing_loop(n_elements):
+	injector = injectors.AnnulusInjector(['c2h5oh','h2o'], [0.9,0.1], 410, 62.5e5, 2e-3, 30e-3, 2.227, 13.3e5)
+	massflows = np.linspace(0.5, 3, n_elements)
+
+	def run():
+		for massflow in massflows:
+			injector.massflow = massflow
+			injector.injector()
+	return run
+
+
+def tradeoff_sensitivity(n_samples):
+	"""serial monte carlo samples of the cooling tradeoff, get_sens_linux maps the same function on a process pool"""
+	tc = load_module('tradeoff/tradeoff_class.py', 'tradeoff_class')
+	params = [tc.param(name="Cost of external services",weight=0.155,Limitype ="fixed",Limit_val=[1,5]),
+			tc.param(name="Impact on ISP",weight=0.0863,Limitype ="SD",Limit_val=1.2),
+			tc.param(name="system mass",weight=0.131,Limitype ="SD",Limit_val=1.4, direc="LB"),
+			tc.param(name="Fraction of reusable parts",weight=0.213,Limitype ="fixed",Limit_val=[1,5]),
+			tc.param(name="Development complexity",weight=0.415,Limitype ="fixed",Limit_val=[1,5])]
+	designs = [tc.design(name="Film Cooling",sourcelist=[4.333, 96, 10.56, 4.6667, 2.6667]),
+			tc.design(name="Ablative Cooling",sourcelist=[4.333, 100, 6.27, 2, 4.3333]),
+			tc.design(name="Regenerative Cooling",sourcelist=[1.6667, 100, 0, 5, 2.333]),
+			tc.design(name="Ablative Cooling with Film Cooling",sourcelist=[3, 98, 8.42, 2.6667, 2.333])]
+	tradeoff = tc.tradeoff(design_list=designs, param_list=params)
+	tradeoff.get_tradeoff()
+	sensitivity = tc.sensitivity(tradeoff, n_samples)
+	sensitivity.addto_technical(0.5)
+
+	def run():
+		np.random.seed(0)
+		for n in range(n_samples):
+			sensitivity.sens(n)
+	return run
+
+
+# name, case and sizes of every benchmark
+CASES = [
+	('isentropic_mach', isentropic_mach, STATIONS),
+	('heatflux', heatflux, STATIONS),
+	('cooling_geometry', cooling_geometry, STATIONS),
+	# sections, not stations: the cost per section is independent of the resolution, channel_optimiser runs 103
+	('physics', physics, (1, 4)),
+	('injector_sizing_loop', injector_sizing_loop, STATIONS),
+	('injector_sizing_array', injector_sizing_array, STATIONS),
+	('annulus_sizing_loop', annulus_sizing_loop, STATIONS),
+	('tradeoff_sensitivity', tradeoff_sensitivity, (100, 1000, 10000)),
+]
+
+
+def environment():
+	"""versions and commit the results were measured with"""
+	try:
+		commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO, capture_output=True, text=True).stdout.strip()
+	except OSError:
+		commit = ''
+	return {
+		'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+		'commit': commit,
+		'python': platform.python_version(),
+		'numpy': np.__version__,
+		'scipy': scipy.__version__,
+		'thermo': thermo.__version__,
+		'machine': platform.machine(),
+		'processor': platform.processor(),
+	}
+
+
+def run(cases=None, repeat=3, budget=10, verbose=True):
+	"""runs the benchmark cases
+
+	:param cases: names of the cases to run, all CASES if None
+	:param repeat: maximum number of timed calls per case and size
+	:param budget: no further repeats once the calls of a case and size took longer than budget [s]
+	:return: dictionary of the environment and, per case, the sizes, best and median time [s] and all times
+	"""
+	results = {'environment': environment(), 'cases': {}}
+	for name, case, sizes in CASES:
+		if cases is not None and name not in cases:
+			continue
+		entry = {'sizes': list(sizes), 'best': [], 'median': [], 'times': []}
+		for size in sizes:
+			times = timed(case(size), repeat, budget)
+			entry['best'].append(min(times))
+			entry['median'].append(float(np.median(times)))
+			entry['times'].append(times)
+			if verbose:
+				print(name, ' ', size, ': ', round(min(times)*1e3, 2), '[ms]')
+		# slope of the log-log scaling curve, 1 for linear cost in the size
+		entry['scaling'] = float(np.polyfit(np.log(sizes), np.log(entry['best']), 1)[0])
+		results['cases'][name] = entry
+	return results
+
+
+def save(results, filename):
+	with open(filename, 'w') as file:
+		json.dump(results, file, indent=1)
+
+
+def load(filename):
+	with open(filename) as file:
+		return json.load(file)
+
+
+def compare(reference, results, threshold=0.1):
+	"""relative change of the best times of results to reference for the cases and sizes both contain, positive is slower
+
+	:param threshold: relative change above which a case is reported as slower or faster
+	:return: dictionary of case name and list of (size, relative change)
+	"""
+	changes = {}
+	for name, entry in results['cases'].items():
+		if name not in reference['cases']:
+			continue
+		previous = dict(zip(reference['cases'][name]['sizes'], reference['cases'][name]['best']))
+		changes[name] = [(size, best/previous[size] - 1) for size, best in zip(entry['sizes'], entry['best']) if size in previous]
+		for size, change in changes[name]:
+			label = 'slower' if change > threshold else 'faster' if change < -threshold else 'unchanged'
+			print(name, ' ', size, ': ', round(100*change, 1), '% ', label)
+	return changes
+
+
+if __name__ == '__main__':
+	# python benchmark.py [reference.json], results are written to benchmarks/<commit>_<date>.json
+	results = run()
+	os.makedirs('benchmarks', exist_ok=True)
+	filename = os.path.join('benchmarks', results['environment']['commit'] + '_' + time.strftime('%Y%m%d_%H%M%S') + '.json')
+	save(results, filename)
+	print('results written to ', filename)
+
+	if len(sys.argv) > 1:
+		compare(load(sys.argv[1]), results)
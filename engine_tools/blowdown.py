@@ -0,0 +1,167 @@
+import numpy as np
+from scipy import sparse
+from scipy.integrate import solve_ivp
+
+from engine_tools import Pressurefed, pressurant_mass_sutton
+
+
+def gas_massflow(area, upstream_pressure, upstream_temperature, downstream_pressure, gamma, R, ratio_linear=0.99):
+	"""ideal gas mass flow through an orifice, choked or subcritical, no reverse flow. The subcritical flow function has
+	an infinite slope at equal pressures, above ratio_linear it is replaced by a line to zero to keep the Jacobian finite"""
+	ratio = np.clip(downstream_pressure/upstream_pressure, 0, 1)
+	critical = (2/(gamma+1))**(gamma/(gamma-1))
+	psi_choked = np.sqrt(gamma) * (2/(gamma+1))**((gamma+1)/(2*(gamma-1)))
+	subcritical = lambda r: np.sqrt(2*gamma/(gamma-1) * np.maximum(r**(2/gamma) - r**((gamma+1)/gamma), 0))
+	psi_linear = subcritical(ratio_linear)*(1 - ratio)/(1 - ratio_linear)
+	psi = np.where(ratio <= critical, psi_choked, np.where(ratio < ratio_linear, subcritical(ratio), psi_linear))
+	return area*upstream_pressure*psi/np.sqrt(R*upstream_temperature)
+
+
+class Blowdown(Pressurefed):
+	def __init__(self, oxidiser, fuel, pressurant, massflow_oxidiser, massflow_fuel, tankpressure, storagepressure, temperature_oxidiser, temperature_fuel, temperature_pressurant, burntime, chamber_pressure, storage_volume=None, tank_volume=None, ullage=0.05, margin=0.05, regulator_droop=0.5e5, regulator_area=None):
+		"""transient regulated pressurisation of the propellant tanks from a pressurant storage bottle, integrated with a
+		stiff ODE solver for a batch of designs at once. storagepressure, storage_volume and tank_volume may be arrays and
+		are broadcast against each other, every element is one design.
+
+		The regulator is a proportional valve, fully open at regulator_droop below the tank pressure setpoint. Gas flows
+		choked or subcritical from the bottle into the common ullage of both tanks. Bottle and ullage are adiabatic ideal
+		gas volumes. Propellant leaves through a fixed feed resistance into a chamber whose pressure scales with mass flow,
+		so the propellant flow drops once regulation is lost and the tanks blow down. The ideal gas properties of the
+		pressurant (Cpg, Cvg, R) only depend on its temperature and are shared, its density and the default bottle volume
+		follow from the storage pressure of every design.
+
+		:param chamber_pressure: nominal chamber pressure [Pa]
+		:param storage_volume: pressurant bottle volume [m^3], defaults to the pressurant_mass_sutton sizing at the storage pressure of every design
+		:param tank_volume: combined propellant tank volume [m^3], defaults to the burn volume with margin and ullage
+		:param regulator_droop: pressure below the setpoint at which the regulator is fully open [Pa]
+		:param regulator_area: effective flow area of the fully open regulator [m^2], defaults to twice the nominal demand at 1.5 times the setpoint
+		"""
+		storagepressure = np.asarray(storagepressure, dtype=float)
+		super().__init__(oxidiser, fuel, pressurant, massflow_oxidiser, massflow_fuel, tankpressure, np.max(storagepressure), temperature_oxidiser, temperature_fuel, temperature_pressurant, burntime)
+
+		self.chamber_pressure = chamber_pressure
+		self.gamma = self.pressurant.Cpg/self.pressurant.Cvg
+		self.R = self.pressurant.R_specific
+		self.volumeflow = self.massflow_oxidiser/self.oxidiser.rho + self.massflow_fuel/self.fuel.rho		# nominal [m^3/s]
+
+		if storage_volume is None:
+			storage_volume = pressurant_mass_sutton(self.tankpressure, storagepressure, self.propellant_volume(margin), self.gamma, self.R, self.pressurant.T, self.avg_prop_temperature())[1]
+		if tank_volume is None:
+			tank_volume = self.volumeflow*self.burntime*(1 + margin)*(1 + ullage)
+		# designs are stored flat, results are reshaped to the broadcast shape of the inputs
+		storagepressure, storage_volume, tank_volume = np.broadcast_arrays(storagepressure, np.asarray(storage_volume, dtype=float), np.asarray(tank_volume, dtype=float))
+		self.shape = storagepressure.shape
+		self.storagepressure = storagepressure.ravel()
+		self.storage_volume = storage_volume.ravel()
+		self.tank_volume = tank_volume.ravel()
+		self.n = self.storagepressure.size
+		self.ullage = ullage
+		self.propellant_volume0 = self.tank_volume/(1 + ullage)
+		self.regulator_droop = regulator_droop
+
+		if regulator_area is None:
+			demand = self.tankpressure*self.volumeflow/(self.R*self.pressurant.T)
+			regulator_area = 2*demand/gas_massflow(1, 1.5*self.tankpressure, self.pressurant.T, self.tankpressure, self.gamma, self.R)
+		self.regulator_area = regulator_area
+
+	def propellant_flow(self, ullage_pressure):
+		"""propellant mass flow relative to nominal, from r^2*dp_nominal + r*Pc_nominal = P_ullage"""
+		dp = self.tankpressure - self.chamber_pressure
+		pc = self.chamber_pressure
+		return (-pc + np.sqrt(pc*pc + 4*dp*np.maximum(ullage_pressure, 0)))/(2*dp)
+
+	def rhs(self, t, y):
+		m_s, T_s, m_u, T_u, V_p = y.reshape(5, -1)
+		cv = self.R/(self.gamma - 1)
+		cp = cv + self.R
+
+		# the implicit solver may probe unphysical states, keep masses, temperatures and volumes positive
+		m_s = np.maximum(m_s, 1e-12)
+		m_u = np.maximum(m_u, 1e-12)
+		T_s = np.maximum(T_s, 1)
+		T_u = np.maximum(T_u, 1)
+		P_s = m_s*self.R*T_s/self.storage_volume
+		V_u = np.maximum(self.tank_volume - np.maximum(V_p, 0), 1e-9)
+		P_u = m_u*self.R*T_u/V_u
+
+		opening = np.clip((self.tankpressure - P_u)/self.regulator_droop, 0, 1)
+		m_r = gas_massflow(opening*self.regulator_area, P_s, T_s, P_u, self.gamma, self.R)
+		# outflow ramps to zero over the last 0.1 % of the load instead of switching off at depletion
+		Q = self.propellant_flow(P_u)*self.volumeflow*np.clip(V_p/(1e-3*self.propellant_volume0), 0, 1)
+
+		dm_s = -m_r
+		dT_s = -m_r*self.R*T_s/(m_s*cv)
+		dm_u = m_r
+		dT_u = (m_r*(cp*T_s - cv*T_u) - P_u*Q)/(m_u*cv)
+		dV_p = -Q
+		return np.concatenate([dm_s, dT_s, dm_u, dT_u, dV_p])
+
+	def simulate(self, t_max=None, method='BDF', n_points=500, rtol=1e-6, atol=None):
+		"""integrates all designs until every tank is empty or t_max (default three burn times) is reached
+
+		:param method: stiff scipy solve_ivp method, 'BDF' or 'Radau'
+		:param n_points: number of output time steps
+		"""
+		t_max = 3*self.burntime if t_max is None else t_max
+		T0 = np.full(self.n, self.pressurant.T)
+		V_p0 = self.propellant_volume0
+		m_s0 = self.storagepressure*self.storage_volume/(self.R*T0)
+		m_u0 = self.tankpressure*(self.tank_volume - V_p0)/(self.R*T0)
+		y0 = np.concatenate([m_s0, T0, m_u0, T0, V_p0])
+
+		if atol is None:
+			atol = 1e-8*np.abs(y0) + 1e-12
+
+		def depleted(t, y):
+			return np.max(y[4*self.n:]/V_p0) - 1e-4
+		depleted.terminal = True
+		depleted.direction = -1
+
+		# designs are independent, every 5x5 block couples the states of one design
+		sparsity = sparse.kron(np.ones((5, 5)), sparse.identity(self.n), format='csc')
+
+		self.solution = solve_ivp(self.rhs, (0, t_max), y0, method=method, events=depleted, dense_output=True, jac_sparsity=sparsity, rtol=rtol, atol=atol)
+		if not self.solution.success:
+			raise ValueError('Blowdown integration failed: ', self.solution.message)
+
+		self.time = np.linspace(0, self.solution.t[-1], n_points)
+		m_s, T_s, m_u, T_u, V_p = self.solution.sol(self.time).reshape(5, self.n, n_points)
+		V_p = np.maximum(V_p, 0)
+		P_u = m_u*self.R*T_u/(self.tank_volume[:, np.newaxis] - V_p)
+		shape = self.shape + (n_points,)
+		self.storage_pressure = (m_s*self.R*T_s/self.storage_volume[:, np.newaxis]).reshape(shape)
+		self.storage_temperature = T_s.reshape(shape)
+		self.tank_pressure = P_u.reshape(shape)
+		self.ullage_temperature = T_u.reshape(shape)
+		self.propellant_volume = V_p.reshape(shape)
+		self.massflow = (self.propellant_flow(P_u)*np.clip(V_p/(1e-3*V_p0[:, np.newaxis]), 0, 1)*(self.massflow_oxidiser + self.massflow_fuel)).reshape(shape)
+
+		# first output time at which a design is empty or its tank pressure leaves the regulator band
+		empty = V_p <= 1e-3*V_p0[:, np.newaxis]
+		unregulated = (P_u < self.tankpressure - self.regulator_droop) & ~empty
+		depletion_time = np.where(empty.any(axis=1), self.time[np.argmax(empty, axis=1)], np.nan)
+		regulation_time = np.where(unregulated.any(axis=1), self.time[np.argmax(unregulated, axis=1)], depletion_time)
+		self.depletion_time = depletion_time.reshape(self.shape)
+		self.regulation_time = regulation_time.reshape(self.shape)
+		self.residual_pressurant = m_s[:, -1].reshape(self.shape)
+		return self.solution
+
+
+if __name__ == '__main__':
+	import time
+
+	storage_pressures = np.linspace(150e5, 300e5, 16)			# [Pa]
+	storage_volumes = np.linspace(20e-3, 80e-3, 16)				# [m^3]
+	P, V = np.meshgrid(storage_pressures, storage_volumes, indexing='ij')
+
+	blowdown = Blowdown('o2', 'ethanol', 'n2', 3.72, 2.08, 60e5, P, 90, 288, 288, 20, 50e5, storage_volume=V)
+	start = time.perf_counter()
+	blowdown.simulate()
+	print('designs: ', blowdown.n, ', integration time: ', round(time.perf_counter() - start, 2), 's, steps: ', len(blowdown.solution.t))
+
+	regulated = blowdown.regulation_time >= blowdown.burntime
+	for i, p in enumerate(storage_pressures):
+		if regulated[i].any():
+			print('storage pressure ', p/1e5, '[bar]: smallest bottle regulated for the full burn ', storage_volumes[np.argmax(regulated[i])]*1e3, '[l]')
+		else:
+			print('storage pressure ', p/1e5, '[bar]: no bottle regulated for the full burn')
@@ -0,0 +1,165 @@
+import numpy as np
+from scipy.optimize import least_squares
+
+import injectors
+import fluid_cache
+
+
+class ColdFlowRun():
+	def __init__(self, name, element, table, pressuredrop, massflow, temperature, length, upstream_pressure=None, n_elements=1, diameter=None, xiinlet=None, annulusdiameter=None, width=None):
+		"""one cold flow test of an injector, pressure drop and measured total mass flow sampled at the same instants
+
+		:param element: 'liquid' for orifices (diameter, xiinlet) or 'annulus' for annular gaps (annulusdiameter, width)
+		:param table: FluidTable of the test fluid
+		:param pressuredrop: array of pressure drops over the injector [Pa]
+		:param massflow: array of measured total mass flows [kg/s]
+		:param temperature: fluid temperature [K], scalar or array
+		:param upstream_pressure: manifold pressure [Pa] at which properties are evaluated, defaults to pressure drop plus ambient
+		:param n_elements: number of identical elements the measured flow is split over
+		:param xiinlet: inlet loss of a liquid orifice, as returned by LiquidInjector.xiinlet
+		:param annulusdiameter: pintle diameter of an annulus [m]
+		:param width: annulus gap [m]
+		"""
+		if element not in ('liquid', 'annulus'):
+			raise ValueError('Invalid element type ', element, ', use "liquid" or "annulus"')
+		self.name = name
+		self.element = element
+		self.pressuredrop = np.asarray(pressuredrop, dtype=float)
+		self.massflow = np.asarray(massflow, dtype=float)
+		if self.pressuredrop.shape != self.massflow.shape:
+			raise ValueError('Pressure drop and mass flow of run ', name, ' do not have the same length')
+		if upstream_pressure is None:
+			upstream_pressure = self.pressuredrop + 1e5
+		self.rho, self.viscosity = table(temperature, upstream_pressure)
+		self.length = length
+		self.n_elements = n_elements
+		self.diameter = diameter
+		self.xiinlet = xiinlet
+		self.annulusdiameter = annulusdiameter
+		self.width = width
+
+
+class CdCalibration():
+	def __init__(self, runs):
+		"""joint least squares fit of the LiquidInjector.xi1c curve fit and the AnnulusInjector inlet loss to any number
+		of cold flow runs. All points of all runs of one element type are stacked into single arrays, so every model
+		evaluation is one vectorised call per element type. Residuals are relative mass flow errors, scaled by
+		1/sqrt(n) per run so long runs do not dominate short ones.
+
+		:param runs: list of ColdFlowRun
+		"""
+		self.runs = runs
+		self.liquid = self._stack([run for run in runs if run.element == 'liquid'], ('diameter', 'xiinlet'))
+		self.annulus = self._stack([run for run in runs if run.element == 'annulus'], ('annulusdiameter', 'width'))
+
+		self.xi1c_coefficients = injectors.XI1C_COEFFICIENTS
+		self.annulus_xiinlet = injectors.ANNULUS_XIINLET
+
+	@staticmethod
+	def _stack(runs, geometry):
+		if len(runs) == 0:
+			return None
+		columns = {}
+		for name in ('pressuredrop', 'massflow', 'rho', 'viscosity'):
+			columns[name] = np.concatenate([np.broadcast_to(getattr(run, name), run.pressuredrop.shape) for run in runs])
+		for name in ('length', 'n_elements') + geometry:
+			columns[name] = np.concatenate([np.full(run.pressuredrop.shape, getattr(run, name), dtype=float) for run in runs])
+		columns['weight'] = np.concatenate([np.full(run.pressuredrop.shape, 1/np.sqrt(len(run.pressuredrop))) for run in runs])
+		columns['run'] = np.concatenate([np.full(run.pressuredrop.shape, i) for i, run in enumerate(runs)])
+		columns['runs'] = runs
+		return columns
+
+	def predict(self, xi1c_coefficients=None, annulus_xiinlet=None):
+		"""model total mass flows of the stacked liquid and annulus points, None for an element type without runs"""
+		xi1c_coefficients = self.xi1c_coefficients if xi1c_coefficients is None else xi1c_coefficients
+		annulus_xiinlet = self.annulus_xiinlet if annulus_xiinlet is None else annulus_xiinlet
+
+		liquid_massflow = None
+		if self.liquid is not None:
+			p = self.liquid
+			_, massflow, _ = injectors.liquid_injector_flow(p['rho'], p['viscosity'], p['length'], p['diameter'], p['pressuredrop'], p['xiinlet'], xi1c_coefficients=xi1c_coefficients)
+			liquid_massflow = massflow*p['n_elements']
+
+		annulus_massflow = None
+		if self.annulus is not None:
+			p = self.annulus
+			_, massflow, _ = injectors.annulus_injector_flow(p['rho'], p['viscosity'], p['length'], p['annulusdiameter'], p['width'], p['pressuredrop'], annulus_xiinlet)
+			annulus_massflow = massflow*p['n_elements']
+
+		return liquid_massflow, annulus_massflow
+
+	def _unpack(self, x):
+		xi1c_coefficients = tuple(x[:3]) if self.liquid is not None else self.xi1c_coefficients
+		annulus_xiinlet = x[-1] if self.annulus is not None else self.annulus_xiinlet
+		return xi1c_coefficients, annulus_xiinlet
+
+	def residuals(self, x):
+		liquid_massflow, annulus_massflow = self.predict(*self._unpack(x))
+		residuals = []
+		for stacked, massflow in ((self.liquid, liquid_massflow), (self.annulus, annulus_massflow)):
+			if stacked is not None:
+				residuals.append((massflow - stacked['massflow'])/stacked['massflow']*stacked['weight'])
+		return np.concatenate(residuals)
+
+	def fit(self, **kwargs):
+		"""fits the xi1c coefficients (if there are liquid runs) and the annulus inlet loss (if there are annulus runs),
+		starting from the current values. Keyword arguments are passed to scipy.optimize.least_squares"""
+		if self.liquid is None and self.annulus is None:
+			raise ValueError('No cold flow runs to fit')
+
+		x0 = []
+		lower = []
+		if self.liquid is not None:
+			x0 += list(self.xi1c_coefficients)
+			lower += [0, 0, -np.inf]
+		if self.annulus is not None:
+			x0.append(self.annulus_xiinlet)
+			lower.append(0)
+
+		self.result = least_squares(self.residuals, x0, bounds=(lower, np.inf), **kwargs)
+		self.xi1c_coefficients, self.annulus_xiinlet = self._unpack(self.result.x)
+		return self.xi1c_coefficients, self.annulus_xiinlet
+
+	def apply(self):
+		"""sets the current coefficients as injectors.XI1C_COEFFICIENTS and injectors.ANNULUS_XIINLET, used by all
+		injector classes and flow functions from then on"""
+		injectors.XI1C_COEFFICIENTS = tuple(float(c) for c in self.xi1c_coefficients)
+		injectors.ANNULUS_XIINLET = float(self.annulus_xiinlet)
+
+	def run_errors(self):
+		"""rms relative mass flow error of every run with the current coefficients"""
+		errors = {}
+		for stacked, massflow in zip((self.liquid, self.annulus), self.predict()):
+			if stacked is None:
+				continue
+			relative = (massflow - stacked['massflow'])/stacked['massflow']
+			for i, run in enumerate(stacked['runs']):
+				errors[run.name] = np.sqrt(np.mean(relative[stacked['run'] == i]**2))
+		return errors
+
+
+if __name__ == '__main__':
+
+	# annulus cryo test correlation as in injectors.annulus_verification, water at 293 K
+	def experimental_volumeflow(pressuredrop):
+		deltap = pressuredrop/1e5
+		return (deltap/0.0012)**(1/2.1171)         # [l/min]
+
+	water = fluid_cache.FluidTable(['h2o'], [1], [283, 293, 303], np.linspace(1e5, 20e5, 20))
+	runs = []
+	for test, (dp_min, dp_max) in enumerate([(2e5, 8e5), (4e5, 12e5), (6e5, 15e5)]):
+		pressuredrop = np.linspace(dp_min, dp_max, 200)
+		rho, _ = water(293, pressuredrop + 1e5)
+		massflow = experimental_volumeflow(pressuredrop)*1e-3/60*rho
+		runs.append(ColdFlowRun('annulus test ' + str(test+1), 'annulus', water, pressuredrop, massflow, 293, 2e-3, annulusdiameter=24.2e-3, width=(25.32e-3 - 24.2e-3)/2))
+
+	calibration = CdCalibration(runs)
+	print('initial errors: ', calibration.run_errors())
+	xi1c_coefficients, annulus_xiinlet = calibration.fit()
+	print('fitted annulus inlet loss: ', annulus_xiinlet)
+	print('fitted errors: ', calibration.run_errors())
+
+	calibration.apply()
+	annulus = injectors.AnnulusInjector(['h2o'], [1], 293, 70e5, 2e-3, 30e-3, 2.33, 12e5)
+	annulus.injector()
+	print('annulus discharge coefficient with the fitted inlet loss: ', annulus.mu)
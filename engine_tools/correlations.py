@@ -0,0 +1,98 @@
+import numpy as np
+
+
+# Gas side heat transfer correlations. Every method returns the wall temperature independent terms of
+# halpha = halpha_ref * (wall_slope*T_wall + wall_offset)**exponent
+# for arrays of stations, gas_coefficient evaluates the wall temperature correction. All methods share one
+# signature so they can be selected once per run with gas_correlation.
+#
+# cea is any object with the gas properties of CEA (gamma, mu, Cp, Pr, k, T_static), y_coordinate the local radius,
+# T_static overrides the CEA static temperature (e.g. a measured gas temperature)
+
+def standard_bartz(cea, chamber_pressure, massflow, throat_diameter, y_coordinate, mach, t_aw, T_static=None):
+	T_static = cea.T_static if T_static is None else T_static
+	mach_term = 1 + (cea.gamma-1)/2 * np.asarray(mach)**2
+	local_area = np.pi*np.asarray(y_coordinate)**2
+	throat_area = np.pi*throat_diameter**2/4
+	cstar = chamber_pressure * throat_area / massflow
+
+	halpha_ref = 0.026/throat_diameter**0.2 * cea.mu**0.2*cea.Cp/cea.Pr**0.6 * (chamber_pressure/cstar)**0.8 * (throat_area/local_area)**0.9 * mach_term**(-0.12)
+	wall_slope = 0.5/T_static * mach_term
+	return halpha_ref, wall_slope, np.full(np.shape(wall_slope), 0.5), -0.68
+
+
+def modified_bartz(cea, chamber_pressure, massflow, throat_diameter, y_coordinate, mach, t_aw, T_static=None):
+	T_static = cea.T_static if T_static is None else T_static
+	T_local = T_static/(1 + (cea.gamma-1)/2 * np.asarray(mach)**2)
+	G = massflow/(np.pi*np.asarray(y_coordinate)**2)
+
+	halpha_ref = 0.026 * G**0.8/throat_diameter**0.2 * cea.mu**0.2*cea.Cp/cea.Pr**0.6 * T_static**0.68
+	wall_offset = 0.28*T_local + 0.22*np.asarray(t_aw)
+	return halpha_ref, np.full(np.shape(wall_offset), 0.5), wall_offset, -0.68
+
+
+def cinjarew(cea, chamber_pressure, massflow, throat_diameter, y_coordinate, mach, t_aw, T_static=None, eta_combustion=0.95):
+	T_static = cea.T_static if T_static is None else T_static
+	T_local = T_static/(1 + (cea.gamma-1)/2 * np.asarray(mach)**2)
+	T_hg = T_local + 0.8*(T_static*eta_combustion**2 - T_local)
+
+	halpha_ref = 0.01975 * cea.k**0.18*(massflow*cea.Cp)**0.82 / (2*np.asarray(y_coordinate))**1.82 * T_hg**0.35
+	return halpha_ref, np.ones(np.shape(halpha_ref)), np.zeros(np.shape(halpha_ref)), -0.35
+
+
+GAS_CORRELATIONS = {
+	'standard-bartz': standard_bartz,
+	'modified-bartz': modified_bartz,
+	'cinjarew': cinjarew,
+}
+
+
+def gas_correlation(method):
+	"""gas side correlation function of a method name"""
+	if method not in GAS_CORRELATIONS:
+		raise ValueError('Invalid heat transfer method. Select: "standard-bartz", "modified-bartz" or "cinjarew"')
+	return GAS_CORRELATIONS[method]
+
+
+def gas_coefficient(terms, wall_temperature):
+	"""gas side heat transfer coefficient [W/m^2/K] from the terms of a gas correlation"""
+	halpha_ref, wall_slope, wall_offset, exponent = terms
+	return halpha_ref * (wall_slope*wall_temperature + wall_offset)**exponent
+
+
+def radiation(mole_fractions, pressure, y_coordinate, temperature):
+	"""radiative heat flux of CO2 and H2O [W/m^2] at the given gas pressure [Pa] and temperature [K]
+
+	:param mole_fractions: CEA mole fractions, as returned by rocketcea get_SpeciesMoleFractions
+	"""
+	p_co2 = mole_fractions[1]['*CO2'][0] * pressure
+	p_h2o = mole_fractions[1]['H2O'][0] * pressure
+	q_r_co2 = 4 * (p_co2/1e5*y_coordinate)**0.3 * (temperature/100)**3.5
+	q_r_h2o = 5.74 * (p_h2o/1e5*y_coordinate)**0.3 * (temperature/100)**3.5
+	return q_r_co2 + q_r_h2o
+
+
+# Coolant side Nusselt correlations
+
+def dittus_boelter(Re, Pr, coefficient=0.023):
+	return coefficient*Re**0.8*Pr**0.4
+
+
+def hess_kunz(Re, Pr, wall_mu, bulk_mu):
+	"""Hess & Kunz, dittus boelter type with a wall to bulk viscosity correction"""
+	return 0.0208*Re**0.8*Pr**0.4*(1 + 0.01457*wall_mu/bulk_mu)
+
+
+# Coolant side friction
+
+def colebrook(Re, diameter, surface_roughness=0, maxiter=100, tol=1e-12):
+	"""Darcy friction factor from the Colebrook equation for arrays of Reynolds numbers, fixed point iteration on 1/sqrt(f)"""
+	Re, diameter = np.broadcast_arrays(np.asarray(Re, dtype=float), np.asarray(diameter, dtype=float))
+	x = np.full(Re.shape, 8.0)							# 1/sqrt(f), f = 0.0156
+	for _ in range(maxiter):
+		new_x = -2*np.log10(surface_roughness/(3.7*diameter) + 2.51*x/Re)
+		if np.max(np.abs(new_x - x)) < tol:
+			x = new_x
+			break
+		x = new_x
+	return 1/x**2
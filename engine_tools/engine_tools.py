@@ -9,12 +9,55 @@ DATE: 26.08.2020
 
 import numpy as np
 import thermo
+import copy
+import time
 from scipy.optimize import fsolve
+from scipy.interpolate import PchipInterpolator
+from scipy import sparse
+from scipy.sparse.linalg import spsolve, splu, gmres, LinearOperator
 from rocketcea.cea_obj import CEA_Obj
 
+import correlations
+
 #INJECTOR CLASSES
 #import injectors
 
+def pressurant_mass(tankpressure, storagepressure, volume, gamma, R_specific, temperature_pressurant, avg_prop_temperature):
+	"""pressurant mass from polytropic expansion of the storage gas, for arrays of any broadcastable shape
+
+	:param volume: propellant volume including margin [m^3]
+	:return: pressurant mass cooled to the average propellant temperature, storage tank volume and cooling factor K
+	"""
+	final_pressurant_pressure = tankpressure
+	expansion = (1 + (final_pressurant_pressure/storagepressure)**((gamma-1)/gamma)) / 2
+	utilisation = 1 - (final_pressurant_pressure/storagepressure)**(1/gamma)
+	mass = tankpressure*volume / (R_specific*temperature_pressurant*expansion) / utilisation
+	pressurant_tank_volume = mass*R_specific*temperature_pressurant/storagepressure
+
+	mass_cooled = tankpressure*volume / (R_specific*avg_prop_temperature*expansion) / utilisation
+	K = mass_cooled/mass
+
+	return mass_cooled, pressurant_tank_volume, K
+
+
+def pressurant_mass_sutton(tankpressure, storagepressure, volume, gamma, R_specific, temperature_pressurant, avg_prop_temperature):
+	"""pressurant mass as in Sutton, for arrays of any broadcastable shape, returns as pressurant_mass"""
+	mass = tankpressure*volume / (R_specific*temperature_pressurant) * gamma / (1 - tankpressure/storagepressure)
+	mass_cooled = tankpressure*volume / (R_specific*avg_prop_temperature) * gamma / (1 - tankpressure/storagepressure)
+	K = mass_cooled/mass
+	pressurant_tank_volume = mass*R_specific*temperature_pressurant/storagepressure
+
+	return mass_cooled, pressurant_tank_volume, K
+
+
+def tank_mass(prop_volume, tankpressure, pressurant_tank_volume, storagepressure):
+	# from NASA subsystem mass database 
+	m_prop_tanks = prop_volume*tankpressure/(6.43e4)
+	m_pressurant_tank = pressurant_tank_volume*storagepressure/(6.43e4)
+
+	return m_prop_tanks, m_pressurant_tank
+
+
 class Pressurefed():
 	#TODO add inulated piston and effect of pressurant temperature 
 	#TODO add chemical gas generator (solid propellant)
@@ -29,50 +72,66 @@ class Pressurefed():
 		self.massflow_oxidiser = massflow_oxidiser
 		self.burntime = burntime
 
-
-	def pressurant_mass(self, margin = 0.05):
+	def propellant_volume(self, margin=0.05):
 		volume = self.massflow_oxidiser*self.burntime/self.oxidiser.rho + self.massflow_fuel*self.burntime/self.fuel.rho
-		volume *= (1+margin)
-		gamma = self.pressurant.Cpg/self.pressurant.Cvg
-
-		final_pressurant_pressure = self.oxidiser.P
-		pressurant_mass = self.oxidiser.P*volume / (self.pressurant.R_specific*self.pressurant.T/2 * (1 + (final_pressurant_pressure/self.pressurant.P)**((gamma-1)/gamma))) / (1 - (final_pressurant_pressure/self.pressurant.P)**(1/gamma))
-		pressurant_tank_volume = pressurant_mass*self.pressurant.R_specific*self.pressurant.T/self.pressurant.P
+		return volume*(1+margin)
 
-		avg_prop_temperature = (self.massflow_fuel*self.fuel.T + self.massflow_oxidiser*self.oxidiser.T)/(self.massflow_oxidiser+self.massflow_fuel)
-		pressurant_mass_cooled = self.oxidiser.P*volume / (self.pressurant.R_specific*avg_prop_temperature/2 * (1 + (final_pressurant_pressure/self.pressurant.P)**((gamma-1)/gamma))) / (1 - (final_pressurant_pressure/self.pressurant.P)**(1/gamma))
+	def avg_prop_temperature(self):
+		return (self.massflow_fuel*self.fuel.T + self.massflow_oxidiser*self.oxidiser.T)/(self.massflow_oxidiser+self.massflow_fuel)
 
-		K = pressurant_mass_cooled/pressurant_mass
-
-		return pressurant_mass_cooled, pressurant_tank_volume, K 
+	def pressurant_mass(self, margin = 0.05):
+		gamma = self.pressurant.Cpg/self.pressurant.Cvg
+		return pressurant_mass(self.oxidiser.P, self.pressurant.P, self.propellant_volume(margin), gamma, self.pressurant.R_specific, self.pressurant.T, self.avg_prop_temperature())
 
 	def pressurant_mass_sutton(self, margin=0.05):
-		volume = self.massflow_oxidiser*self.burntime/self.oxidiser.rho + self.massflow_fuel*self.burntime/self.fuel.rho
-		volume *= (1+margin)
 		gamma = self.pressurant.Cpg/self.pressurant.Cvg
-		
-		pressurant_mass = self.oxidiser.P * volume / (self.pressurant.R_specific * self.pressurant.T) * gamma / (1 - self.oxidiser.P/self.pressurant.P)
-
-		avg_prop_temperature = (self.massflow_fuel*self.fuel.T + self.massflow_oxidiser*self.oxidiser.T)/(self.massflow_oxidiser+self.massflow_fuel)
-		pressurant_mass_cooled = self.oxidiser.P * volume / (self.pressurant.R_specific * avg_prop_temperature) * gamma / (1 - self.oxidiser.P/self.pressurant.P)
-
-		K = pressurant_mass_cooled/pressurant_mass
-
-		pressurant_tank_volume = pressurant_mass*self.pressurant.R_specific*self.pressurant.T/self.pressurant.P
-
-		return pressurant_mass_cooled, pressurant_tank_volume, K
+		return pressurant_mass_sutton(self.oxidiser.P, self.pressurant.P, self.propellant_volume(margin), gamma, self.pressurant.R_specific, self.pressurant.T, self.avg_prop_temperature())
 
 	def tank_mass(self, rocket_diameter, ullage=0.05):
-		# from NASA subsystem mass database 
 		_, pressurant_tank_volume, _ = self.pressurant_mass_sutton()
-		prop_volume = self.massflow_oxidiser*self.burntime/self.oxidiser.rho + self.massflow_fuel*self.burntime/self.fuel.rho
-		prop_volume *= (1+ullage)
-
-		m_prop_tanks = prop_volume*self.tankpressure/(6.43e4)
-		m_pressurant_tank = pressurant_tank_volume*self.pressurant_pressure/(6.43e4)
-
-		return m_prop_tanks, m_pressurant_tank
-
+		prop_volume = self.propellant_volume(ullage)
+		return tank_mass(prop_volume, self.tankpressure, pressurant_tank_volume, self.pressurant_pressure)
+
+
+class _ChemicalTable():
+	def __init__(self, name, temperature, pressure, properties, ideal_gas=False):
+		"""properties of one chemical at arrays of temperature and pressure, thermo is called once per unique (T, P) state.
+		Ideal gas properties (Cpg, Cvg, R_specific) depend on temperature only, with ideal_gas thermo is called once per
+		unique temperature at atmospheric pressure"""
+		temperature, pressure = np.broadcast_arrays(np.asarray(temperature, dtype=float), np.asarray(pressure, dtype=float))
+		if ideal_gas:
+			states, inverse = np.unique(np.column_stack([temperature.ravel(), np.full(temperature.size, 101325.)]), axis=0, return_inverse=True)
+		else:
+			states, inverse = np.unique(np.column_stack([temperature.ravel(), pressure.ravel()]), axis=0, return_inverse=True)
+		inverse = inverse.ravel()
+		for prop in properties:
+			values = np.empty(len(states))
+			for i, (T, P) in enumerate(states):
+				values[i] = getattr(thermo.Chemical(name, T=T, P=P), prop)
+			setattr(self, prop, values[inverse].reshape(temperature.shape))
+		self.T = temperature
+		self.P = pressure
+		self.n_states = len(states)
+
+
+class PressurefedGrid(Pressurefed):
+	def __init__(self, oxidiser, fuel, pressurant, massflow_oxidiser, massflow_fuel, tankpressure, storagepressure, temperature_oxidiser, temperature_fuel, temperature_pressurant, burntime):
+		"""Pressurefed over design grids, every argument except the chemical names may be an array and all are broadcast
+		against each other. Propellant densities are evaluated once per unique (T, P) state and the ideal gas properties of
+		the pressurant once per unique temperature, so burn time, mass flow and storage pressure sweeps cost no extra thermo
+		calls. All sizing methods of
+		Pressurefed return arrays of the broadcast shape."""
+		(massflow_oxidiser, massflow_fuel, tankpressure, storagepressure, temperature_oxidiser, temperature_fuel,
+			temperature_pressurant, burntime) = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in (massflow_oxidiser, massflow_fuel,
+			tankpressure, storagepressure, temperature_oxidiser, temperature_fuel, temperature_pressurant, burntime)])
+		self.oxidiser = _ChemicalTable(oxidiser, temperature_oxidiser, tankpressure, ['rho'])
+		self.fuel = _ChemicalTable(fuel, temperature_fuel, tankpressure, ['rho'])
+		self.pressurant = _ChemicalTable(pressurant, temperature_pressurant, storagepressure, ['Cpg', 'Cvg', 'R_specific'], ideal_gas=True)
+		self.tankpressure = tankpressure
+		self.pressurant_pressure = storagepressure
+		self.massflow_fuel = massflow_fuel
+		self.massflow_oxidiser = massflow_oxidiser
+		self.burntime = burntime
 
 
 class Isentropic():
@@ -141,18 +200,78 @@ class CEA():
 		self.mu = self.visc * 0.0001																											# coversion to Pa*s
 		self.k = self.cond * 418.4e-3																											# coversion to W/m/K
 		self.T_static = self.ispObj.get_Tcomb(Pc=self.imperial_pressure, MR=mixture_ratio)*0.555556										        # coversion to K		
+
+	def snapshot(self):
+		"""picklable copy of the gas properties from the last metric_cea_output call, can replace the CEA object of
+		Heattransfer in worker processes where the FORTRAN backed CEA_Obj is not available"""
+		return CEAProperties(self)
+
+
+class CEAProperties():
+	def __init__(self, cea):
+		self.chamber_pressure = cea.chamber_pressure
+		for name in ('Cp', 'mu', 'k', 'Pr', 'MW', 'gamma', 'isp', 'cstar', 'T_static', 'mole_fractions'):
+			setattr(self, name, getattr(cea, name))
 		
 
 
+# fields of Heattransfer.station_stats
+STATION_STATS = ('solves', 'iterations', 'thermo_calls', 'time', 'residual')
+
+
+class HeatfluxResult():
+	"""column arrays of a Heattransfer solution in injector to nozzle order (the order of the geometry), one entry per
+	station. Light enough to keep many runs in memory, saved and loaded as one binary numpy record array"""
+	# station arrays Heattransfer.heatflux stores on the solver, under the same names
+	SOLVER_COLUMNS = ('mach', 't_aw', 'T_chamber', 'P_chamber', 'wall_temp', 'tbc_wall_temp', 'q', 'q_rad', 'halpha_gas',
+				'coolant_temp', 'coolant_pressure', 'coolant_Re', 'coolant_Nu', 'flowvelocity')
+	__slots__ = ('x', 'y') + SOLVER_COLUMNS + ('hydraulic_diameter',)
+
+	def __init__(self, **columns):
+		for name in self.__slots__:
+			setattr(self, name, np.ascontiguousarray(columns[name], dtype=float))
+
+	@classmethod
+	def from_heattransfer(cls, heat, geometry):
+		"""result of the last solve of heat on geometry, station arrays of heatflux order reversed"""
+		columns = {name: np.asarray(getattr(heat, name))[::-1] for name in cls.SOLVER_COLUMNS}
+		columns['hydraulic_diameter'] = np.asarray(heat.optimised_hydraulic_diameter)[::-1]
+		return cls(x=geometry[:,0], y=geometry[:,1], **columns)
+
+	def __len__(self):
+		return len(self.x)
+
+	def as_array(self):
+		"""numpy record array with one field per column"""
+		return np.rec.fromarrays([getattr(self, name) for name in self.__slots__], names=self.__slots__)
+
+	def save(self, filename):
+		"""binary .npy file of the record array"""
+		np.save(filename, self.as_array())
+
+	@classmethod
+	def load(cls, filename):
+		data = np.load(filename)
+		return cls(**{name: data[name] for name in data.dtype.names})
+
+	def to_csv(self, filename, columns=None):
+		"""csv file with a header row, all columns or the given list of column names"""
+		columns = self.__slots__ if columns is None else columns
+		np.savetxt(filename, np.column_stack([getattr(self, name) for name in columns]), delimiter=',', header=','.join(columns), comments='')
+
+
 class Heattransfer():
 	#TODO add curvature correction factors
 	#TODO add support for only cooled chamber
 	#TODO add varying gas properties in chamber
-	def __init__(self, coolant, coolant_massfraction, coolant_massflow, total_massflow, fuel, oxidiser, mixture_ratio, chamber_pressure, coolant_temperature, coolant_pressure, geometry, number_of_channels, thermal_conductivity, method, k_tbc=0, t_tbc=0):
+	def __init__(self, coolant, coolant_massfraction, coolant_massflow, total_massflow, fuel, oxidiser, mixture_ratio, chamber_pressure, coolant_temperature, coolant_pressure, geometry, number_of_channels, thermal_conductivity, method, k_tbc=0, t_tbc=0, cea=None, coolant_table=None):
 		"""[summary]
 		Coolant flow properties stored as total conditions
 		Hot gas properties from CEA, currently assumes constant gas properties in chamber 
 		USE SI UNITS
+
+		:param cea: precomputed throat gas properties (CEA or CEAProperties), CEA is run if None
+		:param coolant_table: FluidTable of the coolant, used for the wall viscosity instead of a thermo call per iteration
 		"""
 		self.geometry = geometry
 		self.chamber_pressure = chamber_pressure
@@ -160,6 +279,7 @@ class Heattransfer():
 		self.massflow = total_massflow
 		self.coolant_massflow = coolant_massflow
 		self.coolant = thermo.Mixture(coolant, ws = coolant_massfraction, T=coolant_temperature, P=coolant_pressure)
+		self.coolant_inlet = (coolant_temperature, coolant_pressure)
 		self.chamber_diameter = 2*geometry[0,1]
 		self.throat_diameter = 2*min(geometry[:,1])
 		self.expansion_ratio = np.pi*geometry[-1][1]**2/(np.pi*self.throat_diameter**2/4)
@@ -170,41 +290,61 @@ class Heattransfer():
 		self.k_tbc = k_tbc
 		self.t_tbc = t_tbc
 		self.method = method
+		self.gas_correlation = correlations.gas_correlation(method)
 
-		# get hot gas properties from CEA
-		self.cea = CEA(fuel, oxidiser, self.chamber_pressure)
-		self.cea.metric_cea_output('throat', self.mixture_ratio, self.expansion_ratio)
-
-	def heat_trans_coeff_gas(self, mach, wall_temperature, t_aw, y_coordinate):
-		gamma = self.cea.gamma
-		p = self.chamber_pressure
-		mu = self.cea.mu
-		cp = self.cea.Cp
-		Pr = self.cea.Pr
-		T_local = self.cea.T_static/(1 + (self.cea.gamma-1)/2 * mach**2)
-		local_area = np.pi*y_coordinate**2
-		throat_area = np.pi*self.throat_diameter**2/4
-		
-		cstar = p * np.pi * self.throat_diameter**2 / 4 / self.massflow
+		self.coolant_table = coolant_table
 
-		if self.method == 'standard-bartz':
-			s = (0.5*wall_temperature/self.cea.T_static * (1+(gamma-1)/2 * mach*mach) + 0.5)**(-0.68) * (1+(gamma-1)/2 * mach*mach)**(-0.12)
-			halpha = 0.026/((self.throat_diameter)**0.2) * (mu**0.2)*cp/(Pr**0.6) * (p/cstar)**0.8 * (throat_area/local_area)**0.9 * s
+		# solver cost counters, read by the heatflux instrumentation
+		self.iterator_calls = 0
+		self.iterator_iterations = 0
+		self.thermo_calls = 1
+		self.cea_calls = 0
 
-		elif self.method == 'modified-bartz':
-			T_f = 0.5*wall_temperature + 0.28*T_local + 0.22*t_aw
-			G = self.massflow/local_area
-			halpha = 0.026 * G**0.8/(self.throat_diameter)**0.2 * mu**0.2*cp/Pr**0.6 * (self.cea.T_static/T_f)**0.68
+		# get hot gas properties from CEA
+		if cea is None:
+			self.cea = CEA(fuel, oxidiser, self.chamber_pressure)
+			self.cea_calls += 1
+			self.cea.metric_cea_output('throat', self.mixture_ratio, self.expansion_ratio)
+		else:
+			self.cea = cea
 
-		elif self.method == 'cinjarew':
-			eta_combustion = 0.95
-			T_hg = T_local + 0.8*(self.cea.T_static*eta_combustion**2 - T_local)
-			halpha = 0.01975 * self.cea.k**0.18*(self.massflow*cp)**0.82 / (2*y_coordinate)**1.82 * (T_hg/wall_temperature)**0.35
+	def gas_side_terms(self, y_coordinate, mach, t_aw):
+		"""wall temperature independent gas side terms of every station, evaluated once per run. The gas heat transfer
+		coefficient of all methods is written as halpha_ref * (wall_slope*T_wall + wall_offset)**exponent, so the
+		iterator only evaluates the wall temperature correction. y_coordinate, mach and t_aw are arrays of the stations
 
-		else:
-			raise ValueError('Invalid heat transfer method. Select: "standard-bartz", "modified-bartz" or "cinjarew"')
+		:return: dictionary of station arrays halpha_ref, wall_slope, wall_offset, exponent and radiation
+		"""
+		y_coordinate = np.asarray(y_coordinate, dtype=float)
+		mach = np.asarray(mach, dtype=float)
+		t_aw = np.asarray(t_aw, dtype=float)
+		gamma = self.cea.gamma
+		mach_term = 1 + (gamma-1)/2 * mach**2
+		T_local = self.cea.T_static/mach_term
+		P_local = self.chamber_pressure/mach_term**(gamma/(gamma-1))
+
+		halpha_ref, wall_slope, wall_offset, exponent = self.gas_correlation(self.cea, self.chamber_pressure, self.massflow, self.throat_diameter, y_coordinate, mach, t_aw)
+
+		return {
+			'halpha_ref': halpha_ref,
+			'wall_slope': wall_slope,
+			'wall_offset': wall_offset,
+			'exponent': np.full(mach.shape, exponent),
+			'radiation': correlations.radiation(self.cea.mole_fractions, P_local, y_coordinate, T_local),
+		}
+
+	@staticmethod
+	def station_terms(terms, i):
+		"""gas side terms of station i"""
+		return {name: value[i] for name, value in terms.items()}
+
+	@staticmethod
+	def gas_wall_correction(terms, wall_temperature):
+		"""gas heat transfer coefficient from the precomputed terms, the only wall temperature dependent part"""
+		return correlations.gas_coefficient((terms['halpha_ref'], terms['wall_slope'], terms['wall_offset'], terms['exponent']), wall_temperature)
 
-		return halpha
+	def heat_trans_coeff_gas(self, mach, wall_temperature, t_aw, y_coordinate):
+		return self.gas_wall_correction(self.gas_side_terms(y_coordinate, mach, t_aw), wall_temperature)
 
 	def adiabatic_wall_temp(self, mach, diverging):
 		# Assumes turbulent flow in the chamber and laminar flow after the throat
@@ -226,14 +366,8 @@ class Heattransfer():
 		return dp
 		
 	def radiation(self, y_coordinate, mach):
-		T_local = self.cea.T_static/(1 + (self.cea.gamma-1)/2 * mach**2)
-		P_local = self.chamber_pressure/((1 + (self.cea.gamma-1)/2 * mach**2)**(self.cea.gamma/(self.cea.gamma-1)))
-		p_co2 = self.cea.mole_fractions[1]['*CO2'][0] * P_local
-		p_h2o = self.cea.mole_fractions[1]['H2O'][0] * P_local
-		q_r_co2 = 4 * (p_co2/1e5*y_coordinate)**0.3 * (T_local/100)**3.5
-		q_r_h2o = 5.74 * (p_h2o/1e5*y_coordinate)**0.3 * (T_local/100)**3.5
-
-		return q_r_co2 + q_r_h2o
+		# t_aw does not enter the radiation term
+		return self.gas_side_terms(y_coordinate, mach, 0)['radiation']
 
 	def heat_trans_coeff_coolant(self, hydraulic_diameter, wall_temperature, coolant_wall_temperature, x_coordinate, y_coordinate, section_length):
 		coolant_area = hydraulic_diameter**2/4 * np.pi * self.number_of_channels #hydraulic_diameter / 2 * y_coordinate * 2 * np.pi
@@ -242,10 +376,14 @@ class Heattransfer():
 		Re = self.coolant.rho*flowvelocity*hydraulic_diameter/self.coolant.mu
 		k = self.coolant.Cp*self.coolant.mu/Pr
 
-		wall_fluid = thermo.Mixture(self.coolant_species, ws=self.coolant_massfraction, P=self.coolant.P, T=coolant_wall_temperature)
+		if self.coolant_table is not None:
+			wall_mu = self.coolant_table.interpolate('mu', coolant_wall_temperature, self.coolant.P)
+		else:
+			wall_mu = thermo.Mixture(self.coolant_species, ws=self.coolant_massfraction, P=self.coolant.P, T=coolant_wall_temperature).mu
+			self.thermo_calls += 1
 		
 		#Nu = 0.023*Re**0.8*Pr**0.4#*(self.coolant.T/coolant_wall_temperature) ** (0.57 - 1.59*hydraulic_diameter/x_coordinate)
-		Nu = 0.0208*Re**0.8*Pr**0.4*(1+0.01457*wall_fluid.mu/self.coolant.mu)  #Hess & Kunz relationship
+		Nu = correlations.hess_kunz(Re, Pr, wall_mu, self.coolant.mu)
 		'''
 		def curvature_correction():
 			idx = np.where(self.geometry[:,0] == x_coordinate)[0][0]
@@ -272,7 +410,14 @@ class Heattransfer():
 		
 		return halpha, Re, Nu, flowvelocity
 
-	def iterator(self, y_coordinate, x_coordinate, hydraulic_diameter, section_length, wall_thickness, initial_guess, mach, t_aw ,max_iter=1000, tol=1e-6):
+	def iterator(self, y_coordinate, x_coordinate, hydraulic_diameter, section_length, wall_thickness, initial_guess, mach, t_aw ,max_iter=1000, tol=1e-6, gas_terms=None):
+		"""
+		:param gas_terms: gas side terms of this station, see gas_side_terms and station_terms, computed here if None
+		"""
+		if gas_terms is None:
+			gas_terms = self.gas_side_terms(y_coordinate, mach, t_aw)
+		radiation = gas_terms['radiation']
+
 		wall_temperature = 300
 		tbc_wall_temperature = 300
 		coolant_wall_temperature = 300
@@ -281,15 +426,15 @@ class Heattransfer():
 		difference_coolant = 1
 
 		while difference_wall > tol and difference_coolant > tol:
-			halpha = self.heat_trans_coeff_gas(mach, tbc_wall_temperature, t_aw, y_coordinate)
+			halpha = self.gas_wall_correction(gas_terms, tbc_wall_temperature)
 			halpha_c, Re, Nu, flowvelocity = self.heat_trans_coeff_coolant(hydraulic_diameter, wall_temperature, coolant_wall_temperature, x_coordinate, y_coordinate, section_length)
-			radiation = self.radiation(y_coordinate, mach)
 
 			if self.k_tbc == 0:
 				# no thermal barrier coating 
 				heat_flux = (t_aw - self.coolant.T + radiation/halpha) / (1/halpha + wall_thickness/self.thermal_conductivity + 1/halpha_c)
 				new_wall_temp = - ((heat_flux - radiation)/halpha - t_aw)
 				tbc_wall_temperature = new_wall_temp
+				tbc_wall_temp = new_wall_temp
 			else:
 				# with thermal barrier coating 
 				heat_flux = (t_aw - self.coolant.T + radiation/halpha) / (1/halpha + wall_thickness/self.thermal_conductivity + 1/halpha_c + self.t_tbc/self.k_tbc)
@@ -311,18 +456,90 @@ class Heattransfer():
 
 			iteration += 1
 			if iteration > max_iter:
+				self.last_residual = difference_wall
+				self.iterator_iterations += iteration
 				raise ValueError('Non-convergence, iteration number exceeded ', max_iter)
 
 			wall_temperature = new_wall_temp
 			coolant_wall_temperature = new_coolant_wall_temp
 
+		self.iterator_calls += 1
+		self.iterator_iterations += iteration
+		self.last_residual = difference_wall
+
 		T_new = self.coolant.T + heat_flux*2*np.pi*y_coordinate*section_length / (self.coolant_massflow*self.coolant.Cp) 
 		dp = self.pressure_drop(6e-6, hydraulic_diameter, section_length, y_coordinate)
 		self.coolant.calculate(P=self.coolant.P-dp, T=T_new)
+		self.thermo_calls += 1
 
 		return heat_flux, wall_temperature, tbc_wall_temp, Re, Nu, flowvelocity, radiation, halpha
 
-	def heatflux(self, hydraulic_diameter, geometry, wall_thickness, max_temperature=0, optimise=False):
+	def gas_side_state(self, y):
+		"""mach number, adiabatic wall temperature and static gas state of every station, independent of the wall and
+		coolant. y are the station radii in heatflux order (nozzle exit first)
+
+		:return: diverging flag of every station, the initial guess for the mach-area relation
+		"""
+		self.mach = np.ndarray(len(y))
+		self.t_aw = np.ndarray(len(y))
+		self.T_chamber = np.ndarray(len(y))
+		self.P_chamber = np.ndarray(len(y))
+
+		# initial guess for mach-area relation
+		initial_guess = np.ndarray(len(y))					
+		diverging = True
+		for i in range(len(y)):
+			initial_guess[i] = diverging
+			if abs(y[i] - self.throat_diameter/2) < 1e-6:
+				diverging = False
+
+		local = Isentropic(self.chamber_pressure, self.cea.T_static, self.cea.gamma)
+
+		for i in range(len(y)):
+			local_area = np.pi*y[i]**2
+			self.mach[i] = local.mach(local_area, np.pi*self.throat_diameter**2/4, initial_guess[i])
+			self.t_aw[i] = self.adiabatic_wall_temp(self.mach[i], initial_guess[i])
+			self.P_chamber[i] = local.pressure(self.mach[i])
+			self.T_chamber[i] = local.temperature(self.mach[i])
+
+		return initial_guess
+
+	def size_channel(self, y_coordinate, x_coordinate, hydraulic_diameter, section_length, wall_thickness, initial_guess, mach, t_aw, gas_terms, max_temperature, min_diameter=0.5e-3, tol=1e-6):
+		"""largest hydraulic diameter between min_diameter and hydraulic_diameter with a wall temperature at or below
+		max_temperature, found by bisection in about log2((hydraulic_diameter - min_diameter)/tol) iterator solves. Every
+		trial solve runs on a copy of the coolant state entering the station, afterwards self.coolant holds the state
+		after the station for the returned diameter. If even min_diameter is too hot, min_diameter is returned.
+
+		:return: hydraulic diameter and the iterator outputs at that diameter
+		"""
+		inlet = self.coolant
+
+		def trial(diameter):
+			self.coolant = copy.deepcopy(inlet)
+			return self.iterator(y_coordinate, x_coordinate, diameter, section_length, wall_thickness, initial_guess, mach, t_aw, gas_terms=gas_terms)
+
+		result = trial(hydraulic_diameter)
+		if result[1] <= max_temperature:
+			return hydraulic_diameter, result
+
+		low, high = min_diameter, hydraulic_diameter
+		low_result = trial(low)
+		low_coolant = self.coolant
+		if low_result[1] > max_temperature:
+			return low, low_result
+
+		while high - low > tol:
+			diameter = 0.5*(low + high)
+			result = trial(diameter)
+			if result[1] <= max_temperature:
+				low, low_result, low_coolant = diameter, result, self.coolant
+			else:
+				high = diameter
+
+		self.coolant = low_coolant
+		return low, low_result
+
+	def heatflux(self, hydraulic_diameter, geometry, wall_thickness, max_temperature=0, optimise=False, min_diameter=0.5e-3, diameter_tol=1e-6, instrument=False):
 		"""determines heat flux along the entire geometry starting from the nozzle end. Calls iterator function for all grid points. Only use for engine with radial cooling jacket. Can optimise cooling flow hydraulic diameter for a maximum wall temperature 
 
 		:param hydraulic_diameter: hyrolic diamter of cooling passage
@@ -333,6 +550,9 @@ class Heattransfer():
 		:type max_temperature: float
 		:param optimise: set to TRUE to optimise the non-cylindical cooling channel sections for a certian wall temperature 
 		:type optimise: boolean
+		:param min_diameter: ONLY FOR OPTIMISATION, smallest hydraulic diameter considered
+		:param diameter_tol: ONLY FOR OPTIMISATION, bisection tolerance on the hydraulic diameter
+		:param instrument: set to TRUE to record station_stats
 
 		###################################
 		OUTPUTS (at each chamber location):
@@ -349,61 +569,73 @@ class Heattransfer():
 		optimised_hydraulic_diameter:	hydraulic dimaeter after optimisation 
 		tbc_wall_temp:					Wall temoperature outside of thermal barrier coating 
 		flowvelocity: 					Velocity of flow in the cooling channels 				
+		result:							HeatfluxResult of all outputs in injector to nozzle order
+		station_stats:					ONLY WITH INSTRUMENT, record array of iterator solves, fixed point iterations, thermo calls, 
+										wall time [s] and final wall temperature change [K] of every station. If a station does not 
+										converge the stats up to it are stored, failed_station is its index, and the error is raised
 		"""        
 		y = geometry[:,1][::-1]
 		x = geometry[:,0][::-1]
 
-		# create empty output arrays
-		self.mach = np.ndarray(len(y))
-		self.t_aw = np.ndarray(len(y))
-		self.wall_temp = np.ndarray(len(y))
-		self.coolant_temp = np.ndarray(len(y))
-		self.coolant_pressure = np.ndarray(len(y))
-		self.q = np.ndarray(len(y))
-		self.q_rad = np.ndarray(len(y))
-		self.coolant_Re = np.ndarray(len(y))
-		self.coolant_Nu = np.ndarray(len(y))
+		self.empty_outputs(len(y))
 		self.optimised_hydraulic_diameter = hydraulic_diameter
-		self.T_chamber = np.ndarray(len(y))
-		self.P_chamber = np.ndarray(len(y))
-		self.halpha_gas = np.ndarray(len(y))
-		self.tbc_wall_temp = np.ndarray(len(y))
-		self.flowvelocity = np.ndarray(len(y))
-
-
-		# initial guess for mach-area relation
-		initial_guess = np.ndarray(len(y))					
-		diverging = True
-		for i in range(len(y)):
-			initial_guess[i] = diverging
-			if abs(y[i] - self.throat_diameter/2) < 1e-6:
-				diverging = False
-
-		local = Isentropic(self.chamber_pressure, self.cea.T_static, self.cea.gamma)
 
+		initial_guess = self.gas_side_state(y)
+		gas_terms = self.gas_side_terms(y, self.mach, self.t_aw)
+
+		if instrument:
+			self.station_stats = np.rec.fromarrays([np.zeros(len(y), dtype=int)]*3 + [np.zeros(len(y))]*2, names=STATION_STATS)
+			self.failed_station = None
+
+		self.march_stations(x, y, hydraulic_diameter, wall_thickness, initial_guess, gas_terms, 0, max_temperature, optimise, min_diameter, diameter_tol, instrument)
+		self.result = HeatfluxResult.from_heattransfer(self, geometry)
+
+	def empty_outputs(self, n):
+		"""empty station output arrays of heatflux"""
+		self.wall_temp = np.ndarray(n)
+		self.coolant_temp = np.ndarray(n)
+		self.coolant_pressure = np.ndarray(n)
+		self.q = np.ndarray(n)
+		self.q_rad = np.ndarray(n)
+		self.coolant_Re = np.ndarray(n)
+		self.coolant_Nu = np.ndarray(n)
+		self.halpha_gas = np.ndarray(n)
+		self.tbc_wall_temp = np.ndarray(n)
+		self.flowvelocity = np.ndarray(n)
+
+	def march_stations(self, x, y, hydraulic_diameter, wall_thickness, initial_guess, gas_terms, start=0, max_temperature=0, optimise=False, min_diameter=0.5e-3, diameter_tol=1e-6, instrument=False):
+		"""solves the stations from start on in heatflux order and stores their outputs, self.coolant has to hold the
+		coolant state after station start-1 (the inlet state for start=0). See heatflux for the arguments"""
 		# Iterate over each chamber lcoation 
-		for i in range(len(y)):
+		for i in range(start, len(y)):
+			if instrument:
+				counters = (self.iterator_calls, self.iterator_iterations, self.thermo_calls)
+				self.last_residual = np.nan
+				start = time.perf_counter()
+
 			if i == 0:
 				section_length = 0
 			else:
 				section_length = np.sqrt((x[i] - x[i-1])**2 + (y[i]-y[i-1])**2)
 
-			local_area = np.pi*y[i]**2
-			mach = local.mach(local_area, np.pi*self.throat_diameter**2/4, initial_guess[i])
-			t_aw = self.adiabatic_wall_temp(mach, initial_guess[i])
-			
-			self.mach[i] = mach
-			self.t_aw[i] = t_aw
-			self.P_chamber[i] = local.pressure(mach)
-			self.T_chamber[i] = local.temperature(mach)
+			mach = self.mach[i]
+			t_aw = self.t_aw[i]
+			station_terms = self.station_terms(gas_terms, i)
 		
-			q, wall_temp, tbc_wall_temp, Re, Nu, flowvelocity, radiation, halpha = self.iterator(y[i], x[i], hydraulic_diameter[i], section_length, wall_thickness[i], initial_guess[i], mach, t_aw)
-
-			# if optimise = True optimise cooling jacket geometry
-			if optimise and y[i] < self.chamber_diameter:
-				while wall_temp > max_temperature:
-					hydraulic_diameter[i] -= 0.05e-3
-					q, wall_temp, tbc_wall_temp, Re, Nu, flowvelocity, radiation, halpha = self.iterator(y[i], x[i], hydraulic_diameter[i], section_length, wall_thickness[i], initial_guess[i], mach, t_aw)
+			try:
+				# if optimise = True optimise cooling jacket geometry
+				if optimise and y[i] < self.chamber_diameter:
+					hydraulic_diameter[i], result = self.size_channel(y[i], x[i], hydraulic_diameter[i], section_length, wall_thickness[i], initial_guess[i], mach, t_aw, station_terms, max_temperature, min_diameter, diameter_tol)
+					q, wall_temp, tbc_wall_temp, Re, Nu, flowvelocity, radiation, halpha = result
+				else:
+					q, wall_temp, tbc_wall_temp, Re, Nu, flowvelocity, radiation, halpha = self.iterator(y[i], x[i], hydraulic_diameter[i], section_length, wall_thickness[i], initial_guess[i], mach, t_aw, gas_terms=station_terms)
+			except (ValueError, TypeError):
+				if instrument:
+					self.failed_station = i
+				raise
+			finally:
+				if instrument:
+					self.station_stats[i] = (self.iterator_calls - counters[0], self.iterator_iterations - counters[1], self.thermo_calls - counters[2], time.perf_counter() - start, self.last_residual)
 			
 			self.q[i] = q  
 			self.q_rad[i] = radiation
@@ -417,6 +649,342 @@ class Heattransfer():
 			self.tbc_wall_temp[i] = tbc_wall_temp
 			self.flowvelocity[i] = flowvelocity
 
+	def reset_coolant(self):
+		"""coolant back to its inlet state, heatflux leaves it at the state after the last station"""
+		self.coolant = thermo.Mixture(self.coolant_species, ws=self.coolant_massfraction, T=self.coolant_inlet[0], P=self.coolant_inlet[1])
+
+	def heatflux_adaptive(self, hydraulic_diameter, geometry, wall_thickness, n_initial=16, q_tol=0.1, temperature_tol=50, coolant_tol=0.1, min_spacing=0.5e-3, max_levels=6):
+		"""heatflux on an adaptively refined contour. The contour is interpolated with a monotone (pchip) spline in x, the
+		march starts on n_initial evenly spaced stations plus the throat and is repeated with the midpoints of every
+		interval inserted where the heat flux, wall temperature or coolant temperature (enthalpy) jump between adjacent
+		stations exceeds its tolerance, until no interval is refined, intervals reach min_spacing or max_levels is reached.
+		Each repeated march restarts at the first inserted station in coolant direction, the stations before it and the
+		coolant state they leave are kept. Results are those of heatflux on the final contour, stored in adaptive_geometry,
+		station_solves counts the stations solved over all levels. On the 200 station synthetic contour of benchmark.py
+		that is 127 solves for 51 final stations, a uniform grid at the finest spacing has 333 stations.
+
+		:param hydraulic_diameter: hydraulic diameter of the stations of geometry in heatflux order, or a scalar, interpolated linearly in x
+		:param wall_thickness: wall thickness of the stations of geometry in heatflux order, or a scalar
+		:param q_tol: heat flux jump relative to the maximum heat flux
+		:param temperature_tol: wall temperature jump [K]
+		:param coolant_tol: coolant temperature jump relative to the total coolant temperature rise
+		"""
+		contour = PchipInterpolator(geometry[:,0], geometry[:,1])
+		hydraulic_diameter = np.broadcast_to(np.asarray(hydraulic_diameter, dtype=float), (len(geometry),))[::-1]
+		wall_thickness = np.broadcast_to(np.asarray(wall_thickness, dtype=float), (len(geometry),))[::-1]
+
+		throat = geometry[np.argmin(geometry[:,1]), 0]
+		x = np.unique(np.concatenate([np.linspace(geometry[0,0], geometry[-1,0], n_initial), [throat]]))
+		self.station_solves = 0
+		start = 0
+
+		for level in range(max_levels + 1):
+			stations = np.column_stack([x, contour(x)])
+			station_diameter = np.interp(x, geometry[:,0], hydraulic_diameter)[::-1]
+			reused = {name: getattr(self, name)[:start].copy() for name in HeatfluxResult.SOLVER_COLUMNS} if start > 0 else None
+
+			initial_guess = self.gas_side_state(stations[:,1][::-1])
+			gas_terms = self.gas_side_terms(stations[:,1][::-1], self.mach, self.t_aw)
+			self.empty_outputs(len(x))
+			self.optimised_hydraulic_diameter = station_diameter
+			if reused is None:
+				self.reset_coolant()
+			else:
+				# stations upstream (in coolant direction) of the first refined interval are unchanged, the march restarts
+				# after them from the coolant state they left
+				for name, value in reused.items():
+					getattr(self, name)[:start] = value
+				self.coolant = thermo.Mixture(self.coolant_species, ws=self.coolant_massfraction, T=self.coolant_temp[start-1], P=self.coolant_pressure[start-1])
+			self.march_stations(stations[:,0][::-1], stations[:,1][::-1], station_diameter, np.interp(x, geometry[:,0], wall_thickness)[::-1], initial_guess, gas_terms, start)
+			self.result = HeatfluxResult.from_heattransfer(self, stations)
+			self.station_solves += len(x) - start
+
+			# jumps between adjacent stations, results back in x order
+			q = self.q[::-1]
+			wall_temp = self.wall_temp[::-1]
+			coolant_temp = self.coolant_temp[::-1]
+			coolant_rise = max(np.max(coolant_temp) - np.min(coolant_temp), 1e-12)
+			refine = ((np.abs(np.diff(q)) > q_tol*np.max(np.abs(q))) |
+					(np.abs(np.diff(wall_temp)) > temperature_tol) |
+					(np.abs(np.diff(coolant_temp)) > coolant_tol*coolant_rise))
+			refine &= np.diff(x) > 2*min_spacing
+
+			if not refine.any() or level == max_levels:
+				break
+			# stations above the last refined interval in x come first in heatflux order
+			start = len(x) - 1 - np.nonzero(refine)[0][-1]
+			x = np.sort(np.concatenate([x, 0.5*(x[:-1] + x[1:])[refine]]))
+
+		self.refinement_levels = level
+		self.adaptive_geometry = stations
+
+	def coupled_residuals(self, z, stations):
+		"""residuals of the coupled contour system, see heatflux_coupled. z holds the scaled unknowns of every station in
+		station order: gas side surface temperature, coolant side wall temperature, coolant temperature and coolant
+		pressure after the station. Returns the scaled residuals and the station quantities of the last evaluation"""
+		st = stations
+		n = len(st['y'])
+		T_s, T_wc, T_c, P_c = z.reshape(n, 4).T * st['scale'][:, np.newaxis]
+		table = st['coolant_table']
+
+		# coolant state entering every station, the inlet state or the state after the upstream station
+		T_in = np.where(st['upstream'] < 0, self.coolant.T, T_c[st['upstream']])
+		P_in = np.where(st['upstream'] < 0, self.coolant.P, P_c[st['upstream']])
+		rho = table.interpolate('rho', T_in, P_in)
+		mu = table.interpolate('mu', T_in, P_in)
+		Cp = table.interpolate('Cp', T_in, P_in)
+		Pr = table.interpolate('Pr', T_in, P_in)
+		wall_mu = table.interpolate('mu', T_wc, P_in)
+
+		d = st['hydraulic_diameter']
+		flowvelocity = self.coolant_massflow/(rho * d**2/4 * np.pi * self.number_of_channels)
+		Re = rho*flowvelocity*d/mu
+		Nu = correlations.hess_kunz(Re, Pr, wall_mu, mu)
+		halpha_c = Nu * Cp*mu/Pr / d
+		halpha = correlations.gas_coefficient(st['gas_terms'], T_s)
+		radiation = st['radiation']
+		t_aw = self.t_aw
+		t = st['wall_thickness']
+		k = self.thermal_conductivity
+
+		# one step of the station fixed point iteration, zero residual at its fixed point
+		if self.k_tbc == 0:
+			heat_flux = (t_aw - T_in + radiation/halpha) / (1/halpha + t/k + 1/halpha_c)
+			wall_temp = t_aw - (heat_flux - radiation)/halpha
+			new_T_s = wall_temp
+		else:
+			heat_flux = (t_aw - T_in + radiation/halpha) / (1/halpha + t/k + 1/halpha_c + self.t_tbc/self.k_tbc)
+			wall_temp = ((halpha*halpha_c*self.k_tbc*t*t_aw + T_in*halpha*halpha_c*k*self.t_tbc + halpha*k*self.k_tbc*t_aw + T_in*halpha_c*k*self.k_tbc) /
+						(halpha*halpha_c*k*self.t_tbc + halpha*halpha_c*self.k_tbc*t + halpha*k*self.k_tbc + halpha_c*k*self.k_tbc))
+			new_T_s = t_aw - (heat_flux - radiation)/halpha
+		new_T_wc = wall_temp - heat_flux*t/k
+
+		# coolant heating and friction over the station, as in iterator and pressure_drop
+		new_T_c = T_in + heat_flux*2*np.pi*st['y']*st['section_length'] / (self.coolant_massflow*Cp)
+		annulus_area = d / 2 * st['y'] * 2 * np.pi
+		annulus_velocity = self.coolant_massflow/(rho * annulus_area)
+		fd = correlations.colebrook(rho*annulus_velocity*d/mu, d, st['surface_roughness'])
+		new_P_c = P_in - fd*st['section_length']/d*0.5*rho*annulus_velocity**2
+
+		residual = np.stack([T_s - new_T_s, T_wc - new_T_wc, T_c - new_T_c, P_c - new_P_c], axis=1) / st['scale']
+		values = {'q': heat_flux, 'wall_temp': wall_temp, 'tbc_wall_temp': new_T_s, 'coolant_temp': T_c, 'coolant_pressure': P_c, 'coolant_Re': Re,
+				'coolant_Nu': Nu, 'flowvelocity': flowvelocity, 'q_rad': radiation, 'halpha_gas': halpha}
+		return residual.ravel(), values
+
+	def coupled_jacobian(self, z, residual, stations, step=1e-7):
+		"""sparse finite difference Jacobian of coupled_residuals. Every station depends only on its own unknowns and the
+		coolant state of its upstream station, so stations at even and odd positions along the coolant path are
+		perturbed together, 8 residual evaluations for the whole contour. Block bidiagonal in coolant path order"""
+		n = len(stations['y'])
+		function = lambda z: self.coupled_residuals(z, stations)[0].reshape(n, 4)
+		return self.station_derivative(function, z, residual.reshape(n, 4), stations, step)
+
+	def station_derivative(self, function, z, f0, stations, step=1e-7):
+		"""sparse finite difference derivative of a station wise function of the coupled unknowns, function(z) returns an
+		array (stations, outputs) where every row depends only on the unknowns of its own station and the coolant state
+		of its upstream station
+
+		:return: sparse matrix (stations*outputs, stations*4)
+		"""
+		n, n_out = f0.shape
+		parity = stations['position'] % 2
+		upstream = stations['upstream']
+		rows, cols, values = [], [], []
+		for colour in (0, 1):
+			perturbed = np.flatnonzero(parity == colour)
+			downstream = np.flatnonzero((upstream >= 0) & (parity != colour))
+			for variable in range(4):
+				dz = np.zeros(n*4)
+				h = step*np.maximum(np.abs(z[perturbed*4 + variable]), 1)
+				dz[perturbed*4 + variable] = h
+				df = function(z + dz) - f0
+				h_station = np.zeros(n)
+				h_station[perturbed] = h
+
+				# own block of the perturbed stations
+				for output in range(n_out):
+					rows.append(perturbed*n_out + output)
+					cols.append(perturbed*4 + variable)
+					values.append(df[perturbed, output]/h_station[perturbed])
+				# coupling of the downstream stations to the coolant state of the perturbed ones
+				if variable >= 2 and len(downstream) > 0:
+					for output in range(n_out):
+						rows.append(downstream*n_out + output)
+						cols.append(upstream[downstream]*4 + variable)
+						values.append(df[downstream, output]/h_station[upstream[downstream]])
+
+		return sparse.csc_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))), shape=(n*n_out, 4*n))
+
+	def heatflux_coupled(self, hydraulic_diameter, geometry, wall_thickness, coolant_table, coolant_path=None, method='newton', initial_guess=None, max_iter=50, tol=1e-9, surface_roughness=6e-6):
+		"""alternative to heatflux. The wall temperatures and the coolant temperature and pressure of all stations are
+		written as one nonlinear system (4 unknowns per station) and solved at once, either with Newton on the sparse
+		block bidiagonal finite difference Jacobian or matrix free Newton-Krylov with GMRES. The coolant may visit the
+		stations in any order, e.g. co-flow from the injector end. Stores the same outputs as heatflux.
+
+		Without thermal barrier coating the solution matches heatflux to within the coolant table interpolation error
+		(below 0.1 % on a 1 K temperature grid, a few % on a coarse one where old thermo liquid Cp is erratic). With coating the gas side coefficient is
+		evaluated at the coating surface temperature, the iterator of heatflux keeps it at its 300 K start value.
+
+		:param hydraulic_diameter: cooling channel hydraulic diameter of every station, in heatflux order (nozzle exit first)
+		:param coolant_table: fluid_cache.FluidTable of the coolant with rho, mu, Cp and Pr, covering the coolant and coolant side wall temperatures
+		:param coolant_path: station indices (heatflux order) in the order the coolant passes them, nozzle exit to injector if None
+		:param method: 'newton' or 'krylov'
+		:param initial_guess: dictionary of station arrays wall_temp, coolant_temp and coolant_pressure, e.g. of a previous solution
+		:param tol: convergence tolerance on the largest scaled residual, temperatures scaled by 1000 K and pressure by the inlet pressure
+		"""
+		for name in ('rho', 'mu', 'Cp', 'Pr'):
+			if name not in coolant_table.properties:
+				raise ValueError('Coolant table does not contain ', name)
 
+		y = geometry[:,1][::-1]
+		x = geometry[:,0][::-1]
+		n = len(y)
+		path = np.arange(n) if coolant_path is None else np.asarray(coolant_path)
+		if np.any(np.sort(path) != np.arange(n)):
+			raise ValueError('Coolant path has to visit every station exactly once')
+
+		self.gas_side_state(y)
+		gas_terms = self.gas_side_terms(y, self.mach, self.t_aw)
+		section_length = np.concatenate([[0], np.sqrt(np.diff(x)**2 + np.diff(y)**2)])
+
+		position = np.empty(n, dtype=int)
+		position[path] = np.arange(n)
+		upstream = np.full(n, -1)
+		upstream[path[1:]] = path[:-1]
+
+		stations = {
+			'y': y,
+			'section_length': section_length,
+			'hydraulic_diameter': np.asarray(hydraulic_diameter, dtype=float),
+			'wall_thickness': np.asarray(wall_thickness, dtype=float),
+			'gas_terms': (gas_terms['halpha_ref'], gas_terms['wall_slope'], gas_terms['wall_offset'], gas_terms['exponent']),
+			'radiation': gas_terms['radiation'],
+			'coolant_table': coolant_table,
+			'surface_roughness': surface_roughness,
+			'position': position,
+			'upstream': upstream,
+			'scale': np.array([1e3, 1e3, 1e3, self.coolant.P]),
+		}
+
+		if initial_guess is None:
+			initial_guess = {
+				'wall_temp': 0.5*(self.t_aw + self.coolant.T),
+				'coolant_temp': np.full(n, self.coolant.T),
+				'coolant_pressure': np.full(n, self.coolant.P),
+			}
+		T_wall = np.asarray(initial_guess['wall_temp'], dtype=float)
+		z = (np.stack([T_wall, 0.5*(T_wall + initial_guess['coolant_temp']), initial_guess['coolant_temp'], initial_guess['coolant_pressure']], axis=1) / stations['scale']).ravel()
+
+		residual, values = self.coupled_residuals(z, stations)
+		norm = np.max(np.abs(residual))
+		it = 0
+		if method == 'newton':
+			while norm > tol:
+				step = spsolve(self.coupled_jacobian(z, residual, stations), -residual)
+				# halve the step until the residual decreases
+				damping = 1
+				while True:
+					new_residual, new_values = self.coupled_residuals(z + damping*step, stations)
+					new_norm = np.max(np.abs(new_residual))
+					if new_norm < norm or damping < 1e-4:
+						break
+					damping /= 2
+				z = z + damping*step
+				residual, values, norm = new_residual, new_values, new_norm
+
+				it += 1
+				if it > max_iter:
+					raise ValueError('Non-convergence, iteration number exceeded ', max_iter, ', residual ', norm)
+
+		elif method == 'krylov':
+			# matrix free Newton-Krylov: Jacobian vector products by finite differences of the residual, GMRES
+			# preconditioned with the factorised Jacobian of the initial guess, refreshed when a step fails
+			preconditioner = splu(self.coupled_jacobian(z, residual, stations))
+			while norm > tol:
+				def jacobian_vector(v, z=z, residual=residual):
+					eps = 1e-7*(1 + np.linalg.norm(z))/max(np.linalg.norm(v), 1e-30)
+					return (self.coupled_residuals(z + eps*v, stations)[0] - residual)/eps
+				jacobian = LinearOperator((4*n, 4*n), matvec=jacobian_vector)
+				step, _ = gmres(jacobian, -residual, M=LinearOperator((4*n, 4*n), matvec=preconditioner.solve), atol=1e-2*np.linalg.norm(residual))
+
+				damping = 1
+				while True:
+					new_residual, new_values = self.coupled_residuals(z + damping*step, stations)
+					new_norm = np.max(np.abs(new_residual))
+					if new_norm < norm or damping < 1e-4:
+						break
+					damping /= 2
+				if new_norm >= norm:
+					preconditioner = splu(self.coupled_jacobian(z, residual, stations))
+				else:
+					z = z + damping*step
+					residual, values, norm = new_residual, new_values, new_norm
+
+				it += 1
+				if it > max_iter:
+					raise ValueError('Non-convergence, iteration number exceeded ', max_iter, ', residual ', norm)
 
-	
+		else:
+			raise ValueError('Invalid solver method ', method, ', use "newton" or "krylov"')
+
+		self.iterations = it
+		self.coolant_path = path
+		self.coupled_solution = (z, stations)
+		self.optimised_hydraulic_diameter = stations['hydraulic_diameter']
+		for name, value in values.items():
+			setattr(self, name, np.asarray(value, dtype=float))
+		self.result = HeatfluxResult.from_heattransfer(self, geometry)
+
+	def sensitivities(self, step=1e-7):
+		"""adjoint gradients of maximum wall temperature [K], outlet coolant pressure [Pa] and total heat load [W] with
+		respect to the hydraulic diameter and wall thickness of every station, at the last heatflux_coupled solution.
+		One factorisation of the transposed Jacobian serves all three objectives. All derivatives are forward differences,
+		19 residual evaluations independent of the number of stations: the base point, 8 for the Jacobian, 8 for the
+		derivatives of wall temperature and heat load with respect to the unknowns, and one per geometry parameter type,
+		which perturbs every station at once as the geometry partials are station local. The maximum wall temperature
+		gradient is the one of the hottest station, max_wall_temp is not differentiable where the hottest station changes.
+
+		:return: dictionary of objective name and dictionary of hydraulic_diameter and wall_thickness gradient arrays (heatflux order)
+		"""
+		if not hasattr(self, 'coupled_solution'):
+			raise ValueError('Sensitivities require a heatflux_coupled solution')
+		z, stations = self.coupled_solution
+		n = len(stations['y'])
+		heated_area = 2*np.pi*stations['y']*stations['section_length']
+
+		def evaluate(z, stations):
+			residual, values = self.coupled_residuals(z, stations)
+			return residual.reshape(n, 4), np.stack([values['wall_temp'], values['q']*heated_area], axis=1)
+
+		residual, quantities = evaluate(z, stations)
+		jacobian = self.coupled_jacobian(z, residual.ravel(), stations, step)
+		dquantities = self.station_derivative(lambda z: evaluate(z, stations)[1], z, quantities, stations, step)
+		hottest = np.argmax(quantities[:,0])
+		outlet = self.coolant_path[-1]
+
+		# objective gradients with respect to the scaled unknowns
+		dJdz = {
+			'max_wall_temp': dquantities[hottest*2].toarray().ravel(),
+			'heat_load': np.asarray(dquantities[1::2].sum(axis=0)).ravel(),
+			'outlet_pressure': np.zeros(4*n),
+		}
+		dJdz['outlet_pressure'][outlet*4 + 3] = stations['scale'][3]
+
+		# partial derivatives with respect to the station wise geometry
+		dRdp = {}
+		dJdp = {}
+		for name in ('hydraulic_diameter', 'wall_thickness'):
+			h = step*stations[name]
+			perturbed = dict(stations)
+			perturbed[name] = stations[name] + h
+			new_residual, new_quantities = evaluate(z, perturbed)
+			dRdp[name] = (new_residual - residual)/h[:, np.newaxis]
+			dq = (new_quantities - quantities)/h[:, np.newaxis]
+			dJdp[name] = {'max_wall_temp': np.where(np.arange(n) == hottest, dq[:,0], 0), 'heat_load': dq[:,1], 'outlet_pressure': np.zeros(n)}
+
+		lu = splu(jacobian.T.tocsc())
+		gradients = {}
+		for objective, g in dJdz.items():
+			adjoint = lu.solve(g).reshape(n, 4)
+			gradients[objective] = {name: dJdp[name][objective] - np.sum(adjoint*dRdp[name], axis=1) for name in dRdp}
+		return gradients
@@ -12,6 +12,8 @@ import thermo
 from scipy.optimize import fsolve
 from rocketcea.cea_obj import CEA_Obj
 
+import correlations
+
 #INJECTOR CLASSES
 #import injectors
 
@@ -172,20 +174,8 @@ class Heattransfer():
 		self.cea.metric_cea_output('chamber', self.mixture_ratio, self.expansion_ratio)
 
 	def heat_trans_coeff_gas(self, mach, wall_temperature, y_coordinate):
-		gamma = self.cea.gamma
-		t = self.cea.T_static
-		p = self.chamber_pressure
-		mu = self.cea.mu
-		cp = self.cea.Cp
-		Pr = self.cea.Pr
-		local_area = np.pi*y_coordinate**2
-		throat_area = np.pi*self.throat_diameter**2/4
-
-		cstar = p * np.pi * self.throat_diameter**2 / 4 / self.massflow
-		s = (0.5*wall_temperature/t * (1+(gamma-1)/2 * mach*mach) + 0.5)**(-0.68) * (1+(gamma-1)/2 * mach*mach)**(-0.12)
-		halpha = 0.026/((self.throat_diameter)**0.2) * (mu**0.2)*cp/(Pr**0.6) * (p/cstar)**0.8 * (throat_area/local_area)**0.9 * s
-
-		return halpha
+		terms = correlations.standard_bartz(self.cea, self.chamber_pressure, self.massflow, self.throat_diameter, y_coordinate, mach, None)
+		return correlations.gas_coefficient(terms, wall_temperature)
 
 	def adiabatic_wall_temp(self, mach, diverging):
 		# Assumes turbulent flow in the chamber and laminar flow after the throat
@@ -206,19 +196,14 @@ class Heattransfer():
 		
 	def radiation(self, y_coordinate, mach):
 		T_local = self.cea.T_static/(1 + (self.cea.gamma-1)/2 * mach**2)
-		p_co2 = self.cea.mole_fractions[1]['*CO2'][0] * self.chamber_pressure
-		p_h2o = self.cea.mole_fractions[1]['H2O'][0] * self.chamber_pressure
-		q_r_co2 = 4 * (p_co2/1e5*y_coordinate)**0.3 * (T_local/100)**3.5
-		q_r_h2o = 5.74 * (p_h2o/1e5*y_coordinate)**0.3 * (T_local/100)**3.5
-
-		return q_r_co2 + q_r_h2o
+		return correlations.radiation(self.cea.mole_fractions, self.chamber_pressure, y_coordinate, T_local)
 
 	def heat_trans_coeff_coolant(self, wall_temperature, x_coordinate, y_coordinate, hydrolic_diameter, flow_velocity, t_r, channel_height, channel_width):
 		Pr = self.coolant.Pr
 		Re = self.coolant.rho*flow_velocity*hydrolic_diameter/self.coolant.mu
 		k = self.coolant.Cp*self.coolant.mu/Pr
 
-		Nu = 0.023*Re**0.8*Pr**0.4#*(self.coolant.T/wall_temperature) ** (0.57 - 1.59*hydrolic_diameter/x_coordinate)
+		Nu = correlations.dittus_boelter(Re, Pr)#*(self.coolant.T/wall_temperature) ** (0.57 - 1.59*hydrolic_diameter/x_coordinate)
 		halpha = Nu*k/hydrolic_diameter
 		fin_effectiveness = np.tanh(np.sqrt(2*halpha*t_r/k) * channel_height/t_r) / (np.sqrt(2*halpha*t_r/k) * channel_height/t_r)
 		halpha_F = halpha * (channel_width+2*fin_effectiveness*channel_height)/(channel_width+t_r)
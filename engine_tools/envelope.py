@@ -0,0 +1,150 @@
+import numpy as np
+import multiprocessing as mp
+
+import engine_tools as et
+import fluid_cache
+
+
+OUTPUTS = ['wall_temp', 'tbc_wall_temp', 'q', 'q_rad', 'halpha_gas', 'coolant_temp', 'coolant_pressure', 'coolant_Re', 'coolant_Nu', 'flowvelocity', 'mach', 't_aw']
+
+# geometry, coolant table and CEA snapshots shared with the worker processes, set once per process by _init_worker
+_shared = {}
+
+
+def throttle_points(chamber_pressures, mixture_ratios, nominal_chamber_pressure, nominal_massflow, nominal_coolant_pressure, coolant_temperature, coolant_fraction=1):
+	"""grid of operating points over chamber pressure and mixture ratio. Total mass flow and coolant inlet pressure
+	scale with chamber pressure, the coolant is coolant_fraction of the fuel flow
+
+	:return: list of dictionaries of operating point parameters
+	"""
+	points = []
+	for chamber_pressure in np.atleast_1d(chamber_pressures):
+		for mixture_ratio in np.atleast_1d(mixture_ratios):
+			total_massflow = nominal_massflow*chamber_pressure/nominal_chamber_pressure
+			points.append({
+				'chamber_pressure': chamber_pressure,
+				'mixture_ratio': mixture_ratio,
+				'total_massflow': total_massflow,
+				'coolant_massflow': coolant_fraction*total_massflow/(1 + mixture_ratio),
+				'coolant_temperature': coolant_temperature,
+				'coolant_pressure': nominal_coolant_pressure*chamber_pressure/nominal_chamber_pressure,
+			})
+	return points
+
+
+def _init_worker(shared):
+	_shared.update(shared)
+
+
+def _run_point(args):
+	"""runs Heattransfer.heatflux for one operating point, returns the station arrays or None if it did not converge"""
+	index, point = args
+	p = _shared
+	heat = et.Heattransfer(p['coolant'], p['coolant_massfraction'], point['coolant_massflow'], point['total_massflow'], None, None, point['mixture_ratio'],
+						point['chamber_pressure'], point['coolant_temperature'], point['coolant_pressure'], p['geometry'], p['number_of_channels'],
+						p['thermal_conductivity'], p['method'], p['k_tbc'], p['t_tbc'], cea=p['cea'][index], coolant_table=p['coolant_table'])
+	try:
+		heat.heatflux(p['hydraulic_diameter'].copy(), p['geometry'], p['wall_thickness'])
+	except (ValueError, TypeError):
+		# non-convergence, or thermo returning None properties once the coolant boils
+		return None
+	return np.array([getattr(heat, name) for name in OUTPUTS], dtype=float)
+
+
+class Envelope():
+	def __init__(self, coolant, coolant_massfraction, fuel, oxidiser, geometry, number_of_channels, thermal_conductivity, method, hydraulic_diameter, wall_thickness, k_tbc=0, t_tbc=0, coolant_table=None):
+		"""operating envelope of a regeneratively cooled chamber. Runs Heattransfer.heatflux for many operating points on a
+		process pool. CEA is evaluated once per unique (chamber pressure, mixture ratio) in the parent process and passed to
+		the workers as picklable snapshots, together with an optional coolant FluidTable shared by all points.
+
+		:param hydraulic_diameter: cooling channel hydraulic diameter per station, in heatflux order (nozzle exit first)
+		:param wall_thickness: wall thickness per station, in heatflux order
+		:param coolant_table: FluidTable of the coolant covering the coolant and coolant side wall temperatures
+		"""
+		self.fuel = fuel
+		self.oxidiser = oxidiser
+		self.geometry = geometry
+		self.expansion_ratio = np.pi*geometry[-1][1]**2/(np.pi*min(geometry[:,1])**2)
+		self.shared = {
+			'coolant': coolant,
+			'coolant_massfraction': coolant_massfraction,
+			'geometry': geometry,
+			'number_of_channels': number_of_channels,
+			'thermal_conductivity': thermal_conductivity,
+			'method': method,
+			'hydraulic_diameter': np.asarray(hydraulic_diameter, dtype=float),
+			'wall_thickness': np.asarray(wall_thickness, dtype=float),
+			'k_tbc': k_tbc,
+			't_tbc': t_tbc,
+			'coolant_table': coolant_table,
+		}
+		self.cea_cache = {}
+
+	def cea(self, chamber_pressure, mixture_ratio):
+		"""throat gas properties snapshot, cached per operating point"""
+		key = (float(chamber_pressure), float(mixture_ratio))
+		if key not in self.cea_cache:
+			cea = et.CEA(self.fuel, self.oxidiser, chamber_pressure)
+			cea.metric_cea_output('throat', mixture_ratio, self.expansion_ratio)
+			self.cea_cache[key] = cea.snapshot()
+		return self.cea_cache[key]
+
+	def run(self, points, processes=None):
+		"""runs all operating points
+
+		:param points: list of dictionaries with chamber_pressure, mixture_ratio, total_massflow, coolant_massflow, coolant_temperature and coolant_pressure
+		:param processes: number of worker processes, 1 runs in this process
+		:return: dictionary of OUTPUTS arrays of shape (points, stations), NaN rows for points that did not converge
+		"""
+		shared = dict(self.shared)
+		shared['cea'] = [self.cea(point['chamber_pressure'], point['mixture_ratio']) for point in points]
+		tasks = list(enumerate(points))
+
+		if processes == 1:
+			_init_worker(shared)
+			results = [_run_point(task) for task in tasks]
+		else:
+			pool = mp.Pool(processes if processes is not None else mp.cpu_count(), initializer=_init_worker, initargs=(shared,))
+			try:
+				results = pool.map(_run_point, tasks, chunksize=1)
+			finally:
+				pool.close()
+				pool.join()
+
+		n_stations = len(self.geometry)
+		stacked = np.full((len(points), len(OUTPUTS), n_stations), np.nan)
+		for i, result in enumerate(results):
+			if result is not None:
+				stacked[i] = result
+
+		self.points = points
+		self.converged = np.array([result is not None for result in results])
+		self.results = {name: stacked[:, j, :] for j, name in enumerate(OUTPUTS)}
+		return self.results
+
+	def margins(self, max_temperature):
+		"""wall temperature margin of every point to max_temperature [K], negative where the limit is exceeded"""
+		return max_temperature - np.max(self.results['wall_temp'], axis=1)
+
+
+if __name__ == '__main__':
+	import rocketcea
+
+	data = np.genfromtxt('optimised_geometry.csv', delimiter=',', dtype=None, skip_header=1)
+	geometry = data[:, :2]
+	hydraulic_diameter = data[:,10][::-1]
+	wall_thickness = data[:,12][::-1]
+
+	fuel_composition = ['C2H5OH', 'H2O']
+	fuel_mass_fraction = [0.8, 0.2]
+	ethanol80 = rocketcea.blends.newFuelBlend(fuelL=['C2H5OH', 'H2O'], fuelPcentL=[80,20])
+
+	coolant_table = fluid_cache.FluidTable(fuel_composition, fuel_mass_fraction, np.linspace(280, 900, 32), np.linspace(30e5, 90e5, 7), properties=('mu',))
+	envelope = Envelope(fuel_composition, fuel_mass_fraction, ethanol80, 'LOX', geometry, 84, 24, 'cinjarew', hydraulic_diameter, wall_thickness, k_tbc=1.2, t_tbc=0, coolant_table=coolant_table)
+
+	points = throttle_points(np.linspace(20e5, 60e5, 5), 1.49*np.array([0.9, 1, 1.1]), 50e5, 5.8, 75e5, 288)
+	results = envelope.run(points)
+
+	margins = envelope.margins(1250)
+	for point, margin, converged in zip(points, margins, envelope.converged):
+		print('Pc: ', point['chamber_pressure']/1e5, '[bar] O/F: ', round(point['mixture_ratio'], 3), ' wall temperature margin: ', round(margin, 1) if converged else 'not converged', '[K]')
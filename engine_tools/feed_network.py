@@ -0,0 +1,254 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+
+import injectors
+
+
+class Element():
+	"""edge of the feed network. Subclasses provide characteristic(dp), the mass flow for an array of positive pressure
+	drops. flow() makes it odd in dp and replaces it by a line through zero below dp_linear, so the Jacobian stays finite
+	when a branch carries (almost) no flow."""
+	dp_linear = 1e3				# [Pa]
+
+	def flow(self, dp, step=1e-6):
+		"""signed mass flow and its derivative with respect to the pressure drop"""
+		x = max(abs(dp), self.dp_linear)
+		m, m_step = self.characteristic(np.array([x, x*(1 + step)]))
+		if abs(dp) < self.dp_linear:
+			return m*dp/self.dp_linear, m/self.dp_linear
+		return np.sign(dp)*m, (m_step - m)/(x*step)
+
+
+class Orifice(Element):
+	def __init__(self, rho, viscosity, diameter, length, xiinlet, n_elements=1):
+		"""set of identical liquid orifices, flow from injectors.liquid_injector_flow
+
+		:param xiinlet: inlet loss, as returned by LiquidInjector.xiinlet
+		:param n_elements: number of orifices in parallel
+		"""
+		self.rho = rho
+		self.viscosity = viscosity
+		self.diameter = diameter
+		self.length = length
+		self.xiinlet = xiinlet
+		self.n_elements = n_elements
+
+	@classmethod
+	def from_injector(cls, injector, n_elements=1):
+		"""orifice with the fluid state and geometry of a sized LiquidInjector"""
+		if not hasattr(injector, 'diameter'):
+			injector.injector()
+		return cls(injector.fluid.rho, injector.fluid.mu, injector.diameter, injector.length, injector.xiinlet(), n_elements)
+
+	def characteristic(self, dp):
+		_, massflow, _ = injectors.liquid_injector_flow(self.rho, self.viscosity, self.length, self.diameter, dp, self.xiinlet)
+		return massflow*self.n_elements
+
+
+class Annulus(Element):
+	def __init__(self, rho, viscosity, annulusdiameter, width, length, xiinlet=None, n_elements=1):
+		"""annular gap, flow from injectors.annulus_injector_flow
+
+		:param annulusdiameter: pintle diameter [m]
+		:param width: annulus gap [m]
+		:param xiinlet: inlet loss, injectors.ANNULUS_XIINLET if None
+		"""
+		self.rho = rho
+		self.viscosity = viscosity
+		self.annulusdiameter = annulusdiameter
+		self.width = width
+		self.length = length
+		self.xiinlet = injectors.ANNULUS_XIINLET if xiinlet is None else xiinlet
+		self.n_elements = n_elements
+
+	@classmethod
+	def from_injector(cls, injector, n_elements=1):
+		"""annulus with the fluid state and geometry of a sized AnnulusInjector"""
+		if not hasattr(injector, 'diameter'):
+			injector.injector()
+		return cls(injector.fluid.rho, injector.fluid.mu, injector.annulusdiameter, injector.diameter, injector.length, injector.xiinlet(), n_elements)
+
+	def characteristic(self, dp):
+		_, massflow, _ = injectors.annulus_injector_flow(self.rho, self.viscosity, self.length, self.annulusdiameter, self.width, dp, self.xiinlet)
+		return massflow*self.n_elements
+
+
+class Channel(Element):
+	def __init__(self, rho, viscosity, hydraulic_diameter, length, area, surface_roughness=0, k_loss=0, n_channels=1):
+		"""pipe, feed line or cooling channel segment, Darcy Weisbach with the Colebrook friction factor as in
+		Heattransfer.pressure_drop, plus lumped minor losses
+
+		:param area: flow area of one channel [m^2]
+		:param k_loss: sum of the minor loss coefficients (bends, valves, fittings)
+		:param n_channels: number of channels in parallel
+		"""
+		self.rho = rho
+		self.viscosity = viscosity
+		self.hydraulic_diameter = hydraulic_diameter
+		self.length = length
+		self.area = area
+		self.surface_roughness = surface_roughness
+		self.k_loss = k_loss
+		self.n_channels = n_channels
+
+	def characteristic(self, dp, maxiter=100, tol=1e-10):
+		fd = np.full(np.shape(dp), 0.02)
+		for _ in range(maxiter):
+			vel = np.sqrt(2*dp/(self.rho*(fd*self.length/self.hydraulic_diameter + self.k_loss)))
+			Re = self.rho*vel*self.hydraulic_diameter/self.viscosity
+			new_fd = injectors.colebrook(Re, self.hydraulic_diameter, self.surface_roughness)
+			if np.max(np.abs(new_fd - fd)) < tol:
+				break
+			fd = new_fd
+		return self.rho*vel*self.area*self.n_channels
+
+
+class FeedNetwork():
+	def __init__(self):
+		"""hydraulic network of the feed system. Nodes are pressures, either fixed (tanks, chamber, ambient) or
+		free, edges are Element objects carrying mass flow from their first to their second node. All free node
+		pressures are solved at once with a damped Newton iteration on the sparse mass balance Jacobian."""
+		self.nodes = []
+		self.fixed = {}
+		self.demand = {}
+		self.edges = []
+
+	def add_node(self, name, pressure=None, demand=0):
+		"""
+		:param pressure: fixed pressure [Pa], None for a free node
+		:param demand: mass flow leaving the network at this node [kg/s]
+		"""
+		if name in self.nodes:
+			raise ValueError('Node ', name, ' already exists')
+		self.nodes.append(name)
+		if pressure is not None:
+			self.fixed[name] = pressure
+		self.demand[name] = demand
+
+	def add_edge(self, name, upstream, downstream, element):
+		for node in (upstream, downstream):
+			if node not in self.nodes:
+				raise ValueError('Unknown node ', node)
+		self.edges.append((name, upstream, downstream, element))
+
+	def residuals(self, pressures, free_index):
+		"""mass balance of every free node and its sparse Jacobian with respect to the free node pressures"""
+		n = len(free_index)
+		residual = np.array([-self.demand[node] for node in free_index], dtype=float)
+		rows, cols, values = [], [], []
+		self.massflows = {}
+		for name, upstream, downstream, element in self.edges:
+			m, g = element.flow(pressures[upstream] - pressures[downstream])
+			self.massflows[name] = m
+			i = free_index.get(upstream)
+			j = free_index.get(downstream)
+			if i is not None:
+				residual[i] -= m
+				rows.append(i); cols.append(i); values.append(-g)
+				if j is not None:
+					rows.append(i); cols.append(j); values.append(g)
+			if j is not None:
+				residual[j] += m
+				rows.append(j); cols.append(j); values.append(-g)
+				if i is not None:
+					rows.append(j); cols.append(i); values.append(g)
+		jacobian = sparse.csc_matrix((values, (rows, cols)), shape=(n, n))
+		return residual, jacobian
+
+	def solve(self, fixed=None, initial_guess=None, maxiter=100, tol=1e-8):
+		"""solves all node pressures and edge mass flows
+
+		:param fixed: dictionary of node name and pressure overriding fixed pressures, for off-nominal cases
+		:param initial_guess: dictionary of free node name and pressure, defaults to the last solution or the mean fixed pressure
+		:param tol: convergence tolerance on the largest mass imbalance [kg/s]
+		:return: dictionaries of node pressures and edge mass flows
+		"""
+		pressures = dict(self.fixed)
+		if fixed is not None:
+			pressures.update(fixed)
+		free = [node for node in self.nodes if node not in pressures]
+		free_index = {node: i for i, node in enumerate(free)}
+		if len(free) == 0:
+			raise ValueError('Network has no free nodes')
+
+		previous = getattr(self, 'pressures', {})
+		guess = initial_guess if initial_guess is not None else {}
+		mean_pressure = np.mean(list(pressures.values()))
+		x = np.array([guess.get(node, previous.get(node, mean_pressure)) for node in free], dtype=float)
+
+		def evaluate(x):
+			pressures.update(zip(free, x))
+			return self.residuals(pressures, free_index)
+
+		residual, jacobian = evaluate(x)
+		norm = np.max(np.abs(residual))
+		it = 0
+		while norm > tol:
+			step = spsolve(jacobian, -residual)
+			# halve the step until the imbalance decreases
+			damping = 1
+			while True:
+				new_residual, new_jacobian = evaluate(x + damping*step)
+				new_norm = np.max(np.abs(new_residual))
+				if new_norm < norm or damping < 1e-4:
+					break
+				damping /= 2
+			x = x + damping*step
+			residual, jacobian, norm = new_residual, new_jacobian, new_norm
+
+			it += 1
+			if it > maxiter:
+				raise ValueError('Non-convergence, iteration number exceeded ', maxiter, ', mass imbalance ', norm, ' kg/s')
+
+		self.iterations = it
+		self.pressures = dict(pressures)
+		return self.pressures, self.massflows
+
+	def summary(self):
+		"""pressure budget of the last solution: edge, nodes, pressure drop [bar] and mass flow [kg/s]"""
+		rows = []
+		for name, upstream, downstream, _ in self.edges:
+			rows.append((name, upstream, downstream, (self.pressures[upstream] - self.pressures[downstream])/1e5, self.massflows[name]))
+		return rows
+
+
+if __name__ == '__main__':
+	import standard_fluid_config as std
+
+	chamber_pressure = std.chamber_pressure
+	ox_dp = 10e5
+	fuel_dp = 10e5
+	n_holes = 48
+
+	# injector elements sized for the nominal point
+	ox_injector = injectors.LiquidInjector(['o2'], [1], std.ox_temperature, std.pre_injection_pressure, 2.75e-3, std.ox_massflow/n_holes, ox_dp, np.pi/2)
+	fuel_injector = injectors.AnnulusInjector(['c2h5oh', 'h2o'], [0.8,0.2], std.fuel_injection_temperature, std.pre_injection_pressure, 2e-3, 30e-3, std.fuel_massflow, fuel_dp)
+	ox, fuel = ox_injector.fluid, fuel_injector.fluid
+
+	line_diameter = 12.7e-3					# [m]
+	line_area = np.pi*line_diameter**2/4
+	channel_height = 2e-3					# [m]
+	channel_width = 2e-3					# [m]
+
+	network = FeedNetwork()
+	network.add_node('ox tank', 40e5)
+	network.add_node('fuel tank', 50e5)
+	network.add_node('chamber', chamber_pressure)
+	network.add_node('ambient', 1e5)
+	network.add_node('ox manifold')
+	network.add_node('jacket inlet')
+	network.add_node('fuel manifold')
+
+	network.add_edge('ox line', 'ox tank', 'ox manifold', Channel(ox.rho, ox.mu, line_diameter, 2, line_area, 1.5e-6, k_loss=3))
+	network.add_edge('ox injector', 'ox manifold', 'chamber', Orifice.from_injector(ox_injector, n_holes))
+	network.add_edge('fuel line', 'fuel tank', 'jacket inlet', Channel(fuel.rho, fuel.mu, line_diameter, 2, line_area, 1.5e-6, k_loss=3))
+	network.add_edge('cooling jacket', 'jacket inlet', 'fuel manifold', Channel(fuel.rho, fuel.mu, 2*channel_height*channel_width/(channel_height + channel_width), 0.3, channel_height*channel_width, 6e-6, k_loss=1.5, n_channels=40))
+	network.add_edge('fuel injector', 'fuel manifold', 'chamber', Annulus.from_injector(fuel_injector))
+	network.add_edge('fuel bypass', 'fuel manifold', 'ambient', Orifice(fuel.rho, fuel.mu, 1e-3, 3e-3, 0.5))
+
+	for tank_pressure in [40e5, 35e5, 45e5]:
+		pressures, massflows = network.solve(fixed={'ox tank': tank_pressure})
+		print('ox tank pressure: ', tank_pressure/1e5, '[bar], O/F: ', round(massflows['ox injector']/massflows['fuel injector'], 3), ', Newton iterations: ', network.iterations)
+		for name, upstream, downstream, dp, m in network.summary():
+			print('	', name, ': ', round(dp, 2), '[bar] ', round(m, 4), '[kg/s]')
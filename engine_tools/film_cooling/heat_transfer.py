@@ -7,12 +7,18 @@ AUTHOR: Jonthan Neeser
 DATE: 13.12.2020
 '''
 
+import os
+import sys
 from matplotlib.pyplot import table
 import numpy as np
 import thermo
 import scipy.optimize 
 from rocketcea.cea_obj import CEA_Obj
 
+# shared heat transfer correlations of engine_tools, appended so the modules of this folder take precedence
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import correlations
+
 #INJECTOR CLASSES
 #import injectors
 
@@ -177,35 +183,11 @@ class Heattransfer():
 		self.cea.metric_cea_output('throat', self.mixture_ratio, self.expansion_ratio)
 
 	def heat_trans_coeff_gas(self, mach, wall_temperature, t_aw, y_coordinate):
-		gamma = self.cea.gamma
-		p = self.chamber_pressure
-		mu = self.cea.mu
-		cp = self.cea.Cp
-		Pr = self.cea.Pr
-		T_local = self.cea.T_static/(1 + (self.cea.gamma-1)/2 * mach**2)
-		local_area = np.pi*y_coordinate**2
-		throat_area = np.pi*self.throat_diameter**2/4
-		
-		cstar = p * np.pi * self.throat_diameter**2 / 4 / self.massflow
-
-		if self.method == 'standard-bartz':
-			s = (0.5*wall_temperature/self.cea.T_static * (1+(gamma-1)/2 * mach*mach) + 0.5)**(-0.68) * (1+(gamma-1)/2 * mach*mach)**(-0.12)
-			halpha = 0.026/((self.throat_diameter)**0.2) * (mu**0.2)*cp/(Pr**0.6) * (p/cstar)**0.8 * (throat_area/local_area)**0.9 * s
-
-		elif self.method == 'modified-bartz':
-			T_f = 0.5*wall_temperature + 0.28*T_local + 0.22*t_aw
-			G = self.massflow/local_area
-			halpha = 0.026 * G**0.8/(self.throat_diameter)**0.2 * mu**0.2*cp/Pr**0.6 * (self.cea.T_static/T_f)**0.68
-
-		elif self.method == 'cinjarew':
-			eta_combustion = 0.92
-			T_hg = T_local + 0.8*(self.cea.T_static*eta_combustion**2 - T_local)
-			halpha = 0.01975 * self.cea.k**0.18*(self.massflow*cp)**0.82 / (2*y_coordinate)**1.82 * (T_hg/wall_temperature)**0.35
-
-		else:
-			raise ValueError('Invalid heat transfer method. Select: "standard-bartz", "modified-bartz" or "cinjarew"')
-
-		return halpha
+		correlation = correlations.gas_correlation(self.method)
+		# lower combustion efficiency than the regenerative cooling model
+		options = {'eta_combustion': 0.92} if self.method == 'cinjarew' else {}
+		terms = correlation(self.cea, self.chamber_pressure, self.massflow, self.throat_diameter, y_coordinate, mach, t_aw, **options)
+		return correlations.gas_coefficient(terms, wall_temperature)
 
 	def adiabatic_wall_temp(self, mach, diverging):
 		# Assumes turbulent flow in the chamber and laminar flow after the throat
@@ -231,12 +213,7 @@ class Heattransfer():
 	def radiation(self, y_coordinate, mach):
 		T_local = self.cea.T_static/(1 + (self.cea.gamma-1)/2 * mach**2)
 		P_local = self.chamber_pressure/((1 + (self.cea.gamma-1)/2 * mach**2)**(self.cea.gamma/(self.cea.gamma-1)))
-		p_co2 = self.cea.mole_fractions[1]['*CO2'][0] * P_local
-		p_h2o = self.cea.mole_fractions[1]['H2O'][0] * P_local
-		q_r_co2 = 4 * (p_co2/1e5*y_coordinate)**0.3 * (T_local/100)**3.5
-		q_r_h2o = 5.74 * (p_h2o/1e5*y_coordinate)**0.3 * (T_local/100)**3.5
-
-		return q_r_h2o + q_r_co2
+		return correlations.radiation(self.cea.mole_fractions, P_local, y_coordinate, T_local)
 
 	def heat_trans_coeff_coolant(self, wall_temperature, coolant_wall_temperature, x_coordinate, y_coordinate, section_length, section_number):
 		d_h = self.cooling_geometry.dhi_arr[section_number]
@@ -259,7 +236,7 @@ class Heattransfer():
 		k = Cp*mu/Pr
 
 		wall_fluid = thermo.Mixture(self.coolant_species, ws=self.coolant_massfraction, P=self.coolant.P, T=coolant_wall_temperature)
-		Nu = 0.0208*Re**0.8*Pr**0.4*(1+0.01457*wall_fluid.mug/mu)  #Hess & Kunz relationship
+		Nu = correlations.hess_kunz(Re, Pr, wall_fluid.mug, mu)
 		halpha = Nu * k / d_h
 		
 		#halpha = 0.023*self.coolant.Cp**0.333*k**0.667 / (self.coolant.mu**0.467*d_h**0.2) * (self.coolant_massflow/(np.pi/4 * d_h**2))**0.8  # McAdams
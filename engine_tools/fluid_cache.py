@@ -0,0 +1,126 @@
+from collections import OrderedDict
+
+import numpy as np
+import thermo
+
+
+class FluidCache():
+	def __init__(self, maxsize=256):
+		"""LRU bounded cache of thermo fluid states, keyed by (species, mass fractions, T, P).
+		Identical states are built once per process and the same object is returned to every caller,
+		so cached fluids must be treated as read only. Solvers that update their fluid state with
+		calculate() (e.g. the coolant in Heattransfer) have to build their own object.
+
+		:param maxsize: maximum number of fluid states kept
+		"""
+		self.maxsize = maxsize
+		self.states = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, key, factory):
+		if key in self.states:
+			self.hits += 1
+			self.states.move_to_end(key)
+			return self.states[key]
+
+		self.misses += 1
+		fluid = factory()
+		self.states[key] = fluid
+		if len(self.states) > self.maxsize:
+			self.states.popitem(last=False)
+		return fluid
+
+	def mixture(self, species, ws, T, P):
+		species = [species] if isinstance(species, str) else list(species)
+		ws = [float(w) for w in ws]
+		key = ('mixture', tuple(s.lower() for s in species), tuple(ws), float(T), float(P))
+		return self.get(key, lambda: thermo.Mixture(species, ws=ws, T=T, P=P))
+
+	def chemical(self, name, T, P):
+		key = ('chemical', name.lower(), float(T), float(P))
+		return self.get(key, lambda: thermo.Chemical(name, T=T, P=P))
+
+	def stats(self):
+		requests = self.hits + self.misses
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'hit rate': self.hits/requests if requests > 0 else 0,
+			'size': len(self.states),
+			'maxsize': self.maxsize,
+		}
+
+	def clear(self):
+		self.states.clear()
+		self.hits = 0
+		self.misses = 0
+
+
+# process wide cache shared by the injector and thermal classes
+cache = FluidCache()
+
+
+def mixture(species, ws, T, P):
+	return cache.mixture(species, ws, T, P)
+
+
+def chemical(name, T, P):
+	return cache.chemical(name, T, P)
+
+
+def _axis_weights(grid, x):
+	"""lower grid index and linear weight of the upper neighbour, clamped to the grid, for interpolation along one axis"""
+	if len(grid) == 1:
+		return np.zeros(np.shape(x), dtype=int), np.zeros(np.shape(x))
+	idx = np.clip(np.searchsorted(grid, x) - 1, 0, len(grid) - 2)
+	weight = np.clip((x - grid[idx])/(grid[idx+1] - grid[idx]), 0, 1)
+	return idx, weight
+
+
+class FluidTable():
+	def __init__(self, species, ws, temperatures, pressures, properties=('rho', 'mu')):
+		"""fluid properties tabulated on a temperature x pressure grid and interpolated bilinearly,
+		so thousands of states cost one thermo evaluation per grid point
+
+		:param temperatures: temperature grid [K]
+		:param pressures: pressure grid [Pa]
+		:param properties: thermo.Mixture attributes to tabulate
+		"""
+		self.species = [species] if isinstance(species, str) else list(species)
+		self.ws = list(ws)
+		self.temperatures = np.unique(np.asarray(temperatures, dtype=float))
+		self.pressures = np.unique(np.asarray(pressures, dtype=float))
+		self.properties = properties
+
+		self.table = {name: np.full((len(self.temperatures), len(self.pressures)), np.nan) for name in properties}
+		for i, T in enumerate(self.temperatures):
+			for j, P in enumerate(self.pressures):
+				fluid = thermo.Mixture(self.species, ws=self.ws, T=T, P=P)
+				for name in properties:
+					try:
+						self.table[name][i, j] = getattr(fluid, name)
+					except (ValueError, TypeError):
+						pass				# property undefined in this state (e.g. two phase), filled below
+
+		# undefined states take the value interpolated along temperature at the same pressure
+		for name in properties:
+			values = self.table[name]
+			for j in range(len(self.pressures)):
+				valid = np.isfinite(values[:, j])
+				if not valid.any():
+					raise ValueError('No valid ', name, ' states at ', self.pressures[j], ' Pa')
+				values[~valid, j] = np.interp(self.temperatures[~valid], self.temperatures[valid], values[valid, j])
+
+	def interpolate(self, name, T, P):
+		T, P = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(P, dtype=float))
+		i, wt = _axis_weights(self.temperatures, T)
+		j, wp = _axis_weights(self.pressures, P)
+		i1 = np.minimum(i + 1, len(self.temperatures) - 1)
+		j1 = np.minimum(j + 1, len(self.pressures) - 1)
+		values = self.table[name]
+		return (1-wt)*(1-wp)*values[i, j] + wt*(1-wp)*values[i1, j] + (1-wt)*wp*values[i, j1] + wt*wp*values[i1, j1]
+
+	def __call__(self, T, P):
+		"""density and dynamic viscosity at arrays of temperature and pressure"""
+		return self.interpolate('rho', T, P), self.interpolate('mu', T, P)
@@ -0,0 +1,127 @@
+import os
+import hashlib
+import inspect
+import numpy as np
+
+import engine_tools as et
+import correlations
+import fluid_cache
+
+
+# source files of the solver, any edit invalidates all cached results
+SOLVER_SOURCES = [et.__file__, correlations.__file__, fluid_cache.__file__]
+
+# Heattransfer attributes that, together with the heatflux arguments, determine the solution
+HEATTRANSFER_INPUTS = ['coolant_species', 'coolant_massfraction', 'coolant_massflow', 'massflow', 'mixture_ratio', 'chamber_pressure', 'geometry',
+					'number_of_channels', 'thermal_conductivity', 'method', 'k_tbc', 't_tbc']
+CEA_INPUTS = ['chamber_pressure', 'Cp', 'mu', 'k', 'Pr', 'MW', 'gamma', 'T_static', 'mole_fractions']
+
+
+def _update(hasher, value):
+	"""feeds a value of the solver inputs into the hash, arrays by shape, dtype and bytes"""
+	if isinstance(value, np.ndarray) or isinstance(value, (list, tuple)) and len(value) > 0 and all(isinstance(v, (int, float, np.number)) for v in value):
+		array = np.ascontiguousarray(value, dtype=float)
+		hasher.update(repr(array.shape).encode())
+		hasher.update(array.tobytes())
+	elif isinstance(value, dict):
+		for key in sorted(value, key=repr):
+			hasher.update(repr(key).encode())
+			_update(hasher, value[key])
+	elif isinstance(value, (list, tuple)):
+		for v in value:
+			_update(hasher, v)
+	elif isinstance(value, fluid_cache.FluidTable):
+		_update(hasher, [value.species, value.ws, value.temperatures, value.pressures, value.table])
+	else:
+		hasher.update(repr(value).encode())
+	hasher.update(b'|')
+
+
+class HeatfluxCache():
+	def __init__(self, directory='heatflux_cache'):
+		"""on disk cache of complete Heattransfer.heatflux runs. The key is a hash of every solver input: the Heattransfer
+		inputs, the CEA gas properties, the current coolant state, the coolant table, all heatflux arguments including
+		the geometry and channel arrays, and the solver source files. Results are stored as HeatfluxResult .npy files
+
+		:param directory: cache directory, shared by all scripts that should reuse each others runs
+		"""
+		self.directory = directory
+		self.hits = 0
+		self.misses = 0
+
+	def key(self, heat, *args, **kwargs):
+		"""hash of a heatflux call on heat with the given arguments"""
+		arguments = inspect.signature(heat.heatflux).bind(*args, **kwargs)
+		arguments.apply_defaults()
+
+		hasher = hashlib.sha256()
+		for filename in SOLVER_SOURCES:
+			with open(filename, 'rb') as file:
+				hasher.update(file.read())
+		for name in HEATTRANSFER_INPUTS:
+			_update(hasher, getattr(heat, name))
+		for name in CEA_INPUTS:
+			_update(hasher, getattr(heat.cea, name))
+		_update(hasher, [heat.coolant.T, heat.coolant.P])
+		_update(hasher, heat.coolant_table)
+		_update(hasher, dict(arguments.arguments))
+		return hasher.hexdigest()
+
+	def filename(self, key):
+		return os.path.join(self.directory, key + '.npy')
+
+	def heatflux(self, heat, *args, **kwargs):
+		"""heat.heatflux(*args, **kwargs), or the stored result of an identical earlier call. On a hit the output arrays
+		of heat (and an optimised hydraulic diameter array passed in) are set as heatflux would, the coolant state of heat
+		is not advanced
+
+		:return: HeatfluxResult
+		"""
+		key = self.key(heat, *args, **kwargs)
+		filename = self.filename(key)
+
+		if os.path.exists(filename):
+			self.hits += 1
+			result = et.HeatfluxResult.load(filename)
+			for name in result.SOLVER_COLUMNS:
+				setattr(heat, name, getattr(result, name)[::-1].copy())
+			arguments = inspect.signature(heat.heatflux).bind(*args, **kwargs)
+			hydraulic_diameter = arguments.arguments['hydraulic_diameter']
+			if isinstance(hydraulic_diameter, np.ndarray):
+				hydraulic_diameter[:] = result.hydraulic_diameter[::-1]
+			heat.optimised_hydraulic_diameter = hydraulic_diameter
+			heat.result = result
+			return result
+
+		self.misses += 1
+		heat.heatflux(*args, **kwargs)
+		os.makedirs(self.directory, exist_ok=True)
+		# write to a temporary file first, a concurrent reader never sees a partial result
+		temporary = os.path.join(self.directory, key + '.' + str(os.getpid()) + '.tmp.npy')
+		heat.result.save(temporary)
+		os.replace(temporary, filename)
+		return heat.result
+
+	def clear(self):
+		"""removes all cached results"""
+		if not os.path.isdir(self.directory):
+			return
+		for name in os.listdir(self.directory):
+			if name.endswith('.npy'):
+				os.remove(os.path.join(self.directory, name))
+
+
+if __name__ == '__main__':
+	import time
+	import rocketcea
+
+	data = np.genfromtxt('optimised_geometry.csv', delimiter=',', dtype=None, skip_header=1)
+	geometry = data[:, :2]
+	ethanol80 = rocketcea.blends.newFuelBlend(fuelL=['C2H5OH', 'H2O'], fuelPcentL=[80,20])
+
+	cache = HeatfluxCache()
+	for run in range(2):
+		heat = et.Heattransfer(['C2H5OH', 'H2O'], [0.8, 0.2], 5.8/2.49, 5.8, ethanol80, 'LOX', 1.49, 50e5, 288, 75e5, geometry, 84, 24, 'cinjarew', 1.2, 0)
+		start = time.perf_counter()
+		result = cache.heatflux(heat, data[:,10][::-1].copy(), geometry, data[:,12][::-1])
+		print('run ', run+1, ': ', round((time.perf_counter() - start)*1e3, 1), 'ms, max wall temperature ', max(result.wall_temp), 'K, cache hits ', cache.hits)
@@ -6,6 +6,8 @@ from mpl_toolkits.mplot3d import Axes3D
 import csv
 
 import standard_fluid_config as std
+import fluid_cache
+import correlations
 
 class IjectorThermal():
 	def __init__(self, thermal_conductivity, max_wall_thickness, fluid_temperature, fluid_pressure, fluid_massflow, fluid, fluid_mixture, hydrolic_diameter, massflow, chamber_pressure, velocity, gas_temperature=0):
@@ -14,7 +16,7 @@ class IjectorThermal():
 		"""		
 		self.thermal_conductivity = thermal_conductivity
 		self.max_wall_thickness = max_wall_thickness
-		self.fluid = thermo.Mixture(fluid, ws=fluid_mixture, T=fluid_temperature, P=fluid_pressure)
+		self.fluid = fluid_cache.mixture(fluid, fluid_mixture, fluid_temperature, fluid_pressure)
 		self.flow_velocity = velocity
 		self.chamber_diameter = std.chamber_diameter
 		self.throat_diameter = std.throat_diameter
@@ -27,22 +29,11 @@ class IjectorThermal():
 		self.cea = std.cea
 
 	def heat_trans_coeff_gas(self, mach, wall_temperature):
-		gamma = self.cea.gamma
 		t = self.cea.T_static
 		if self.gas_temperature != 0:
 			t= self.gas_temperature
-		p = self.chamber_pressure
-		mu = self.cea.mu
-		cp = self.cea.Cp
-		Pr = self.cea.Pr
-		local_area = np.pi*self.chamber_diameter**2/4
-		throat_area = np.pi*self.throat_diameter**2/4
-
-		cstar = p * np.pi * self.throat_diameter**2 / 4 / self.massflow
-		s = (0.5*wall_temperature/t * (1+(gamma-1)/2 * mach*mach) + 0.5)**(-0.68) * (1+(gamma-1)/2 * mach*mach)**(-0.12)
-		halpha = 0.026/((self.throat_diameter)**0.2) * (mu**0.2)*cp/(Pr**0.6) * (p/cstar)**0.8 * (throat_area/local_area)**0.9 * s
-
-		return halpha
+		terms = correlations.standard_bartz(self.cea, self.chamber_pressure, self.massflow, self.throat_diameter, self.chamber_diameter/2, mach, None, T_static=t)
+		return correlations.gas_coefficient(terms, wall_temperature)
 
 	def adiabatic_wall_temp(self, mach):
 		# Assumes turbulent flow in the chamber
@@ -60,25 +51,34 @@ class IjectorThermal():
 		if self.gas_temperature != 0:
 			T_local = self.gas_temperature
 
-		p_co2 = self.cea.mole_fractions[1]['*CO2'][0] * self.chamber_pressure
-		p_h2o = self.cea.mole_fractions[1]['H2O'][0] * self.chamber_pressure
-		q_r_co2 = 4 * (p_co2/1e5*self.chamber_diameter/2)**0.3 * (T_local/100)**3.5
-		q_r_h2o = 5.74 * (p_h2o/1e5*self.chamber_diameter/2)**0.3 * (T_local/100)**3.5
-
-		return q_r_co2 + q_r_h2o
+		return correlations.radiation(self.cea.mole_fractions, self.chamber_pressure, self.chamber_diameter/2, T_local)
 
-	def heat_trans_coeff_coolant(self, wall_temperature, flowvelocity):
+	def heat_trans_coeff_coolant(self, wall_temperature, flowvelocity, hydrolic_diameter=None):
+		if hydrolic_diameter is None:
+			hydrolic_diameter = self.hydrolic_diameter
 		Pr = self.fluid.Pr
-		Re = self.fluid.rho*flowvelocity*self.hydrolic_diameter/self.fluid.mu
+		Re = self.fluid.rho*flowvelocity*hydrolic_diameter/self.fluid.mu
 		k = self.fluid.Cp*self.fluid.mu/Pr
 		
-		Nu = 0.023*Re**0.8*Pr**0.4
-		halpha = Nu*k/self.hydrolic_diameter
+		Nu = correlations.dittus_boelter(Re, Pr)
+		halpha = Nu*k/hydrolic_diameter
 
 		return halpha, Re, Nu
 
-	def wall_temperature(self, flowvelocity, max_iter=1000, tol=1e-6):
-		wall_temperature = 300
+	def wall_temperature(self, flowvelocity, max_iter=1000, tol=1e-6, hydrolic_diameter=None):
+		"""
+		Fixed point iteration on the gas side wall temperature. flowvelocity and hydrolic_diameter may be arrays
+		of matching (or broadcastable) shape, all stations are then iterated at once until the largest change
+		is below tol and the results are stored as arrays of that shape.
+
+		:param flowvelocity: coolant flow velocity [m/s]
+		:param hydrolic_diameter: coolant hydraulic diameter [m], defaults to the one given at construction
+		"""
+		if hydrolic_diameter is None:
+			hydrolic_diameter = self.hydrolic_diameter
+		flowvelocity, hydrolic_diameter = np.broadcast_arrays(np.asarray(flowvelocity, dtype=float), np.asarray(hydrolic_diameter, dtype=float))
+
+		wall_temperature = np.full(flowvelocity.shape, 300.)
 		iteration = 0
 		difference_wall = 1
 
@@ -89,13 +89,13 @@ class IjectorThermal():
 
 		while difference_wall > tol:
 			halpha = self.heat_trans_coeff_gas(mach, wall_temperature)
-			halpha_c, Re, Nu = self.heat_trans_coeff_coolant(wall_temperature, flowvelocity)
+			halpha_c, Re, Nu = self.heat_trans_coeff_coolant(wall_temperature, flowvelocity, hydrolic_diameter)
 			radiation = self.radiation(mach)
 
 			heat_flux = (adiabatic_wall_temperature - self.fluid.T + radiation/halpha) / (1/halpha + self.max_wall_thickness/self.thermal_conductivity + 1/halpha_c)
 			new_wall_temp = - ((heat_flux - radiation)/halpha - adiabatic_wall_temperature)
 			coolant_wall_temp = -heat_flux*self.max_wall_thickness/self.thermal_conductivity + new_wall_temp
-			difference_wall = abs(new_wall_temp - wall_temperature)
+			difference_wall = np.max(np.abs(new_wall_temp - wall_temperature))
 
 			iteration += 1
 			if iteration > max_iter:
@@ -138,21 +138,23 @@ if __name__ == "__main__":
 	flow_velocity = std.fuel_massflow / std.liquid_fuel.rho / areas
 	hydrolic_diameter = 2*flow_height*areas / (areas + flow_height)
 
-	coolant_side_faceplate_temp = np.ndarray(len(chamber_radi))
-	gas_side_faceplate_temp = np.ndarray(len(chamber_radi))
-	halpha_c = np.ndarray(len(chamber_radi))
-
-	for i in range(len(chamber_radi)):
-		faceplate_thermal = IjectorThermal(thermal_conductivity_stainless, wall_thickness, std.fuel_injection_temperature, std.pre_injection_pressure, std.fuel_massflow, std.fuel_composition, std.fuel_mass_fraction,hydrolic_diameter[i], std.total_massflow, std.chamber_pressure, velocity)
-		faceplate_thermal.wall_temperature(flow_velocity[i])
-		coolant_side_faceplate_temp[i] = faceplate_thermal.coolant_wall_temp
-		gas_side_faceplate_temp[i] = faceplate_thermal.max_wall_temperature
-		halpha_c[i] = faceplate_thermal.halpha_c
-
+	# all radial stations converged in a single call
+	faceplate_thermal = IjectorThermal(thermal_conductivity_stainless, wall_thickness, std.fuel_injection_temperature, std.pre_injection_pressure, std.fuel_massflow, std.fuel_composition, std.fuel_mass_fraction, hydrolic_diameter, std.total_massflow, std.chamber_pressure, velocity)
+	faceplate_thermal.wall_temperature(flow_velocity, hydrolic_diameter=hydrolic_diameter)
+	coolant_side_faceplate_temp = faceplate_thermal.coolant_wall_temp
+	gas_side_faceplate_temp = faceplate_thermal.max_wall_temperature
+	halpha_c = faceplate_thermal.halpha_c
 
 	print('maximum face plate temperature: ', max(gas_side_faceplate_temp), 'K')
 	print('maximum coolant side face plate temperature: ', max(coolant_side_faceplate_temp), 'K')
 
+	# radius x operating point map, fuel mass flow throttled from 50 to 110 %
+	throttle = np.linspace(0.5, 1.1, 25)
+	map_velocity = flow_velocity[:, np.newaxis] * throttle[np.newaxis, :]
+	faceplate_thermal.wall_temperature(map_velocity, hydrolic_diameter=hydrolic_diameter[:, np.newaxis])
+	faceplate_map = faceplate_thermal.max_wall_temperature
+	print('maximum face plate temperature at ', throttle[0]*100, '% fuel mass flow: ', max(faceplate_map[:, 0]), 'K')
+
 	plt.plot(chamber_radi*1e3, gas_side_faceplate_temp, label="maximum faceplate temperature")
 	plt.plot(chamber_radi*1e3, coolant_side_faceplate_temp, label="coolant side faceplate temperature")
 	plt.xlabel("chamber radius [mm]")
@@ -167,6 +169,12 @@ if __name__ == "__main__":
 	plt.grid()
 	plt.show()
 
+	plt.contourf(throttle*100, chamber_radi*1e3, faceplate_map, 50, cmap='inferno')
+	plt.colorbar(label="maximum faceplate temperature [K]")
+	plt.xlabel("fuel mass flow [%]")
+	plt.ylabel("chamber radius [mm]")
+	plt.show()
+
 
 	# export geometric parameters in mm for catia import 
 	with open('coolant_halpha.csv', 'w', newline='') as file:
@@ -3,27 +3,39 @@ import thermo
 from scipy.optimize import fsolve
 from matplotlib import pyplot as plt
 
+import fluid_cache
+import correlations
+
+
+XI1C_COEFFICIENTS = (3.55378, 0.647016, 0.103358)     # xi1c = a*exp(-b*log10(Re)) - c
+ANNULUS_XIINLET = 1.662                                 # fit from cryo test data
+
+
 class LiquidInjector():
     def __init__(self, fluid, mixture, temperature, pressure, length, massflow, pressuredrop, inletangle):
-        self.fluid = thermo.Mixture(fluid, ws=mixture,  T=temperature, P=pressure)
+        self.fluid = fluid_cache.mixture(fluid, mixture, temperature, pressure)
         self.length = length 
         self.massflow = massflow
         self.pressuredrop = pressuredrop
         self.inletangle = inletangle
 
-    def xi1c(self, Re):
+    @staticmethod
+    def xi1c(Re, coefficients=None):
         # curfve fit from "Liquid Rocket Trhust Chambers" page 48 realting inlet efficiency to Reynolds number
+        a, b, c = XI1C_COEFFICIENTS if coefficients is None else coefficients
         Re = np.log10(Re)
-        return 3.55378*np.exp(-Re*0.647016) - 0.103358
+        return a*np.exp(-Re*b) - c
 
     def xiinlet(self):
         return 0.5 + 2.5/np.pi*self.inletangle         # min 0.5 for coaxial flow before injection, max 0.9 for flow at pi/6 rad realtive to faceplate. orignially 0.5 + 1.2/np.pi*self.inletangle 
     
-    def injector(self, maxiter=100, tol=1e-6):
+    def injector(self, maxiter=100, tol=1e-6, initial_mu=None):
         it = 0 
         difference = 1 
         xiinlet = self.xiinlet()
         xi = xiinlet
+        if initial_mu is not None:
+            xi = 1/initial_mu**2 - 1                    # warm start from a previously converged discharge coefficient
         while difference > tol:
             mu = 1/np.sqrt(1 + xi)
             diameter = 0.95*self.massflow**0.5 * mu**(-0.5) * (self.fluid.rho*self.pressuredrop)**(-0.25)
@@ -45,9 +57,49 @@ class LiquidInjector():
         self.diameter = diameter
         self.velocity = vel
 
+    def injector_array(self, massflow=None, pressuredrop=None, length=None, maxiter=100, tol=1e-6):
+        """sizes many elements in one call, arguments broadcast against each other and default to the instance values
+
+        :return: discharge coefficient, diameter and velocity arrays
+        """
+        massflow = self.massflow if massflow is None else massflow
+        pressuredrop = self.pressuredrop if pressuredrop is None else pressuredrop
+        length = self.length if length is None else length
+        return liquid_injector_sizing(self.fluid.rho, self.fluid.mu, length, massflow, pressuredrop, self.xiinlet(), maxiter, tol)
+
+    def monte_carlo(self, n_elements=1, n_samples=1000, diameter_tol=0, length_tol=0, cd_tol=0, pressuredrop_tol=0, rho_tol=0, viscosity_tol=0, rng=None, maxiter=100, tol=1e-6):
+        """manufacturing tolerance analysis of n_elements holes sized by injector(). Tolerances are standard deviations of normal
+        distributions around the sized element. Geometry and Cd scatter per hole, pressure drop and fluid state scatter per sample
+        since all holes share the manifold. The flow through every perturbed hole is re-evaluated with its own Reynolds dependent Cd.
+
+        :param diameter_tol: hole diameter standard deviation [m]
+        :param length_tol: hole length standard deviation [m]
+        :param cd_tol: relative standard deviation of the discharge coefficient (model and edge finish scatter)
+        :param pressuredrop_tol: pressure drop standard deviation [Pa]
+        :param rho_tol: relative standard deviation of the density
+        :param viscosity_tol: relative standard deviation of the viscosity
+        :param rng: numpy Generator or seed
+        :return: mass flow and discharge coefficient arrays of shape (n_samples, n_elements)
+        """
+        if not hasattr(self, 'diameter'):
+            self.injector()
+        rng = np.random.default_rng(rng)
+        element = (n_samples, n_elements)
+        sample = (n_samples, 1)
+
+        diameter = self.diameter + diameter_tol*rng.standard_normal(element)
+        length = self.length + length_tol*rng.standard_normal(element)
+        cd_factor = 1 + cd_tol*rng.standard_normal(element)
+        pressuredrop = self.pressuredrop + pressuredrop_tol*rng.standard_normal(sample)
+        rho = self.fluid.rho*(1 + rho_tol*rng.standard_normal(sample))
+        viscosity = self.fluid.mu*(1 + viscosity_tol*rng.standard_normal(sample))
+
+        mu, massflow, _ = liquid_injector_flow(rho, viscosity, length, diameter, pressuredrop, self.xiinlet(), cd_factor, maxiter, tol)
+        return massflow, mu
+
 class GasInjector():
     def __init__(self, gas, temperature, pressure, length, massflow, pressuredrop, upstreamdiameter, inletangle):
-        self.gas = thermo.Chemical(gas, T=temperature, P=pressure)
+        self.gas = fluid_cache.chemical(gas, temperature, pressure)
         self.length = length 
         self.massflow = massflow
         self.pressuredrop = pressuredrop
@@ -95,13 +147,27 @@ class GasInjector():
         self.diameter = diameter
         self.velocity = vel
 
+    def injector_array(self, massflow=None, pressuredrop=None, length=None, maxiter=100, tol=1e-6):
+        """sizes many elements in one call, arguments broadcast against each other and default to the instance values
+
+        :return: discharge coefficient, diameter, velocity and (possibly reduced) pressure drop arrays
+        """
+        if self.gas.phase == 'l':
+            raise ValueError("Fluid is not gaseous before injection")
+        massflow = self.massflow if massflow is None else massflow
+        pressuredrop = self.pressuredrop if pressuredrop is None else pressuredrop
+        length = self.length if length is None else length
+        gamma = self.gas.Cpg/self.gas.Cvg
+        R = self.gas.Cpg-self.gas.Cvg
+        return gas_injector_sizing(gamma, R, self.gas.T, self.gas.P, self.gas.rho, self.gas.mu, length, massflow, pressuredrop, self.upstreamdiameter, self.xiinlet(), maxiter, tol)
+
 
 class AnnularOrifice():
     """
     annulus volume flow based on Poiseuille Flow
     """
     def __init__(self, fluid, mixture, temperature, pressure, length, pressuredrop, massflow, r_inner):
-        self.fluid = thermo.Mixture(fluid, ws=mixture, T=temperature, P=pressure)
+        self.fluid = fluid_cache.mixture(fluid, mixture, temperature, pressure)
         self.length = length
         self.pressuredrop = pressuredrop
         self.r_inner = r_inner
@@ -131,7 +197,7 @@ class AnnulusInjector():
         :param annulusdiameter: mean diameter of annulus
         :param pressuredrop: design pressure drop over injector 
         """        
-        self.fluid = thermo.Mixture(fluid, ws=mixture, T=temperature, P=pressure)
+        self.fluid = fluid_cache.mixture(fluid, mixture, temperature, pressure)
         self.annulusdiameter = annulusdiameter 
         self.length = length
         self.massflow = massflow
@@ -145,12 +211,14 @@ class AnnulusInjector():
 
     def xiinlet(self):
         #return 0.5 + 1.2/np.pi*self.inletangle             # min 0.5 for coaxial flow before injection, max 0.9 for flow at pi/6 rad realtive to faceplate 
-        return 1.662                                        # fit from cryo test data
+        return ANNULUS_XIINLET
 
-    def injector(self, maxiter=100, tol=1e-6):
+    def injector(self, maxiter=100, tol=1e-6, initial_mu=None):
         it = 0 
         difference = 1 
         mu = 1/np.sqrt(1+self.xiinlet())                               
+        if initial_mu is not None:
+            mu = initial_mu                             # warm start from a previously converged discharge coefficient
         di = 1e-3
         while difference > tol:
             D = self.annulusdiameter + di
@@ -177,21 +245,290 @@ class AnnulusInjector():
         self.diameter = di
         self.velocity = vel
 
+    def injector_array(self, massflow=None, pressuredrop=None, annulusdiameter=None, length=None, maxiter=100, tol=1e-6):
+        """sizes many elements in one call, arguments broadcast against each other and default to the instance values
+
+        :return: discharge coefficient, annulus width, velocity and mean diameter arrays
+        """
+        massflow = self.massflow if massflow is None else massflow
+        pressuredrop = self.pressuredrop if pressuredrop is None else pressuredrop
+        annulusdiameter = self.annulusdiameter if annulusdiameter is None else annulusdiameter
+        length = self.length if length is None else length
+        return annulus_injector_sizing(self.fluid.rho, self.fluid.mu, length, annulusdiameter, massflow, pressuredrop, self.xiinlet(), maxiter, tol)
+
+    def monte_carlo(self, n_elements=1, n_samples=1000, width_tol=0, annulusdiameter_tol=0, length_tol=0, cd_tol=0, pressuredrop_tol=0, rho_tol=0, viscosity_tol=0, rng=None, maxiter=100, tol=1e-6):
+        """manufacturing tolerance analysis of n_elements annuli sized by injector(), see LiquidInjector.monte_carlo
+
+        :param width_tol: annulus gap standard deviation [m]
+        :param annulusdiameter_tol: pintle diameter standard deviation [m]
+        :return: mass flow and discharge coefficient arrays of shape (n_samples, n_elements)
+        """
+        if not hasattr(self, 'diameter'):
+            self.injector()
+        rng = np.random.default_rng(rng)
+        element = (n_samples, n_elements)
+        sample = (n_samples, 1)
+
+        width = self.diameter + width_tol*rng.standard_normal(element)
+        annulusdiameter = self.annulusdiameter + annulusdiameter_tol*rng.standard_normal(element)
+        length = self.length + length_tol*rng.standard_normal(element)
+        cd_factor = 1 + cd_tol*rng.standard_normal(element)
+        pressuredrop = self.pressuredrop + pressuredrop_tol*rng.standard_normal(sample)
+        rho = self.fluid.rho*(1 + rho_tol*rng.standard_normal(sample))
+        viscosity = self.fluid.mu*(1 + viscosity_tol*rng.standard_normal(sample))
+
+        mu, massflow, _ = annulus_injector_flow(rho, viscosity, length, annulusdiameter, width, pressuredrop, self.xiinlet(), cd_factor, maxiter, tol)
+        return massflow, mu
+
+
+def colebrook(Re, diameter, surface_roughness=0, maxiter=100, tol=1e-12):
+    """Darcy friction factor from the Colebrook equation for arrays of Reynolds numbers, see correlations.colebrook"""
+    return correlations.colebrook(Re, diameter, surface_roughness, maxiter, tol)
+
+
+def _lanes(*arrays):
+    """broadcast float copies of the inputs with at least one dimension, so scalar injectors run as a single lane"""
+    return [np.array(a, dtype=float) for a in np.broadcast_arrays(*map(np.atleast_1d, arrays))]
+
+
+def _unlanes(shape, *arrays):
+    """lane arrays back in the broadcast input shape, numpy scalars for scalar inputs"""
+    return tuple(a.reshape(shape)[()] for a in arrays)
+
+
+def liquid_injector_sizing(rho, viscosity, length, massflow, pressuredrop, xiinlet, maxiter=100, tol=1e-6):
+    """vectorised LiquidInjector.injector, all lanes iterate together and converged lanes are masked out
+
+    :param rho: fluid density
+    :param viscosity: fluid dynamic viscosity
+    :return: discharge coefficient, diameter and velocity arrays of the broadcast input shape, scalars for scalar inputs
+    """
+    shape = np.broadcast(rho, viscosity, length, massflow, pressuredrop, xiinlet).shape
+    rho, viscosity, length, massflow, pressuredrop, xiinlet = _lanes(rho, viscosity, length, massflow, pressuredrop, xiinlet)
+    mu = np.empty(massflow.shape)
+    diameter = np.empty(massflow.shape)
+    vel = np.empty(massflow.shape)
+
+    xi = xiinlet.copy()
+    active = np.ones(massflow.shape, dtype=bool)
+    it = 0
+    while active.any():
+        r, v, m = rho[active], viscosity[active], massflow[active]
+        mu_a = 1/np.sqrt(1 + xi[active])
+        diameter_a = 0.95*m**0.5 * mu_a**(-0.5) * (r*pressuredrop[active])**(-0.25)
+        vel_a = 1.273*m*r**(-1)*diameter_a**(-2)
+        Re = r*vel_a*diameter_a/v
+        lam = 0.3164*Re**(-0.25)
+        friction = lam*length[active]/diameter_a
+        xi_a = xiinlet[active] + LiquidInjector.xi1c(Re) + friction
+        newmu = 1/np.sqrt(1 + xi_a)
+
+        it += 1
+        if it > maxiter:
+            raise ValueError("Not converged after ", maxiter, " iterations in ", np.count_nonzero(active), " lanes")
+
+        xi[active] = xi_a
+        mu[active] = mu_a
+        diameter[active] = diameter_a
+        vel[active] = vel_a
+        idx = np.flatnonzero(active)
+        active.flat[idx[np.abs(mu_a - newmu) <= tol]] = False
+
+    return _unlanes(shape, mu, diameter, vel)
+
+
+def annulus_injector_sizing(rho, viscosity, length, annulusdiameter, massflow, pressuredrop, xiinlet, maxiter=100, tol=1e-6):
+    """vectorised AnnulusInjector.injector, all lanes iterate together and converged lanes are masked out
+
+    :return: discharge coefficient, annulus width, velocity and mean diameter arrays of the broadcast input shape
+    """
+    input_shape = np.broadcast(rho, viscosity, length, annulusdiameter, massflow, pressuredrop, xiinlet).shape
+    rho, viscosity, length, annulusdiameter, massflow, pressuredrop, xiinlet = _lanes(rho, viscosity, length, annulusdiameter, massflow, pressuredrop, xiinlet)
+    shape = massflow.shape
+    mu = 1/np.sqrt(1 + xiinlet)
+    di = np.full(shape, 1e-3)
+    D = np.empty(shape)
+    vel = np.empty(shape)
+
+    active = np.ones(shape, dtype=bool)
+    it = 0
+    while active.any():
+        r, v = rho[active], viscosity[active]
+        D_a = annulusdiameter[active] + di[active]
+        vel_a = mu[active]*np.sqrt(2*pressuredrop[active]/r)
+        Re = r*vel_a*di[active]/v
+        di_a = massflow[active]/(r*np.pi*D_a*vel_a)
+
+        xifriction = colebrook(Re, di_a)*length[active]/di_a
+        newmu = 1/np.sqrt(1 + xifriction + xiinlet[active])
+
+        it += 1
+        if it > maxiter:
+            raise ValueError("Not converged after ", maxiter, " iterations in ", np.count_nonzero(active), " lanes")
+
+        converged = np.abs(mu[active] - newmu) <= tol
+        D[active] = D_a
+        vel[active] = vel_a
+        di[active] = di_a
+        mu[active] = newmu
+        idx = np.flatnonzero(active)
+        active.flat[idx[converged]] = False
+
+    return _unlanes(input_shape, mu, di, vel, D)
+
+
+def gas_injector_sizing(gamma, R, temperature, pressure, rho, viscosity, length, massflow, pressuredrop, upstreamdiameter, xiinlet, maxiter=100, tol=1e-6):
+    """vectorised GasInjector.injector, all lanes iterate together and converged lanes are masked out.
+    Lanes exceeding the speed of sound have their design pressure drop reduced by 0.05 bar per iteration,
+    with the chamber pressure updated accordingly.
+
+    :return: discharge coefficient, diameter, velocity and pressure drop arrays of the broadcast input shape
+    """
+    input_shape = np.broadcast(length, massflow, pressuredrop, upstreamdiameter, xiinlet).shape
+    length, massflow, pressuredrop, upstreamdiameter, xiinlet = _lanes(length, massflow, pressuredrop, upstreamdiameter, xiinlet)
+    shape = massflow.shape
+    mu = np.full(shape, 0.9)                        # initial guess
+    diameter = np.empty(shape)
+    vel = np.empty(shape)
+    a = np.sqrt(gamma*R*temperature)
+    c = np.sqrt(gamma*R*temperature) / (gamma*np.sqrt((2/(gamma+1))**((gamma+1)/(gamma-1))))
+
+    active = np.ones(shape, dtype=bool)
+    it = 0
+    while active.any():
+        pressure_ratio = (pressure - pressuredrop[active])/pressure
+        m = massflow[active]
+        lam2 = np.sqrt((gamma+1)/(gamma-1) * (1 - pressure_ratio**((gamma-1)/gamma)))
+        q = ((gamma+1)/2)**(1/(gamma-1)) * lam2*(1 - (gamma-1)/(gamma+1)*lam2*lam2)**(1/(gamma-1))
+        diameter_a = 1.128*np.sqrt(m*c / (mu[active]*pressure*q))
+        vel_a = lam2 * np.sqrt(2*gamma/(gamma-1) * R*temperature * (1 - pressure_ratio**((gamma-1)/gamma)))
+        Re = rho*vel_a*diameter_a/viscosity
+        lam = 0.3164*Re**(-0.25)
+        xi = lam*length[active]/diameter_a + xiinlet[active]*(1-diameter_a**2/upstreamdiameter[active]**2)
+        newmu = 1/np.sqrt(1 + xi)
+
+        idx = np.flatnonzero(active)
+        pressuredrop.flat[idx[vel_a > a]] -= 0.05e5
+
+        it += 1
+        if it > maxiter:
+            raise ValueError("Not converged after ", maxiter, " iterations in ", np.count_nonzero(active), " lanes")
+
+        converged = np.abs(mu[active] - newmu) <= tol
+        diameter[active] = diameter_a
+        vel[active] = vel_a
+        mu[active] = newmu
+        active.flat[idx[converged]] = False
+
+    return _unlanes(input_shape, mu, diameter, vel, pressuredrop)
+
+
+def liquid_injector_flow(rho, viscosity, length, diameter, pressuredrop, xiinlet, cd_factor=1, maxiter=100, tol=1e-6, xi1c_coefficients=None):
+    """mass flow through given hole geometries, inverse of liquid_injector_sizing with the same Cd correlation
+
+    :param diameter: hole diameter
+    :param cd_factor: multiplier on the correlated discharge coefficient
+    :param xi1c_coefficients: coefficients of the LiquidInjector.xi1c curve fit, XI1C_COEFFICIENTS if None
+    :return: discharge coefficient, mass flow and velocity arrays
+    """
+    rho, viscosity, length, diameter, pressuredrop, xiinlet, cd_factor = [np.array(a, dtype=float) for a in np.broadcast_arrays(rho, viscosity, length, diameter, pressuredrop, xiinlet, cd_factor)]
+    mu = np.array(cd_factor/np.sqrt(1 + xiinlet))
+    massflow = np.empty(diameter.shape)
+    vel = np.empty(diameter.shape)
+
+    active = np.ones(diameter.shape, dtype=bool)
+    it = 0
+    while active.any():
+        r, d = rho[active], diameter[active]
+        m = mu[active]*(d/0.95)**2*np.sqrt(r*pressuredrop[active])          # sizing relation solved for the mass flow
+        vel_a = 1.273*m*r**(-1)*d**(-2)
+        Re = r*vel_a*d/viscosity[active]
+        lam = 0.3164*Re**(-0.25)
+        xi = xiinlet[active] + LiquidInjector.xi1c(Re, xi1c_coefficients) + lam*length[active]/d
+        newmu = cd_factor[active]/np.sqrt(1 + xi)
+
+        it += 1
+        if it > maxiter:
+            raise ValueError("Not converged after ", maxiter, " iterations in ", np.count_nonzero(active), " lanes")
+
+        converged = np.abs(mu[active] - newmu) <= tol
+        massflow[active] = m
+        vel[active] = vel_a
+        mu[active] = newmu
+        idx = np.flatnonzero(active)
+        active.flat[idx[converged]] = False
+
+    return mu, massflow, vel
+
+
+def annulus_injector_flow(rho, viscosity, length, annulusdiameter, width, pressuredrop, xiinlet, cd_factor=1, maxiter=100, tol=1e-6):
+    """mass flow through given annulus geometries, inverse of annulus_injector_sizing with the same Cd model
+
+    :param width: annulus gap
+    :param cd_factor: multiplier on the modelled discharge coefficient
+    :return: discharge coefficient, mass flow and velocity arrays
+    """
+    rho, viscosity, length, annulusdiameter, width, pressuredrop, xiinlet, cd_factor = [np.array(a, dtype=float) for a in np.broadcast_arrays(rho, viscosity, length, annulusdiameter, width, pressuredrop, xiinlet, cd_factor)]
+    mu = np.array(cd_factor/np.sqrt(1 + xiinlet))
+    D = np.array(annulusdiameter + width)
+    massflow = np.empty(width.shape)
+    vel = np.empty(width.shape)
+
+    active = np.ones(width.shape, dtype=bool)
+    it = 0
+    while active.any():
+        r, di = rho[active], width[active]
+        vel_a = mu[active]*np.sqrt(2*pressuredrop[active]/r)
+        Re = r*vel_a*di/viscosity[active]
+        xifriction = colebrook(Re, di)*length[active]/di
+        newmu = cd_factor[active]/np.sqrt(1 + xifriction + xiinlet[active])
+
+        it += 1
+        if it > maxiter:
+            raise ValueError("Not converged after ", maxiter, " iterations in ", np.count_nonzero(active), " lanes")
+
+        converged = np.abs(mu[active] - newmu) <= tol
+        massflow[active] = r*np.pi*D[active]*di*vel_a
+        vel[active] = vel_a
+        mu[active] = newmu
+        idx = np.flatnonzero(active)
+        active.flat[idx[converged]] = False
+
+    return mu, massflow, vel
+
+
+def tolerance_analysis(oxidiser_injector, fuel_injector, n_ox_elements, n_fuel_elements=1, n_samples=1000, ox_tolerances=None, fuel_tolerances=None, seed=None):
+    """Monte Carlo distributions of total oxidiser and fuel mass flow and mixture ratio of a complete injector
+
+    :param oxidiser_injector: LiquidInjector of a single oxidiser element
+    :param fuel_injector: LiquidInjector or AnnulusInjector of a single fuel element
+    :param ox_tolerances: keyword arguments of the oxidiser monte_carlo method (diameter_tol, cd_tol, ...)
+    :param fuel_tolerances: keyword arguments of the fuel monte_carlo method
+    :return: dictionary of per sample total oxidiser and fuel mass flow and mixture ratio
+    """
+    rng = np.random.default_rng(seed)
+    ox_massflow, _ = oxidiser_injector.monte_carlo(n_ox_elements, n_samples, rng=rng, **(ox_tolerances or {}))
+    fuel_massflow, _ = fuel_injector.monte_carlo(n_fuel_elements, n_samples, rng=rng, **(fuel_tolerances or {}))
+
+    ox_total = ox_massflow.sum(axis=1)
+    fuel_total = fuel_massflow.sum(axis=1)
+    return {
+        'ox_massflow': ox_total,
+        'fuel_massflow': fuel_total,
+        'mixture_ratio': ox_total/fuel_total,
+    }
+
 
 def annulus_verification(r_inner, outer_radius, fluid, pressure_range, temperature, discharge_coefficient):
-    volumeflow = []
     D = 2*((outer_radius - r_inner)/2 + r_inner)
     di = outer_radius - r_inner
-    for p in pressure_range:
-        liquid = thermo.Chemical(fluid, T=temperature, P=p)
-        vel = discharge_coefficient*np.sqrt(2*p/liquid.rho)
+    table = fluid_cache.FluidTable([fluid], [1], [temperature], pressure_range)
+    rho, _ = table(temperature, pressure_range)
+    vel = discharge_coefficient*np.sqrt(2*pressure_range/rho)
 
-        q = 2*np.pi*D*vel*(di/2)
-        q *= 60/0.001                               # conversion to l/min
+    volumeflow = 2*np.pi*D*vel*(di/2)
+    volumeflow *= 60/0.001                          # conversion to l/min
 
-        volumeflow.append(q)
-    volumeflow = np.array(volumeflow)
-        
 
     def experimental_volumeflow(pressuredrop):
         deltap = pressuredrop/1e5
@@ -217,15 +554,12 @@ def annulus_verification(r_inner, outer_radius, fluid, pressure_range, temperatu
 
 
 def ohnesorge_number(injector, n_holes, massflow, fluid_mass_fractions, fluid_mole_fractions):
-    ohnesorge_nr = []
     massflows = massflow/n_holes
-    for m in massflows:
-        injector.massflow = m
-        injector.injector()                 # calculate new injector properties based on new pressure drop 
-        surface_tension = injector.fluid.SurfaceTensionMixture(ws=fluid_mass_fractions, zs=fluid_mole_fractions, T=injector.fluid.T, P=injector.fluid.P)
-        We = injector.fluid.rho*injector.velocity**2*injector.diameter / surface_tension
-        Re = injector.fluid.rho*injector.velocity*injector.diameter / injector.fluid.mu
-        ohnesorge_nr.append(np.sqrt(We)/Re)
+    _, diameter, velocity = injector.injector_array(massflow=massflows)[:3]            # size all hole counts at once
+    surface_tension = injector.fluid.SurfaceTensionMixture(ws=fluid_mass_fractions, zs=fluid_mole_fractions, T=injector.fluid.T, P=injector.fluid.P)
+    We = injector.fluid.rho*velocity**2*diameter / surface_tension
+    Re = injector.fluid.rho*velocity*diameter / injector.fluid.mu
+    ohnesorge_nr = np.sqrt(We)/Re
 
     plt.plot(n_holes, ohnesorge_nr)
     plt.grid()
@@ -250,6 +584,10 @@ if __name__ == '__main__':
 
     an_inj = AnnulusInjector(['c2h5oh','h2o'], [0.9,0.1], 410, 62.5e5, 2e-3, 30e-3, 2.227, 13.3e5)
     an_inj.injector()
+
+    # the vectorised sizing of a scalar injector reproduces the fixed point iteration
+    np.testing.assert_allclose(liq_inj.injector_array(), (liq_inj.mu, liq_inj.diameter, liq_inj.velocity), rtol=1e-5)
+    np.testing.assert_allclose(an_inj.injector_array()[:3], (an_inj.mu, an_inj.diameter, an_inj.velocity), rtol=1e-5)
     print(an_inj.mu)
     print(an_inj.diameter*1000)
     print(an_inj.velocity)
@@ -261,6 +599,13 @@ if __name__ == '__main__':
     print(an_orifice.diameter*1000)
     print(an_orifice.velocity)
 
+    # manufacturing tolerances, +-0.02 mm holes and +-0.01 mm annulus gap at 3 sigma
+    ox_tolerances = {'diameter_tol': 0.02e-3/3, 'length_tol': 0.05e-3/3, 'cd_tol': 0.02, 'pressuredrop_tol': 0.2e5}
+    fuel_tolerances = {'width_tol': 0.01e-3/3, 'annulusdiameter_tol': 0.01e-3/3, 'cd_tol': 0.02, 'pressuredrop_tol': 0.2e5}
+    distributions = tolerance_analysis(liq_inj, an_inj, n_holes, 1, 5000, ox_tolerances, fuel_tolerances, seed=0)
+    for key, values in distributions.items():
+        print(key, ': mean ', np.mean(values), ' std ', np.std(values), ' 99.7% range ', np.percentile(values, [0.15, 99.85]))
+
     #print((liq_inj.velocity*liq_inj.massflow*n_holes)/(an_inj.velocity*an_inj.massflow))
 
     #ohnesorge_number(liq_inj, n_holes, massflow, mass_fraction, mole_fraction)
@@ -1,11 +1,33 @@
 import numpy as np
 import thermo
-from scipy.optimize import fsolve
+from scipy.optimize import fsolve, brentq
 from matplotlib import pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 
-import standard_fluid_config as std
 import injectors
+import fluid_cache
+
+
+def momentum_ratio(ox_massflow, ox_velocity, ox_diameter, ox_rho, n_oxidiser_holes, fuel_massflow, fuel_velocity, fuel_width, fuel_rho):
+	"""total and local momentum ratio and spray cone half angle of a pintle, works on arrays
+
+	:param ox_massflow: mass flow per oxidiser hole
+	:param fuel_width: width of the fuel annulus
+	:return: TMR, LMR and spray angle [rad]
+	"""
+	radial_momentum = ox_massflow * ox_velocity * n_oxidiser_holes
+	axial_momentum = fuel_massflow * fuel_velocity 
+	tmr = radial_momentum/axial_momentum
+
+	radial_local_area = np.pi * ox_diameter**2/4
+	axial_local_area = fuel_width*ox_diameter	
+	lmr = ox_rho*ox_velocity**2*radial_local_area / (fuel_rho*fuel_velocity**2*axial_local_area)
+
+	alpha = 0.7
+	beta = 2.0
+	spray_angle = alpha * np.arctan(beta * lmr)
+
+	return tmr, lmr, spray_angle
 
 
 class Pintle():
@@ -22,25 +44,29 @@ class Pintle():
 		self.fuel_injector.injector()                      # compute injector properties 
 
 	def momentum_ratio(self):
-		radial_momentum = self.oxidiser_injector.massflow * self.oxidiser_injector.velocity * self.n_oxidiser_holes
-		axial_momentum = self.fuel_injector.massflow * self.fuel_injector.velocity 
-		self.tmr = radial_momentum/axial_momentum
-
-		radial_local_area = np.pi * self.oxidiser_injector.diameter**2/4
-		axial_local_area = self.fuel_injector.diameter*self.oxidiser_injector.diameter	
-		self.lmr = self.oxidiser_injector.fluid.rho*self.oxidiser_injector.velocity**2*radial_local_area / (self.fuel_injector.fluid.rho*self.fuel_injector.velocity**2*axial_local_area)
-
-		alpha = 0.7
-		beta = 2.0
-		self.spray_angle = alpha * np.arctan(beta * self.lmr)
+		ox = self.oxidiser_injector
+		fuel = self.fuel_injector
+		self.tmr, self.lmr, self.spray_angle = momentum_ratio(ox.massflow, ox.velocity, ox.diameter, ox.fluid.rho, self.n_oxidiser_holes, fuel.massflow, fuel.velocity, fuel.diameter, fuel.fluid.rho)
 
 
-	def pintle_optimiser(self, tmr_range):
+	def pintle_optimiser(self, tmr_range, method='step', xtol=10, maxiter=50):
 		"""
 		optimises pressure drops to get within given TMR range
 		Increses pressure from the standard pressure drop value
+
+		:param method: 'step' increases the pressure drop in 0.005 bar steps, 'root' solves for the pressure drop that gives 
+					   the centre of the TMR range with a bracketed root search (brentq), warm started from the converged discharge coefficient
+		:param xtol: ONLY FOR 'root', absolute pressure drop tolerance [Pa]
+		:param maxiter: ONLY FOR 'root', maximum number of root search iterations
 		"""
 		self.momentum_ratio() 								# initiate first momentum ratio calc
+		self.evaluations = 0
+
+		if method == 'root':
+			self.root_optimiser(tmr_range, xtol, maxiter)
+			return
+		elif method != 'step':
+			raise ValueError('Invalid optimiser method, use "step" or "root"')
  
 		while self.tmr > max(tmr_range) or self.tmr < min(tmr_range): 
 			if self.tmr > max(tmr_range):
@@ -52,35 +78,125 @@ class Pintle():
 				self.oxidiser_injector.injector()
 
 			self.momentum_ratio()
+			self.evaluations += 1
 
-	def pintle_sensitivity(self, uncertainty=0.1):
-		ox_pressure_range = np.linspace(self.oxidiser_injector.pressuredrop*(1-uncertainty), self.oxidiser_injector.pressuredrop*(1+uncertainty), 100)
-		fuel_pressure_range = np.linspace(self.fuel_injector.pressuredrop*(1-uncertainty), self.fuel_injector.pressuredrop*(1+uncertainty), 100)
+	def root_optimiser(self, tmr_range, xtol=10, maxiter=50):
+		"""
+		TMR as a function of one pressure drop, solved for the centre of tmr_range. As in the stepping optimiser only pressure drops are increased:
+		the fuel pressure drop if the TMR is too high, the oxidiser pressure drop if it is too low.
+		"""
+		if min(tmr_range) <= self.tmr <= max(tmr_range):
+			return
 
-		spray_angles = np.ndarray((len(ox_pressure_range), len(fuel_pressure_range)))
-		tmr = np.ndarray((len(ox_pressure_range), len(fuel_pressure_range)))
-		
-		cd_ox = self.oxidiser_injector.mu
-		cd_fuel = self.fuel_injector.mu
-		
-		for i in range(len(ox_pressure_range)):
-			for j in range(len(fuel_pressure_range)):
-				v_ox = cd_ox*np.sqrt(2*ox_pressure_range[i]/self.oxidiser_injector.fluid.rho)
-				v_fuel = cd_fuel*np.sqrt(2*fuel_pressure_range[j]/self.fuel_injector.fluid.rho)
-				m_ox = self.oxidiser_injector.fluid.rho * v_ox * self.n_oxidiser_holes * np.pi*self.oxidiser_injector.diameter**2/4
-				m_fuel = self.fuel_injector.fluid.rho * v_fuel * np.pi*self.fuel_injector.D*self.fuel_injector.diameter
+		target = np.mean(tmr_range)
+		if self.tmr > max(tmr_range):
+			injector = self.fuel_injector
+			# TMR scales approximately with 1/sqrt(dp_fuel), used for the first bracket guess
+			guess = injector.pressuredrop*(self.tmr/target)**2
+		else:
+			injector = self.oxidiser_injector
+			# TMR scales approximately with sqrt(dp_ox)
+			guess = injector.pressuredrop*(target/self.tmr)**2
+
+		def residual(dp):
+			injector.pressuredrop = dp
+			injector.injector(initial_mu=injector.mu)
+			self.momentum_ratio()
+			self.evaluations += 1
+			return self.tmr - target
+
+		lower = injector.pressuredrop
+		f_lower = self.tmr - target
+		upper = guess*1.05
+		f_upper = residual(upper)
+		while np.sign(f_upper) == np.sign(f_lower):
+			# expand bracket, TMR monotonic in the pressure drop
+			lower, f_lower = upper, f_upper
+			upper *= 1.5
+			f_upper = residual(upper)
+			if self.evaluations > maxiter:
+				raise ValueError('No TMR bracket found after ', maxiter, ' evaluations')
+
+		dp = brentq(residual, lower, upper, xtol=xtol, maxiter=maxiter)
+		if injector.pressuredrop != dp:
+			residual(dp)
+
+	def sensitivity_map(self, ox_pressuredrop, fuel_pressuredrop, cd_ox_factor=1, cd_fuel_factor=1, ox_rho=None, fuel_rho=None):
+		"""TMR, spray angle and mass flows of the sized geometry at off-design conditions. All arguments broadcast against each other
 
-				radial_local_area = np.pi * self.oxidiser_injector.diameter**2/4
-				axial_local_area = self.fuel_injector.diameter*self.oxidiser_injector.diameter	
-				lmr = self.oxidiser_injector.fluid.rho*v_ox**2*radial_local_area / (self.fuel_injector.fluid.rho*v_fuel**2*axial_local_area)
+		:param ox_pressuredrop: oxidiser pressure drop [Pa]
+		:param fuel_pressuredrop: fuel pressure drop [Pa]
+		:param cd_ox_factor: multiplier on the sized oxidiser discharge coefficient
+		:param cd_fuel_factor: multiplier on the sized fuel discharge coefficient
+		:param ox_rho: oxidiser density, defaults to the design value
+		:param fuel_rho: fuel density, defaults to the design value
+		"""
+		ox_rho = self.oxidiser_injector.fluid.rho if ox_rho is None else ox_rho
+		fuel_rho = self.fuel_injector.fluid.rho if fuel_rho is None else fuel_rho
+		cd_ox = self.oxidiser_injector.mu * cd_ox_factor
+		cd_fuel = self.fuel_injector.mu * cd_fuel_factor
+
+		v_ox = cd_ox*np.sqrt(2*ox_pressuredrop/ox_rho)
+		v_fuel = cd_fuel*np.sqrt(2*fuel_pressuredrop/fuel_rho)
+		m_hole = ox_rho * v_ox * np.pi*self.oxidiser_injector.diameter**2/4
+		m_fuel = fuel_rho * v_fuel * np.pi*self.fuel_injector.D*self.fuel_injector.diameter
+
+		tmr, lmr, spray_angle = momentum_ratio(m_hole, v_ox, self.oxidiser_injector.diameter, ox_rho, self.n_oxidiser_holes, m_fuel, v_fuel, self.fuel_injector.diameter, fuel_rho)
+
+		return tmr, spray_angle, m_hole*self.n_oxidiser_holes, m_fuel
+
+	def pintle_sensitivity(self, uncertainty=0.1, resolution=100, cd_uncertainty=0, cd_resolution=1, temperature_offsets=(0,), plot=True):
+		"""maps TMR, spray angle, mass flows and O/F over a grid of pressure drops, discharge coefficients and fluid temperatures.
+		The tensor is computed with broadcasting, its axes are (temperature offset, ox Cd factor, fuel Cd factor, ox dp, fuel dp)
+
+		:param uncertainty: relative range of the pressure drops around the design values
+		:param resolution: number of pressure drop points per axis
+		:param cd_uncertainty: relative range of the discharge coefficients around the sized values
+		:param cd_resolution: number of discharge coefficient points per axis, use an odd number to include the sized value
+		:param temperature_offsets: fluid temperature offsets from the design temperatures [K], applied to both propellants
+		:param plot: plot the spray angle and TMR maps at the design Cd and temperature
+		:return: dictionary of axes and result tensors
+		"""
+		ox_pressure_range = np.linspace(self.oxidiser_injector.pressuredrop*(1-uncertainty), self.oxidiser_injector.pressuredrop*(1+uncertainty), resolution)
+		fuel_pressure_range = np.linspace(self.fuel_injector.pressuredrop*(1-uncertainty), self.fuel_injector.pressuredrop*(1+uncertainty), resolution)
+		cd_factors = np.linspace(1-cd_uncertainty, 1+cd_uncertainty, cd_resolution)
+		temperature_offsets = np.asarray(temperature_offsets, dtype=float)
+
+		# densities at the offset temperatures, only the temperature axis needs new fluid states
+		ox_fluid = self.oxidiser_injector.fluid
+		fuel_fluid = self.fuel_injector.fluid
+		ox_rho = np.array([fluid_cache.mixture(ox_fluid.CASs, ox_fluid.ws, ox_fluid.T+dT, ox_fluid.P).rho if dT != 0 else ox_fluid.rho for dT in temperature_offsets])
+		fuel_rho = np.array([fluid_cache.mixture(fuel_fluid.CASs, fuel_fluid.ws, fuel_fluid.T+dT, fuel_fluid.P).rho if dT != 0 else fuel_fluid.rho for dT in temperature_offsets])
+
+		tmr, spray_angles, m_ox, m_fuel = self.sensitivity_map(
+			ox_pressure_range[None, None, None, :, None],
+			fuel_pressure_range[None, None, None, None, :],
+			cd_factors[None, :, None, None, None],
+			cd_factors[None, None, :, None, None],
+			ox_rho[:, None, None, None, None],
+			fuel_rho[:, None, None, None, None],
+		)
+
+		data = {
+			'temperature_offset': temperature_offsets,
+			'cd_ox_factor': cd_factors,
+			'cd_fuel_factor': cd_factors,
+			'ox_pressuredrop': ox_pressure_range,
+			'fuel_pressuredrop': fuel_pressure_range,
+			'tmr': tmr,
+			'spray_angle': spray_angles,
+			'ox_massflow': m_ox,
+			'fuel_massflow': m_fuel,
+			'mixture_ratio': m_ox/m_fuel,
+		}
 
-				alpha = 0.7
-				beta = 2.0
-				spray_angles[i][j] = alpha * np.arctan(beta * lmr)
+		if not plot:
+			return data
 
-				radial_momentum = m_ox * v_ox 
-				axial_momentum = m_fuel * v_fuel
-				tmr[i][j] = radial_momentum/axial_momentum
+		# design point slice, maps are indexed [ox dp, fuel dp] and transposed for pcolormesh
+		design = (np.argmin(abs(temperature_offsets)), np.argmin(abs(cd_factors-1)), np.argmin(abs(cd_factors-1)))
+		spray_angles = spray_angles[design]
+		tmr = tmr[design]
 
 		print(np.max(tmr))
 		print(np.max(np.degrees(spray_angles)))
@@ -89,7 +205,7 @@ class Pintle():
 		
 		fig, ax = plt.subplots()
 		ax.set_title('spray angles [deg]')
-		c = ax.pcolormesh(x/1e6, y/1e6, np.degrees(spray_angles))
+		c = ax.pcolormesh(x/1e6, y/1e6, np.degrees(spray_angles).T)
 		plt.scatter(self.oxidiser_injector.pressuredrop/1e6, self.fuel_injector.pressuredrop/1e6, self.spray_angle, color='red', label='design point')
 		ax.axis([np.min(x)/1e6, np.max(x)/1e6, np.min(y)/1e6, np.max(y)/1e6])
 		plt.xlabel('dp oxidiser [MPa]')
@@ -101,7 +217,7 @@ class Pintle():
 
 		fig, ax = plt.subplots()
 		ax.set_title('TMR [-]')
-		c = ax.pcolormesh(x/1e6, y/1e6, tmr)
+		c = ax.pcolormesh(x/1e6, y/1e6, tmr.T)
 		plt.scatter(self.oxidiser_injector.pressuredrop/1e6, self.fuel_injector.pressuredrop/1e6, self.tmr, color='red', label='design point')
 		ax.axis([np.min(x)/1e6, np.max(x)/1e6, np.min(y)/1e6, np.max(y)/1e6])
 		plt.xlabel('dp oxidiser [MPa]')
@@ -110,42 +226,49 @@ class Pintle():
 		fig.colorbar(c)
 
 		plt.show()
+
+		return data
 		
 
-#Injector Parameters 
-pressuredrop = std.pre_injection_pressure - std.chamber_pressure 		# [Pa]
-inlet_angle = np.pi/2
-
-n_holes = 48
-l_hole = 2.75e-3							# [m]
-annulus_length = 2e-3 						# [m]
-d_pintle = 30e-3							# [m]
-
-liq_inj = injectors.LiquidInjector(['o2'], [1], std.ox_temperature, std.pre_injection_pressure, l_hole, std.ox_massflow/n_holes, pressuredrop, inlet_angle)
-an_inj = injectors.AnnulusInjector(['c2h5oh', 'h2o'], [0.8,0.2], std.fuel_injection_temperature, std.pre_injection_pressure, annulus_length, d_pintle, std.fuel_massflow, pressuredrop)
-
-# Pintle optimisation 
-tmr_range = [0.9,0.95]
-pintle = Pintle(liq_inj, an_inj, n_holes)
-pintle.pintle_optimiser(tmr_range)
-print('pintle injector TMR:', pintle.tmr)
-print('pintle injector spray cone half angle:', np.degrees(pintle.spray_angle))
-print('oxidiser pressure drop: ', pintle.oxidiser_injector.pressuredrop/1e6, '[MPa]')
-print('fuel pressure drop: ',pintle.fuel_injector.pressuredrop/1e6, '[MPa]')
-print('oxidiser hole diameter:', pintle.oxidiser_injector.diameter*1000, '[mm]')
-print('annulus width:', pintle.fuel_injector.diameter*1000, '[mm]')
-
-
-# pintle spray angle sensitivity 
-# pintle.pintle_sensitivity()
-
-
-# Battleship injector Parameters 
-liq_inj = injectors.LiquidInjector(['o2'], [1], std.ox_temperature, std.pre_injection_pressure, l_hole, std.ox_massflow/n_holes, pressuredrop, inlet_angle)
-an_inj = injectors.AnnulusInjector(['c2h5oh', 'h2o'], [0.8,0.2], 288, std.pre_injection_pressure, annulus_length, d_pintle, std.fuel_massflow, 13e5)
-pintle = Pintle(liq_inj, an_inj, n_holes)
-pintle.momentum_ratio()
-print('pintle injector TMR:', pintle.tmr)
-print('pintle injector spray cone half angle:', np.degrees(pintle.spray_angle))
-print('oxidiser hole diameter:', pintle.oxidiser_injector.diameter*1000, '[mm]')
-print('annulus width:', pintle.fuel_injector.diameter*1000, '[mm]')
\ No newline at end of file
+if __name__ == '__main__':
+	import standard_fluid_config as std
+
+	#Injector Parameters 
+	pressuredrop = std.pre_injection_pressure - std.chamber_pressure 		# [Pa]
+	inlet_angle = np.pi/2
+
+	n_holes = 48
+	l_hole = 2.75e-3							# [m]
+	annulus_length = 2e-3 						# [m]
+	d_pintle = 30e-3							# [m]
+
+	liq_inj = injectors.LiquidInjector(['o2'], [1], std.ox_temperature, std.pre_injection_pressure, l_hole, std.ox_massflow/n_holes, pressuredrop, inlet_angle)
+	an_inj = injectors.AnnulusInjector(['c2h5oh', 'h2o'], [0.8,0.2], std.fuel_injection_temperature, std.pre_injection_pressure, annulus_length, d_pintle, std.fuel_massflow, pressuredrop)
+
+	# Pintle optimisation 
+	tmr_range = [0.9,0.95]
+	pintle = Pintle(liq_inj, an_inj, n_holes)
+	pintle.pintle_optimiser(tmr_range, method='root')
+	print('pintle injector TMR:', pintle.tmr)
+	print('pintle injector spray cone half angle:', np.degrees(pintle.spray_angle))
+	print('oxidiser pressure drop: ', pintle.oxidiser_injector.pressuredrop/1e6, '[MPa]')
+	print('fuel pressure drop: ',pintle.fuel_injector.pressuredrop/1e6, '[MPa]')
+	print('oxidiser hole diameter:', pintle.oxidiser_injector.diameter*1000, '[mm]')
+	print('annulus width:', pintle.fuel_injector.diameter*1000, '[mm]')
+
+
+	# pintle spray angle sensitivity 
+	# pintle.pintle_sensitivity()
+	# sensitivity = pintle.pintle_sensitivity(resolution=1000, cd_uncertainty=0.05, cd_resolution=5, temperature_offsets=[-5, 0, 5], plot=False)
+	# np.savez('pintle_sensitivity.npz', **sensitivity)
+
+
+	# Battleship injector Parameters 
+	liq_inj = injectors.LiquidInjector(['o2'], [1], std.ox_temperature, std.pre_injection_pressure, l_hole, std.ox_massflow/n_holes, pressuredrop, inlet_angle)
+	an_inj = injectors.AnnulusInjector(['c2h5oh', 'h2o'], [0.8,0.2], 288, std.pre_injection_pressure, annulus_length, d_pintle, std.fuel_massflow, 13e5)
+	pintle = Pintle(liq_inj, an_inj, n_holes)
+	pintle.momentum_ratio()
+	print('pintle injector TMR:', pintle.tmr)
+	print('pintle injector spray cone half angle:', np.degrees(pintle.spray_angle))
+	print('oxidiser hole diameter:', pintle.oxidiser_injector.diameter*1000, '[mm]')
+	print('annulus width:', pintle.fuel_injector.diameter*1000, '[mm]')
\ No newline at end of file
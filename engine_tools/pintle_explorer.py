@@ -0,0 +1,201 @@
+import numpy as np
+import multiprocessing as mp
+import csv
+
+import injectors
+import pintle
+
+
+VARIABLES = ['n_holes', 'l_hole', 'd_pintle', 'ox_pressuredrop', 'fuel_pressuredrop']
+
+# fluid properties shared with the worker processes, set once per process by _init_worker
+_shared = {}
+
+
+def latin_hypercube(n_samples, bounds, seed=None):
+	"""latin hypercube sample over the design variables
+
+	:param bounds: dictionary of variable name and (lower, upper) bound
+	:return: dictionary of variable name and sample array
+	"""
+	rng = np.random.default_rng(seed)
+	samples = {}
+	for name, (lower, upper) in bounds.items():
+		# one sample per stratum, strata shuffled independently for every variable
+		u = (rng.permutation(n_samples) + rng.random(n_samples)) / n_samples
+		samples[name] = lower + u*(upper - lower)
+	return samples
+
+
+def full_grid(bounds, resolution):
+	"""full factorial grid over the design variables
+
+	:param bounds: dictionary of variable name and (lower, upper) bound
+	:param resolution: number of points per variable, int or dictionary of variable name and int
+	"""
+	axes = []
+	for name, (lower, upper) in bounds.items():
+		n = resolution[name] if isinstance(resolution, dict) else resolution
+		axes.append(np.linspace(lower, upper, n if upper != lower else 1))
+	mesh = np.meshgrid(*axes, indexing='ij')
+	return {name: m.ravel() for name, m in zip(bounds.keys(), mesh)}
+
+
+def pareto_front(objectives):
+	"""non-dominated rows of an (n_candidates, n_objectives) array, all objectives minimised.
+	Candidates are visited in lexicographic order, so a candidate can only be dominated by one already on the front"""
+	objectives = np.asarray(objectives, dtype=float)
+	order = np.lexsort(objectives.T[::-1])
+	front = np.empty((0, objectives.shape[1]))
+	mask = np.zeros(len(objectives), dtype=bool)
+	for i in order:
+		o = objectives[i]
+		if np.any(np.all(front <= o, axis=1) & np.any(front < o, axis=1)):
+			continue
+		front = np.vstack([front, o])
+		mask[i] = True
+	return mask
+
+
+def _init_worker(shared):
+	_shared.update(shared)
+
+
+def _evaluate_chunk(chunk):
+	"""sizes the oxidiser holes and fuel annulus of a chunk of candidates at once and returns their TMR and spray angle"""
+	p = _shared
+	n_holes = chunk['n_holes']
+	ox_massflow = p['ox_massflow']/n_holes
+
+	cd_ox, d_hole, v_ox = injectors.liquid_injector_sizing(p['ox_rho'], p['ox_viscosity'], chunk['l_hole'], ox_massflow, chunk['ox_pressuredrop'], p['ox_xiinlet'])
+	cd_fuel, width, v_fuel, _ = injectors.annulus_injector_sizing(p['fuel_rho'], p['fuel_viscosity'], p['annulus_length'], chunk['d_pintle'], p['fuel_massflow'], chunk['fuel_pressuredrop'], p['fuel_xiinlet'])
+
+	tmr, lmr, spray_angle = pintle.momentum_ratio(ox_massflow, v_ox, d_hole, p['ox_rho'], n_holes, p['fuel_massflow'], v_fuel, width, p['fuel_rho'])
+
+	return np.column_stack([d_hole, cd_ox, v_ox, width, cd_fuel, v_fuel, tmr, lmr, spray_angle])
+
+
+class PintleExplorer():
+	def __init__(self, oxidiser_injector, fuel_injector, ox_massflow, tmr_target):
+		"""design space exploration of a pintle injector over hole count, hole length, pintle diameter and pressure drops.
+		Fluid properties are taken from the template injectors once and shared with all worker processes, candidates are
+		sized in vectorised chunks on a process pool.
+
+		:param oxidiser_injector: LiquidInjector template, provides the oxidiser state and inlet angle
+		:param fuel_injector: AnnulusInjector template, provides the fuel state, annulus length and fuel mass flow
+		:param ox_massflow: total oxidiser mass flow, split over the holes of every candidate
+		:param tmr_target: target total momentum ratio
+		"""
+		self.tmr_target = tmr_target
+		self.shared = {
+			'ox_rho': oxidiser_injector.fluid.rho,
+			'ox_viscosity': oxidiser_injector.fluid.mu,
+			'ox_xiinlet': oxidiser_injector.xiinlet(),
+			'ox_massflow': ox_massflow,
+			'fuel_rho': fuel_injector.fluid.rho,
+			'fuel_viscosity': fuel_injector.fluid.mu,
+			'fuel_xiinlet': fuel_injector.xiinlet(),
+			'fuel_massflow': fuel_injector.massflow,
+			'annulus_length': fuel_injector.length,
+		}
+
+	def candidates(self, bounds, n_samples=1000, method='lhs', resolution=10, seed=None):
+		"""generates candidates from bounds on the design variables, use equal bounds to fix a variable.
+		If no fuel pressure drop bounds are given the fuel pressure drop equals the oxidiser pressure drop
+
+		:param method: 'lhs' for a latin hypercube of n_samples or 'grid' for a full grid of resolution points per variable
+		"""
+		for name in bounds:
+			if name not in VARIABLES:
+				raise ValueError('Invalid design variable ', name, ', use ', VARIABLES)
+
+		if method == 'lhs':
+			samples = latin_hypercube(n_samples, bounds, seed)
+		elif method == 'grid':
+			samples = full_grid(bounds, resolution)
+		else:
+			raise ValueError('Invalid sampling method, use "lhs" or "grid"')
+
+		samples['n_holes'] = np.round(samples['n_holes'])
+		if 'fuel_pressuredrop' not in samples:
+			samples['fuel_pressuredrop'] = samples['ox_pressuredrop']
+		return samples
+
+	def evaluate(self, samples, processes=None, chunk_size=2000):
+		"""sizes all candidates on a process pool
+
+		:return: structured array with the design variables and results of every candidate
+		"""
+		n = len(samples['n_holes'])
+		chunks = [{name: samples[name][i:i+chunk_size] for name in VARIABLES} for i in range(0, n, chunk_size)]
+
+		if processes == 1:
+			_init_worker(self.shared)
+			results = [_evaluate_chunk(chunk) for chunk in chunks]
+		else:
+			pool = mp.Pool(processes if processes is not None else mp.cpu_count(), initializer=_init_worker, initargs=(self.shared,))
+			try:
+				results = pool.map(_evaluate_chunk, chunks)
+			finally:
+				pool.close()
+				pool.join()
+		results = np.concatenate(results)
+
+		columns = VARIABLES + ['ox_diameter', 'cd_ox', 'ox_velocity', 'annulus_width', 'cd_fuel', 'fuel_velocity', 'tmr', 'lmr', 'spray_angle', 'tmr_error']
+		table = np.zeros(n, dtype=[(name, float) for name in columns] + [('pareto', bool)])
+		for name in VARIABLES:
+			table[name] = samples[name]
+		for i, name in enumerate(columns[len(VARIABLES):-1]):
+			table[name] = results[:, i]
+		table['tmr_error'] = np.abs(table['tmr'] - self.tmr_target)
+		return table
+
+	def pareto_table(self, table, objectives=('tmr_error', 'ox_pressuredrop', 'fuel_pressuredrop', '-spray_angle')):
+		"""flags the pareto optimal candidates and returns them sorted by the first objective
+
+		:param objectives: column names to minimise, prefix with '-' to maximise
+		"""
+		values = np.column_stack([-table[o[1:]] if o.startswith('-') else table[o] for o in objectives])
+		table['pareto'] = pareto_front(values)
+		front = table[table['pareto']]
+		key = objectives[0].lstrip('-')
+		return front[np.argsort(-front[key] if objectives[0].startswith('-') else front[key])]
+
+	def explore(self, bounds, n_samples=1000, method='lhs', resolution=10, objectives=('tmr_error', 'ox_pressuredrop', 'fuel_pressuredrop', '-spray_angle'), processes=None, seed=None):
+		samples = self.candidates(bounds, n_samples, method, resolution, seed)
+		self.table = self.evaluate(samples, processes)
+		return self.pareto_table(self.table, objectives)
+
+
+def write_table(filename, table):
+	with open(filename, 'w', newline='') as file:
+		writer = csv.writer(file)
+		writer.writerow(table.dtype.names)
+		writer.writerows(table.tolist())
+
+
+if __name__ == '__main__':
+	import standard_fluid_config as std
+
+	pressuredrop = std.pre_injection_pressure - std.chamber_pressure 		# [Pa]
+	annulus_length = 2e-3 						# [m]
+
+	liq_inj = injectors.LiquidInjector(['o2'], [1], std.ox_temperature, std.pre_injection_pressure, 2.75e-3, std.ox_massflow/48, pressuredrop, np.pi/2)
+	an_inj = injectors.AnnulusInjector(['c2h5oh', 'h2o'], [0.8,0.2], std.fuel_injection_temperature, std.pre_injection_pressure, annulus_length, 30e-3, std.fuel_massflow, pressuredrop)
+
+	bounds = {
+		'n_holes': (24, 72),
+		'l_hole': (1.5e-3, 4e-3),						# [m]
+		'd_pintle': (20e-3, 40e-3),						# [m]
+		'ox_pressuredrop': (0.5*pressuredrop, 2*pressuredrop),
+		'fuel_pressuredrop': (0.5*pressuredrop, 2*pressuredrop),
+	}
+
+	explorer = PintleExplorer(liq_inj, an_inj, std.ox_massflow, tmr_target=0.925)
+	front = explorer.explore(bounds, n_samples=20000)
+	print('pareto optimal candidates: ', len(front), ' of ', len(explorer.table))
+	for row in front[:10]:
+		print('holes: ', int(row['n_holes']), ' l_hole: ', round(row['l_hole']*1e3, 2), '[mm] d_pintle: ', round(row['d_pintle']*1e3, 1),
+			  '[mm] dp ox/fuel: ', round(row['ox_pressuredrop']/1e5, 2), '/', round(row['fuel_pressuredrop']/1e5, 2), '[bar] TMR: ', round(row['tmr'], 3),
+			  ' spray angle: ', round(np.degrees(row['spray_angle']), 1), '[deg]')
+	write_table('pintle_pareto.csv', front)
@@ -1,5 +1,6 @@
 import numpy as np
 import engine_tools as et
+import heatflux_cache
 import thermo
 import rocketcea
 from matplotlib import pyplot as plt
@@ -39,7 +40,9 @@ fuel_mass_fraction = [1]
 heat = et.Heattransfer(fuel_composition, fuel_mass_fraction, fuel_massflow, total_massflow, ethanol90, oxidiser, OF, chamber_pressure, fuel_temperature, fuel_inlet_pressure, geometry, number_of_channels, thermal_conductivity, method, thermal_conductivity_tbc, wall_thickness_tbc)
 #heat = et.Heattransfer(['CH4'], [1], 1.32, 5.5, 'CH4', 'LOX', 3.16, 40e5, 110, 60e5, geometry, wall_thickness, thermal_conductivity)
 
-heat.heatflux(channel_hydraulic_diameter, geometry, wall_thickness, 1250, False)
+# identical runs from any script sharing the cache directory are loaded instead of solved
+cache = heatflux_cache.HeatfluxCache()
+cache.heatflux(heat, channel_hydraulic_diameter, geometry, wall_thickness, 1250, False)
 
 plt.rcParams.update({'font.size': 12})
 f, axes = plt.subplots(4, 1)
@@ -61,11 +64,7 @@ plt.show()
 print(max(heat.wall_temp))
 
 ''' 
-with open('heat_transfer_coefficients.csv', 'w', newline='') as file:
-	writer = csv.writer(file)
-	writer.writerow(["x coordinate","y_coordinate","gas heat transfer coefficient"])
-	for i in range(len(geometry[:,1])):
-		writer.writerow([geometry[i,0], geometry[i,1], heat.halpha_gas[len(geometry[:,1]) - i - 1]])
+heat.result.to_csv('heat_transfer_coefficients.csv', ['x', 'y', 'halpha_gas'])
 
 '''
 wt1_arr = data[:,11][::-1]
@@ -0,0 +1,82 @@
+import numpy as np
+
+import benchmark
+import engine_tools as et
+import fluid_cache
+
+
+N_STATIONS = 30
+
+
+def heattransfer(contour, k_tbc=1.2, t_tbc=0):
+	"""the ethanol-water / LOX case of benchmark.heatflux on the offline CEA throat state"""
+	return et.Heattransfer(['C2H5OH', 'H2O'], [0.8, 0.2], 5.8/2.49, 5.8, None, None, 1.49, 50e5, 288, 75e5, contour, 84, 24, 'cinjarew', k_tbc, t_tbc, cea=benchmark.offline_cea())
+
+
+def test_heatflux_without_thermal_barrier_coating():
+	# k_tbc == 0 used to raise UnboundLocalError for tbc_wall_temp in iterator
+	contour = benchmark.synthetic_contour(N_STATIONS)
+	heat = heattransfer(contour, k_tbc=0)
+	heat.heatflux(np.full(N_STATIONS, 1.05e-3), contour, np.full(N_STATIONS, 0.7e-3))
+
+	assert np.all(np.isfinite(heat.wall_temp))
+	np.testing.assert_allclose(heat.tbc_wall_temp, heat.wall_temp, rtol=1e-6)
+	assert heat.coolant_temp[-1] > heat.coolant_temp[0]
+
+
+def ethanol_table():
+	"""ethanol-water table on a 1 K grid, coarser grids show the erratic liquid Cp of thermo above ~410 K"""
+	return fluid_cache.FluidTable(['C2H5OH', 'H2O'], [0.8, 0.2], np.arange(280, 800, 1), np.linspace(45e5, 76e5, 4), properties=('rho', 'mu', 'Cp', 'Pr'))
+
+
+def test_heatflux_coupled_matches_heatflux():
+	contour = benchmark.synthetic_contour(N_STATIONS)
+	hydraulic_diameter = np.full(N_STATIONS, 1.05e-3)
+	wall_thickness = np.full(N_STATIONS, 0.7e-3)
+
+	marched = heattransfer(contour, k_tbc=0)
+	marched.heatflux(hydraulic_diameter.copy(), contour, wall_thickness)
+	# thermo 0.1.x shares the property objects of a species between fluids and a state far out of the range of one
+	# method changes later evaluations, so the table is built after the marched solve, never before it
+	coupled = heattransfer(contour, k_tbc=0)
+	coupled.heatflux_coupled(hydraulic_diameter.copy(), contour, wall_thickness, ethanol_table())
+
+	for name in ('wall_temp', 'q', 'coolant_temp', 'coolant_pressure'):
+		np.testing.assert_allclose(getattr(coupled, name), getattr(marched, name), rtol=1e-3, err_msg=name)
+
+
+def test_sensitivities_match_finite_differences():
+	contour = benchmark.synthetic_contour(N_STATIONS)
+	hydraulic_diameter = np.full(N_STATIONS, 1.05e-3)
+	wall_thickness = np.full(N_STATIONS, 0.7e-3)
+	heated_area = 2*np.pi*contour[:,1][::-1]*np.concatenate([[0], np.hypot(np.diff(contour[::-1,0]), np.diff(contour[::-1,1]))])
+
+	coolant_table = ethanol_table()
+	heat = heattransfer(contour, k_tbc=0)
+	heat.heatflux_coupled(hydraulic_diameter, contour, wall_thickness, coolant_table)
+	gradients = heat.sensitivities()
+	solution = {name: getattr(heat, name).copy() for name in ('wall_temp', 'coolant_temp', 'coolant_pressure')}
+
+	def objectives(geometry):
+		perturbed = heattransfer(contour, k_tbc=0)
+		perturbed.heatflux_coupled(geometry['hydraulic_diameter'], contour, geometry['wall_thickness'], coolant_table, initial_guess=solution, tol=1e-12)
+		return {
+			'max_wall_temp': perturbed.wall_temp.max(),
+			'outlet_pressure': perturbed.coolant_pressure[-1],
+			'heat_load': np.sum(perturbed.q*heated_area),
+		}
+
+	# central differences with a small step: the bilinear coolant table has kinks at its grid nodes, and max_wall_temp
+	# is not differentiable where the hottest station changes, so the step must not move the hottest station
+	hottest = np.argmax(heat.wall_temp)
+	for station in (hottest, 5, 20):
+		for name in ('hydraulic_diameter', 'wall_thickness'):
+			h = 1e-5*heat.coupled_solution[1][name][station]
+			upper = {'hydraulic_diameter': hydraulic_diameter.copy(), 'wall_thickness': wall_thickness.copy()}
+			lower = {'hydraulic_diameter': hydraulic_diameter.copy(), 'wall_thickness': wall_thickness.copy()}
+			upper[name][station] += h
+			lower[name][station] -= h
+			upper, lower = objectives(upper), objectives(lower)
+			for objective in upper:
+				finite_difference = (upper[objective] - lower[objective])/(2*h)
+				np.testing.assert_allclose(gradients[objective][name][station], finite_difference, rtol=1e-4, atol=1e-3, err_msg=objective + ' ' + name + ' ' + str(station))